@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+import argparse
+import random
+import timeit
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+from dev.fake_media.fake_media import fake_media, validate_sparse_support
+from subwinder.utils import HashBackend, special_hash
+
+
+def _main():
+    args = _parse_args()
+
+    with TemporaryDirectory(dir=args.dir) as temp_dir:
+        results = bench_hash(Path(temp_dir), args.size, args.files, args.repeat)
+
+    print(format_results(results))
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "-d",
+        "--dir",
+        type=Path,
+        help="[Default: system temp dir] Directory to create the benchmark files in",
+        default=None,
+    )
+    parser.add_argument(
+        "-s",
+        "--size",
+        type=int,
+        help="[Default: 8 MiB] Size of each of the random files in bytes",
+        default=8 * 1024 * 1024,
+    )
+    parser.add_argument(
+        "-n",
+        "--files",
+        type=int,
+        help="[Default: 32] Number of random files to hash each round",
+        default=32,
+    )
+    parser.add_argument(
+        "-r",
+        "--repeat",
+        type=int,
+        help="[Default: 5] Number of rounds to take the best time from",
+        default=5,
+    )
+
+    return parser.parse_args()
+
+
+def bench_hash(directory, size, num_files, repeat):
+    """
+    Times hashing a set of random files and the sparse files from `fake_media` with
+    each of the `HashBackend`s. Returns a `dict` mapping the name of the file set to a
+    `dict` of the best time per file in seconds for each backend.
+    """
+    MIN_FILE_SIZE = 128 * 1024
+
+    if size < MIN_FILE_SIZE:
+        raise ValueError(f"Benchmark files must be at least {MIN_FILE_SIZE} bytes")
+
+    file_sets = {}
+
+    # Random files written out in full to the local disk
+    random_dir = directory / "random"
+    random_dir.mkdir()
+    rng = random.Random(0)
+    random_files = []
+    for i in range(num_files):
+        filepath = random_dir / f"random_{i}.bin"
+        # Only the hashed chunks need to be random so skip generating the middle
+        chunk = rng.getrandbits(MIN_FILE_SIZE * 8).to_bytes(MIN_FILE_SIZE, "little")
+        with filepath.open("wb") as file:
+            file.write(chunk[: MIN_FILE_SIZE // 2])
+            file.write(bytes(size - MIN_FILE_SIZE))
+            file.write(chunk[MIN_FILE_SIZE // 2 :])
+        random_files.append(filepath)
+    file_sets["random"] = random_files
+
+    # And the fake media which is mostly holes if the filesystem allows it
+    sparse_dir = directory / "sparse"
+    sparse_dir.mkdir()
+    sparse_name = "sparse" if validate_sparse_support(sparse_dir) else "fake media"
+    file_sets[sparse_name] = fake_media(output_dir=sparse_dir)
+
+    results = {}
+    for name, filepaths in file_sets.items():
+        results[name] = {}
+        for backend in HashBackend:
+            # Warm up (and sanity check) before timing anything
+            hashes = [special_hash(f, backend=backend) for f in filepaths]
+            assert hashes == [special_hash(f) for f in filepaths]
+
+            best = min(
+                timeit.repeat(
+                    lambda: [special_hash(f, backend=backend) for f in filepaths],
+                    number=1,
+                    repeat=repeat,
+                )
+            )
+            results[name][backend] = best / len(filepaths)
+
+    return results
+
+
+def format_results(results):
+    baseline = HashBackend.BUFFERED
+
+    lines = []
+    for name, timings in results.items():
+        lines.append(f"{name}:")
+        for backend, seconds in timings.items():
+            speedup = timings[baseline] / seconds
+            lines.append(
+                f"  {backend.value:<10} {seconds * 1e6:>10.1f} us/file"
+                f" ({speedup:.2f}x vs {baseline.value})"
+            )
+
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    _main()
@@ -0,0 +1,543 @@
+#!/usr/bin/env python
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from socketserver import ThreadingMixIn
+from typing import Optional
+from xmlrpc.server import SimpleXMLRPCRequestHandler, SimpleXMLRPCServer
+
+from dev.pack_subtitles.pack_subtitles import pack
+from subwinder._constants import DEV_USERAGENT, TIME_FORMAT
+from subwinder._request import _TOKENLESS_ENDPOINTS, Endpoints
+from subwinder.ratelimit import API_PER, API_RATE, _take
+
+DEFAULT_ENTRY_FILE = (
+    Path(__file__).resolve().parent.parent / "fake_media" / "default_entries.json"
+)
+
+# (ISO639, SubLanguageID, LanguageName) for the languages subtitles are faked in
+LANGS = [
+    ("en", "eng", "English"),
+    ("fr", "fre", "French"),
+    ("de", "ger", "German"),
+    ("es", "spa", "Spanish"),
+]
+
+# Most items that can be sent in one request to each of these endpoints
+BATCH_LIMITS = {
+    Endpoints.DOWNLOAD_SUBTITLES: 20,
+    Endpoints.GUESS_MOVIE_FROM_STRING: 3,
+    Endpoints.PREVIEW_SUBTITLES: 20,
+    Endpoints.SEARCH_SUBTITLES: 20,
+}
+
+# Results are capped like the real API, which is much stricter for the dev useragent
+MAX_RESULTS = 500
+DEV_MAX_RESULTS = 5
+DOWNLOAD_LIMIT = 200
+
+_EPISODE_PATTERN = re.compile(r"^(?P<name>.+) - s(?P<season>\d+)e(?P<episode>\d+)")
+_YEAR_PATTERN = re.compile(r"^(?P<name>.+) \((?P<year>\d{4})\)")
+
+
+def _main():
+    args = _parse_args()
+
+    faults = Faults(
+        error_rate=args.error_rate,
+        maintenance=args.maintenance,
+        latency=args.latency,
+        rate=None if args.no_rate_limit else args.rate,
+        per=args.per,
+        seed=args.seed,
+    )
+    api = FakeApi(build_catalog(args.entry_file, args.subs_per_lang), faults)
+    with FakeServer(api, (args.host, args.port)) as server:
+        print(f"Serving the fake API at {server.api_base}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--host",
+        help="[Default: 127.0.0.1] Address to serve on",
+        default="127.0.0.1",
+    )
+    parser.add_argument(
+        "-p",
+        "--port",
+        type=int,
+        help="[Default: 8000] Port to serve on",
+        default=8000,
+    )
+    parser.add_argument(
+        "-f",
+        "--entry-file",
+        type=Path,
+        help="[Default: fake_media's default_entries.json] Entries to build media from",
+        default=None,
+    )
+    parser.add_argument(
+        "-n",
+        "--subs-per-lang",
+        type=int,
+        help="[Default: 3] Number of subtitles faked per language for each media",
+        default=3,
+    )
+    parser.add_argument(
+        "--error-rate",
+        type=float,
+        help="[Default: 0] Chance that a request gets a 503 Service Unavailable",
+        default=0,
+    )
+    parser.add_argument(
+        "--maintenance",
+        action="store_true",
+        help="Respond to everything with 506 Server under maintenance",
+    )
+    parser.add_argument(
+        "--latency",
+        type=float,
+        help="[Default: 0] Seconds of delay added to every call",
+        default=0,
+    )
+    parser.add_argument(
+        "--rate",
+        type=int,
+        help=f"[Default: {API_RATE}] Calls allowed every `--per` seconds",
+        default=API_RATE,
+    )
+    parser.add_argument(
+        "--per",
+        type=float,
+        help=f"[Default: {API_PER}] Seconds that `--rate` calls are allowed in",
+        default=API_PER,
+    )
+    parser.add_argument(
+        "--no-rate-limit",
+        action="store_true",
+        help="Never respond with 429 Too many requests",
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        help="[Default: random] Seed for the injected errors",
+        default=None,
+    )
+
+    return parser.parse_args()
+
+
+@dataclass
+class Faults:
+    """
+    Settings for the faults injected by the `FakeApi`. Requests fail with a 503 at an
+    `error_rate` chance, every call gets a 506 while under `maintenance`, and calls go
+    over the limit of `rate` calls every `per` seconds get a 429 (shared by all the
+    clients, `None` disables it). Every call is delayed by `latency` seconds.
+    """
+
+    error_rate: float = 0.0
+    maintenance: bool = False
+    latency: float = 0.0
+    rate: Optional[int] = API_RATE
+    per: float = API_PER
+    seed: Optional[int] = None
+
+
+def build_catalog(entry_file=None, subs_per_lang=3):
+    """
+    Builds the raw search results for a synthetic catalog of subtitles for each of the
+    media in the `fake_media` `entry_file`, with `subs_per_lang` subtitles for each of
+    the `LANGS`.
+    """
+    if entry_file is None:
+        entry_file = DEFAULT_ENTRY_FILE
+
+    with Path(entry_file).open() as f:
+        entries = json.load(f)
+
+    catalog = []
+    for media_index, entry in enumerate(entries):
+        media = _media_info(entry, media_index)
+
+        for lang_2, lang_3, lang_long in LANGS:
+            for sub_index in range(subs_per_lang):
+                sub_id = len(catalog) + 1
+                release = f"{Path(entry['name']).stem}.{lang_3}.{sub_index}"
+                catalog.append(
+                    {
+                        **media,
+                        "IDSubMovieFile": str(100000 + media_index),
+                        "IDSubtitleFile": str(1000000 + sub_id),
+                        "IDSubtitle": str(sub_id),
+                        "SubFileName": f"{release}.srt",
+                        "SubSize": "1024",
+                        "SubFormat": "srt",
+                        "SubEncoding": "UTF-8",
+                        "SubLanguageID": lang_3,
+                        "ISO639": lang_2,
+                        "LanguageName": lang_long,
+                        "SubAddDate": time.strftime(TIME_FORMAT, time.gmtime(sub_id)),
+                        "SubBad": "0",
+                        "SubRating": f"{5 + sub_index % 6}.0",
+                        "SubDownloadsCnt": str(1000 * (subs_per_lang - sub_index)),
+                        "SubComments": "0",
+                        "SubHearingImpaired": str(sub_index % 2),
+                        "SubFromTrusted": "1",
+                        "UserID": str(sub_index + 1),
+                        "UserNickName": f"uploader{sub_index + 1}",
+                        "MovieReleaseName": release,
+                        "Score": float(subs_per_lang - sub_index),
+                    }
+                )
+
+    return catalog
+
+
+def _media_info(entry, index):
+    info = {
+        "MovieHash": f"{int(entry['hash'], 16):016x}",
+        "MovieByteSize": str(entry["size"]),
+        "IDMovieImdb": str(1000000 + index),
+        "MovieKind": "movie",
+        "MovieName": Path(entry["name"]).stem,
+        "MovieYear": "2000",
+    }
+
+    episode = _EPISODE_PATTERN.match(info["MovieName"])
+    year = _YEAR_PATTERN.match(info["MovieName"])
+    if episode is not None:
+        info["MovieKind"] = "episode"
+        info["MovieName"] = episode["name"]
+        info["SeriesSeason"] = str(int(episode["season"]))
+        info["SeriesEpisode"] = str(int(episode["episode"]))
+    elif year is not None:
+        info["MovieName"] = year["name"]
+        info["MovieYear"] = year["year"]
+
+    return info
+
+
+class FakeApi:
+    """
+    Stand-in for the opensubtitles XML-RPC API serving the subtitles in `catalog`. The
+    token rules and per-request batch limits match the real API, and the `faults` to
+    inject can be changed at any time.
+    """
+
+    def __init__(self, catalog, faults=None):
+        self.catalog = catalog
+        self.faults = Faults() if faults is None else faults
+        self.calls = 0
+
+        self._lock = threading.Lock()
+        self._random = random.Random(self.faults.seed)
+        self._buckets = {}
+        self._sessions = {}
+        self._downloads = 0
+
+        self._handlers = {
+            Endpoints.DOWNLOAD_SUBTITLES: self._download_subtitles,
+            Endpoints.GET_COMMENTS: self._get_comments,
+            Endpoints.GET_SUB_LANGUAGES: self._get_sub_languages,
+            Endpoints.GET_USER_INFO: self._get_user_info,
+            Endpoints.GUESS_MOVIE_FROM_STRING: self._guess_movie_from_string,
+            Endpoints.LOG_IN: self._log_in,
+            Endpoints.LOG_OUT: self._log_out,
+            Endpoints.NO_OPERATION: self._no_operation,
+            Endpoints.PREVIEW_SUBTITLES: self._preview_subtitles,
+            Endpoints.SEARCH_SUBTITLES: self._search_subtitles,
+            Endpoints.SERVER_INFO: self._server_info,
+        }
+
+    def should_fail(self):
+        """
+        Rolls for whether the next HTTP request gets a 503.
+        """
+        with self._lock:
+            return self._random.random() < self.faults.error_rate
+
+    def dispatch(self, method, params):
+        """
+        Handles a call to the API `method` with `params` and returns the response.
+        """
+        with self._lock:
+            self.calls += 1
+
+        if self.faults.latency > 0:
+            time.sleep(self.faults.latency)
+
+        if self.faults.maintenance:
+            return {"status": "506 Server under maintenance"}
+        if self._rate_limited():
+            return {"status": "429 Too many requests"}
+
+        try:
+            endpoint = Endpoints(method)
+            handler = self._handlers[endpoint]
+        except (ValueError, KeyError):
+            return {"status": "409 Method not found"}
+
+        session = None
+        if endpoint not in _TOKENLESS_ENDPOINTS:
+            if not params:
+                return {"status": "405 Not all mandatory parameters specified"}
+
+            token, *params = params
+            with self._lock:
+                session = self._sessions.get(token)
+            if session is None:
+                return {"status": "406 No session"}
+
+            params = (token, session, *params)
+
+        limit = BATCH_LIMITS.get(endpoint)
+        if limit is not None and len(params[-1]) > limit:
+            return {"status": "408 Invalid parameters"}
+
+        try:
+            return handler(*params)
+        except (TypeError, ValueError, KeyError):
+            return {"status": "408 Invalid parameters"}
+
+    def _rate_limited(self):
+        if self.faults.rate is None:
+            return False
+
+        limits = {"*": (self.faults.rate, self.faults.per)}
+        with self._lock:
+            return _take(self._buckets, ["*"], limits, time.monotonic()) > 0
+
+    def _ok(self, data=None):
+        resp = {"status": "200 OK", "seconds": "0.001"}
+        if data is not None:
+            resp["data"] = data
+
+        return resp
+
+    def _log_in(self, username, password, lang, useragent):
+        if not useragent:
+            return {"status": "411 Empty or invalid useragent"}
+
+        token = uuid.uuid4().hex[:26]
+        with self._lock:
+            self._sessions[token] = {
+                "username": username or "anonymous",
+                "max_results": DEV_MAX_RESULTS
+                if useragent == DEV_USERAGENT
+                else MAX_RESULTS,
+                "downloads": 0,
+            }
+
+        return {"token": token, **self._ok()}
+
+    def _log_out(self, token, session):
+        with self._lock:
+            self._sessions.pop(token, None)
+
+        return self._ok()
+
+    def _no_operation(self, token, session):
+        return self._ok()
+
+    def _server_info(self):
+        with self._lock:
+            downloads = self._downloads
+            sessions = len(self._sessions)
+
+        return {
+            "application": "FakeSubtitles v0.1",
+            "users_online_total": str(sessions),
+            "users_online_program": str(sessions),
+            "users_loggedin": str(sessions),
+            "users_max_alltime": str(sessions),
+            "users_registered": str(sessions),
+            "subs_downloads": str(downloads),
+            "subs_subtitle_files": str(len(self.catalog)),
+            "movies_total": str(len({sub["IDMovieImdb"] for sub in self.catalog})),
+            "download_limits": {
+                "global_24h_download_limit": str(DOWNLOAD_LIMIT),
+                "client_ip": "127.0.0.1",
+                "limit_check_by": "user_ip",
+                "client_24h_download_count": str(downloads),
+                "client_download_quota": str(max(DOWNLOAD_LIMIT - downloads, 0)),
+                "client_24h_download_limit": str(DOWNLOAD_LIMIT),
+            },
+            "seconds": "0.001",
+        }
+
+    def _get_sub_languages(self, lang="en"):
+        return self._ok(
+            [
+                {"ISO639": lang_2, "SubLanguageID": lang_3, "LanguageName": lang_long}
+                for lang_2, lang_3, lang_long in LANGS
+            ]
+        )
+
+    def _get_user_info(self, token, session):
+        return self._ok(
+            {
+                "IDUser": "1",
+                "UserNickName": session["username"],
+                "UserRank": "read only",
+                "UploadCnt": "0",
+                "UserPreferedLanguages": "eng",
+                "DownloadCnt": str(session["downloads"]),
+                "UserWebLanguage": "en",
+            }
+        )
+
+    def _search_subtitles(self, token, session, queries):
+        results = []
+        for query_number, query in enumerate(queries):
+            langs = query.get("sublanguageid", "all").split(",")
+            for sub in self.catalog:
+                matched_by = self._match(query, sub)
+                if matched_by is None:
+                    continue
+                if "all" not in langs and sub["SubLanguageID"] not in langs:
+                    continue
+
+                results.append(
+                    {
+                        **sub,
+                        "MatchedBy": matched_by,
+                        "QueryNumber": str(query_number),
+                        "QueryParameters": query,
+                    }
+                )
+
+        return self._ok(results[: session["max_results"]])
+
+    def _match(self, query, sub):
+        if "moviehash" in query:
+            if (
+                query["moviehash"] == sub["MovieHash"]
+                and str(query["moviebytesize"]) == sub["MovieByteSize"]
+            ):
+                return "moviehash"
+        elif "imdbid" in query and str(query["imdbid"]) == sub["IDMovieImdb"]:
+            for key in ("season", "episode"):
+                if key in query and str(query[key]) != sub.get(f"Series{key.title()}"):
+                    return None
+
+            return "imdbid"
+
+        return None
+
+    def _sub_files(self, file_ids):
+        subs = {sub["IDSubtitleFile"]: sub for sub in self.catalog}
+        return [(file_id, subs[str(file_id)]) for file_id in file_ids]
+
+    def _contents(self, sub):
+        return pack(
+            f"1\n00:00:01,000 --> 00:00:02,000\n{sub['MovieReleaseName']}\n".encode()
+        ).decode()
+
+    def _download_subtitles(self, token, session, file_ids):
+        files = self._sub_files(file_ids)
+        with self._lock:
+            if self._downloads + len(files) > DOWNLOAD_LIMIT:
+                return {"status": "407 Download limit reached"}
+
+            self._downloads += len(files)
+            session["downloads"] += len(files)
+
+        return self._ok(
+            [
+                {"idsubtitlefile": str(file_id), "data": self._contents(sub)}
+                for file_id, sub in files
+            ]
+        )
+
+    def _preview_subtitles(self, token, session, file_ids):
+        return self._ok(
+            [
+                {"encoding": sub["SubEncoding"], "contents": self._contents(sub)}
+                for _, sub in self._sub_files(file_ids)
+            ]
+        )
+
+    def _get_comments(self, token, session, sub_ids):
+        # Nobody has anything to say about fake subtitles
+        return self._ok({})
+
+    def _guess_movie_from_string(self, token, session, queries):
+        guesses = {}
+        for query in queries:
+            guess = {}
+            for sub in self.catalog:
+                if sub["MovieName"].lower() in query.lower():
+                    guess = {
+                        "MovieName": sub["MovieName"],
+                        "MovieYear": sub["MovieYear"],
+                        "IDMovieIMDB": sub["IDMovieImdb"],
+                        "MovieKind": sub["MovieKind"],
+                    }
+                    for key in ("SeriesSeason", "SeriesEpisode"):
+                        if key in sub:
+                            guess[key] = sub[key]
+                    break
+
+            guesses[query] = {"BestGuess": guess} if guess else {}
+
+        return self._ok(guesses)
+
+
+class _FakeRequestHandler(SimpleXMLRPCRequestHandler):
+    protocol_version = "HTTP/1.1"
+    rpc_paths = ("/", "/xml-rpc")
+
+    def do_POST(self):
+        if not self.server.api.should_fail():
+            return super().do_POST()
+
+        # Read in the request so the connection can keep being used
+        self.rfile.read(int(self.headers.get("content-length", 0)))
+        self.send_response(503)
+        self.send_header("Content-length", "0")
+        self.end_headers()
+
+
+class FakeServer(ThreadingMixIn, SimpleXMLRPCServer):
+    """
+    Serves the `FakeApi` over XML-RPC (`system.multicall` included) at `address`.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, api, address=("127.0.0.1", 0)):
+        super().__init__(
+            address,
+            requestHandler=_FakeRequestHandler,
+            logRequests=False,
+            allow_none=True,
+        )
+        self.api = api
+        self.register_multicall_functions()
+
+    @property
+    def api_base(self):
+        host, port = self.server_address
+        return f"http://{host}:{port}/xml-rpc"
+
+    def _dispatch(self, method, params):
+        if method.startswith("system."):
+            return super()._dispatch(method, params)
+
+        return self.api.dispatch(method, params)
+
+
+if __name__ == "__main__":
+    _main()
@@ -44,7 +44,7 @@ def interative(lang):
         # `TvSeries` we need to get the specific episode to search for. If you have
         # information about the number of series and episodes available then you could
         # search for all of them at once too
-        if type(desired) == ExtTvSeries:
+        if type(desired) is ExtTvSeries:
             print("It looks like you selected a tv series!")
             season = int(input("What season do you want? "))
             episode = int(input("What episode do you want? "))
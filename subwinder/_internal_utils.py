@@ -1,6 +1,73 @@
+import hashlib
+import json
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+
 def type_check(obj, valid_classes):
     if not isinstance(obj, valid_classes):
         raise TypeError(
             f"Expected `obj` to be type from {valid_classes} or a derived class, but"
             f" got type {type(obj)} instead"
         )
+
+
+def bounded_map(function, iterable, max_workers, ordered=True):
+    """
+    Lazily maps `function` over `iterable` using a pool of `max_workers` threads. Only
+    `max_workers` items are ever in flight at once so `iterable` can be arbitrarily
+    large. Results are yielded in the same order as `iterable` if `ordered` otherwise
+    they are yielded as they complete.
+    """
+    if max_workers < 1:
+        raise ValueError(f"`max_workers` must be at least 1, got {max_workers}")
+
+    pending = deque()
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        for item in iterable:
+            if len(pending) >= max_workers:
+                yield from _pop_finished(pending, ordered)
+
+            pending.append(executor.submit(function, item))
+
+        while pending:
+            yield from _pop_finished(pending, ordered)
+    finally:
+        # Don't bother running anything that's left if the caller bailed early
+        for future in pending:
+            future.cancel()
+        executor.shutdown()
+
+
+def _pop_finished(pending, ordered):
+    if ordered:
+        yield pending.popleft().result()
+    else:
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            pending.remove(future)
+            yield future.result()
+
+
+def _normalize(value):
+    # The API treats numbers and their string forms the same
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return str(value)
+    elif isinstance(value, dict):
+        return {str(k): _normalize(v) for k, v in value.items()}
+    elif isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+
+    return value
+
+
+def request_key(endpoint, params):
+    """
+    Builds a key for calling `endpoint` with `params` that's the same for equivalent
+    `params` (ignoring the order of keys and whether numbers are given as strings).
+    """
+    normalized = json.dumps(
+        [endpoint.value, _normalize(params)], sort_keys=True, default=str
+    )
+    return hashlib.sha256(normalized.encode()).hexdigest()
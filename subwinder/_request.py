@@ -1,18 +1,25 @@
+import asyncio
 import time
 from datetime import datetime
 from enum import Enum
 from http.client import ResponseNotReady
 from xml.parsers.expat import ExpatError
-from xmlrpc.client import ProtocolError, ServerProxy, Transport
+from xmlrpc.client import Fault, ProtocolError, ServerProxy
 
 from subwinder._constants import API_BASE, REPO_URL
+from subwinder._internal_utils import request_key
+from subwinder._unmarshal import stream_data
 from subwinder.exceptions import (
     SubAuthError,
     SubDownloadError,
     SubLibError,
     SubServerError,
     SubUploadError,
+    SubwinderError,
 )
+from subwinder.executor import _report_status
+from subwinder.metrics import RequestMetrics, measure
+from subwinder.transport import PooledTransport, SafePooledTransport
 
 
 # The names of all the different endpoints exposed by opensubtitles
@@ -60,6 +67,17 @@ _TOKENLESS_ENDPOINTS = [
     Endpoints.SERVER_INFO,
 ]
 
+# Endpoints that only fetch information, so identical calls get identical responses
+_IDEMPOTENT_ENDPOINTS = [
+    Endpoints.GET_COMMENTS,
+    Endpoints.GET_SUB_LANGUAGES,
+    Endpoints.GUESS_MOVIE_FROM_STRING,
+    Endpoints.PREVIEW_SUBTITLES,
+    Endpoints.SEARCH_SUBTITLES,
+    Endpoints.SERVER_INFO,
+    Endpoints.SUGGEST_MOVIE,
+]
+
 
 # Responses 403, 404, 405, 406, 409 should be prevented by API
 _API_ERROR_MAP = {
@@ -86,88 +104,482 @@ _API_PROTOCOL_ERR_MAP = {
     520: "520 Unknown internal error",
 }
 
-_client = ServerProxy(API_BASE, allow_none=True, transport=Transport())
+# Shared by everything that doesn't bring its own transport
+_client = ServerProxy(API_BASE, allow_none=True, transport=SafePooledTransport())
+
+
+def build_client(transport=None, api_base=API_BASE):
+    """
+    Builds the XMLRPC client used for talking to the API at `api_base` over
+    `transport`. A new pooled transport matching the scheme of `api_base` is used if no
+    `transport` is given.
+    """
+    if transport is None:
+        secure = api_base.lower().startswith("https:")
+        transport = SafePooledTransport() if secure else PooledTransport()
+
+    return ServerProxy(api_base, allow_none=True, transport=transport)
+
+
+# Statuses that mean the API is under load and the request should be retried
+_RETRY_STATUSES = ("429", "503", "506", "520")
 
 
 # TODO: give a way to let lib user to set `TIMEOUT`?
-def request(endpoint, token, *params):
+class _Backoff:
+    """
+    Tracks the exponential backoff between the retries for one request.
+    """
+
+    TIMEOUT = 15
+    DELAY_FACTOR = 2
+
+    def __init__(self):
+        self._current_delay = 1.5
+        self._start = datetime.now()
+
+    def next_delay(self):
+        """
+        Returns how long to wait before retrying, or `None` if there isn't enough time
+        left to try again.
+        """
+        remaining_time = self.TIMEOUT - (datetime.now() - self._start).total_seconds()
+        if remaining_time <= self._current_delay:
+            return None
+
+        delay = self._current_delay
+        self._current_delay *= self.DELAY_FACTOR
+
+        return delay
+
+
+def request(
+    endpoint,
+    token,
+    *params,
+    client=None,
+    rate_limiter=None,
+    metrics=None,
+    cache=None,
+    single_flight=None,
+):
     """
     Function to allow for robust and reusable calls to the XMLRPC API. `endpoint`
     is the `Endpoint` that you want to use from the opensubtitles API. `token` is the
     auth token that is used for any user-authenticated calls. `*params` are any
-    additional parameters to pass to the API.
+    additional parameters to pass to the API. `client` can be set to use a different
+    client than the shared default one, every attempt waits on the `rate_limiter` if
+    one is given, and the `RequestMetrics` for the call are passed to the `metrics`
+    hook if one is given. Responses for the endpoints that the `cache` covers are
+    looked up there first and stored there when successful, and identical requests
+    that are in flight at the same time are coalesced by the `single_flight` if given.
     Note: Retrying with exponential backoff and exposing appropriate errors are all
     handled automatically.
     """
-    TIMEOUT = 15
-    DELAY_FACTOR = 2
-    current_delay = 1.5
-    start = datetime.now()
+    if cache is not None and cache.caches(endpoint):
+        resp = _cached_response(cache, endpoint, params, metrics)
+        if resp is None:
+            # Streamed responses are missing their `data`, so get the whole thing
+            with stream_data(None):
+                resp = request(
+                    endpoint,
+                    token,
+                    *params,
+                    client=client,
+                    rate_limiter=rate_limiter,
+                    metrics=metrics,
+                    single_flight=single_flight,
+                )
+            cache.set(endpoint, params, resp)
+
+        return resp
+
+    if single_flight is not None and single_flight.coalesces(endpoint):
+        key = (id(client), token, request_key(endpoint, params))
+
+        def send():
+            # Every caller needs the whole response, so it can't be streamed
+            with stream_data(None):
+                return request(
+                    endpoint,
+                    token,
+                    *params,
+                    client=client,
+                    rate_limiter=rate_limiter,
+                    metrics=metrics,
+                )
+
+        return single_flight.do(key, send)
+
+    if metrics is None:
+        resp, _ = _request_with_retries(endpoint, token, params, client, rate_limiter)
+        return _handle_response(resp)
+
+    with measure(metrics, endpoint.value) as measurement:
+        resp, measurement.retries = _request_with_retries(
+            endpoint, token, params, client, rate_limiter
+        )
+        measurement.status = _status_code(resp)
+
+        return _handle_response(resp)
+
+
+def _cached_response(cache, endpoint, params, metrics):
+    start = time.perf_counter()
+    resp = cache.get(endpoint, params)
+    _record_cache_hit(metrics, endpoint, resp, start)
+
+    return resp
+
+
+async def _cached_response_async(cache, endpoint, params, metrics):
+    start = time.perf_counter()
+    resp = await cache.get_async(endpoint, params)
+    _record_cache_hit(metrics, endpoint, resp, start)
+
+    return resp
+
+
+def _record_cache_hit(metrics, endpoint, resp, start):
+    if resp is not None and metrics is not None:
+        latency = time.perf_counter() - start
+        metrics.record(
+            RequestMetrics(endpoint.value, _status_code(resp), latency, cached=True)
+        )
+
+
+def _request_with_retries(endpoint, token, params, client, rate_limiter):
+    """
+    Makes the request for `request`. Returns the last response along with the number
+    of retries it took.
+    """
+    if client is None:
+        client = _client
+
+    backoff = _Backoff()
+    retries = 0
 
     # Keep retrying if status code indicates rate limiting (429) or server error (5XX)
     # until the `TIMEOUT` is hit
     while True:
+        if rate_limiter is not None:
+            rate_limiter.acquire(endpoint)
+
         try:
-            if endpoint in _TOKENLESS_ENDPOINTS:
-                # Flexible way to call method while reducing error handling
-                resp = getattr(_client, endpoint.value)(*params)
-            else:
-                # Use the token if it's defined
-                resp = getattr(_client, endpoint.value)(token, *params)
-
-        except ExpatError:
-            # So an expat error was an error parsing the xml response. I believe this is
-            # hit when the API is having problems and sends a plaintext message instead
-            # of valid XML
-            raise SubServerError(
-                "The server sent invalid XML. Likely due to temporary server issues."
+            # Flexible way to call method while reducing error handling
+            resp = getattr(client, endpoint.value)(
+                *_endpoint_params(endpoint, token, params)
             )
-        except ProtocolError as err:
-            # Try handling the `ProtocolError` appropriately
-            if err.errcode in _API_PROTOCOL_ERR_MAP:
-                resp = {"status": _API_PROTOCOL_ERR_MAP[err.errcode]}
-            else:
-                # Unexpected `ProtocolError`
-                raise SubLibError(
-                    "The server returned an unhandled protocol error. Please raise an"
-                    f" issue in the repo ({REPO_URL}) so that this can be handled in"
-                    f" the future\nProtocolError: {err}"
+        except (ExpatError, ProtocolError, ResponseNotReady) as err:
+            resp = _error_response(err)
+
+        status_code = _status_code(resp)
+        congested = status_code in _RETRY_STATUSES
+        _report_status(status_code, congested)
+        if not congested:
+            break
+
+        # Server under heavy load, wait and retry
+        delay = backoff.next_delay()
+        if delay is None:
+            # Not enough time to try again so go ahead and `break`
+            break
+
+        time.sleep(delay)
+        retries += 1
+
+    return resp, retries
+
+
+def multicall(
+    calls,
+    token,
+    client=None,
+    rate_limiter=None,
+    metrics=None,
+    cache=None,
+    single_flight=None,
+):
+    """
+    Sends all of the `(endpoint, params)` `calls` together in `system.multicall`
+    requests. Calls that get rate limited or hit server errors are retried on their own
+    with the same backoff as `request`. Returns the response for each call, or the
+    exception for it if the call failed, so one failing call doesn't fail the others.
+    The `metrics` hook gets `RequestMetrics` for the `system.multicall` requests as a
+    whole along with each of the `calls` (without any sizes since they're shared).
+    Calls with responses in the `cache` are answered from there instead of being sent.
+    The calls already share requests so they aren't coalesced by the `single_flight`.
+    """
+    if cache is not None:
+        return _cached_multicall(calls, token, client, rate_limiter, metrics, cache)
+
+    if metrics is None:
+        resps, _ = _multicall_with_retries(calls, token, client, rate_limiter)
+    else:
+        with measure(metrics, "system.multicall") as measurement:
+            resps, retries = _multicall_with_retries(calls, token, client, rate_limiter)
+            measurement.retries = max(retries, default=0)
+            measurement.status = "200"
+
+        for (endpoint, _), resp, call_retries in zip(calls, resps, retries):
+            status = "Fault" if isinstance(resp, Fault) else _status_code(resp)
+            metrics.record(
+                RequestMetrics(
+                    endpoint.value, status, measurement.latency, call_retries
                 )
-        except ResponseNotReady:
-            # From what I've found this occurs when the server's keep-alive ends and the
-            # socket closes. This only seems to occur when the server is having issues,
-            # so a `SubServerError` seems appropriate.
-            raise SubServerError(
-                "The server seems to be encoutering issues. Try again later."
             )
 
-        # Some endpoints don't return a status when "OK" like GetSubLanguages or
-        # ServerInfo, so force the status if it's missing
-        if "status" not in resp:
-            resp["status"] = "200 OK"
+    outcomes = []
+    for resp in resps:
+        if isinstance(resp, Fault):
+            outcomes.append(resp)
+            continue
+
+        try:
+            outcomes.append(_handle_response(resp))
+        except SubwinderError as err:
+            outcomes.append(err)
+
+    return outcomes
+
+
+def _cached_multicall(calls, token, client, rate_limiter, metrics, cache):
+    outcomes = [None] * len(calls)
+    missed = []
+    for index, (endpoint, params) in enumerate(calls):
+        if cache.caches(endpoint):
+            outcomes[index] = _cached_response(cache, endpoint, params, metrics)
+
+        if outcomes[index] is None:
+            missed.append(index)
+
+    if missed:
+        sent = multicall(
+            [calls[index] for index in missed], token, client, rate_limiter, metrics
+        )
+        for index, outcome in zip(missed, sent):
+            outcomes[index] = outcome
+            if not isinstance(outcome, BaseException):
+                cache.set(*calls[index], outcome)
+
+    return outcomes
+
+
+def _multicall_with_retries(calls, token, client, rate_limiter):
+    """
+    Makes the requests for `multicall`. Returns the last response (or `Fault`) for
+    each call along with the number of retries each took.
+    """
+    if client is None:
+        client = _client
+
+    resps = [None] * len(calls)
+    retries = [0] * len(calls)
+    remaining = list(range(len(calls)))
+    backoff = _Backoff()
+
+    while True:
+        if rate_limiter is not None:
+            for index in remaining:
+                rate_limiter.acquire(calls[index][0])
+
+        call_list = []
+        for index in remaining:
+            endpoint, params = calls[index]
+            call_list.append(
+                {
+                    "methodName": endpoint.value,
+                    "params": list(_endpoint_params(endpoint, token, params)),
+                }
+            )
+
+        try:
+            results = client.system.multicall(call_list)
+        except (ExpatError, ProtocolError, ResponseNotReady) as err:
+            # The whole request failed so every call gets the same response
+            resp = _error_response(err)
+            results = [[dict(resp)] for _ in remaining]
+
+        to_retry = []
+        for index, result in zip(remaining, results):
+            if isinstance(result, dict):
+                # Failed calls are returned as a fault struct instead of a result
+                resps[index] = Fault(result["faultCode"], result["faultString"])
+                continue
 
-        status_code = resp["status"][:3]
-        status_msg = resp["status"][4:]
+            resp = resps[index] = result[0]
+            if _status_code(resp) in _RETRY_STATUSES:
+                to_retry.append(index)
 
-        # Retry if rate limit was hit (429) or server error (5XX), otherwise handle
-        # appropriately
-        if status_code not in ("429", "503", "506", "520"):
+        remaining = to_retry
+        if not remaining:
             break
 
-        # Server under heavy load, wait and retry
-        remaining_time = TIMEOUT - (datetime.now() - start).total_seconds()
-        if remaining_time <= current_delay:
-            # Not enough time to try again so go ahead and `break`
+        delay = backoff.next_delay()
+        if delay is None:
             break
 
-        time.sleep(current_delay)
-        current_delay *= DELAY_FACTOR
+        time.sleep(delay)
+        for index in remaining:
+            retries[index] += 1
+
+    return resps, retries
+
+
+async def request_async(
+    endpoint,
+    token,
+    *params,
+    transport,
+    rate_limiter=None,
+    metrics=None,
+    cache=None,
+    single_flight=None,
+):
+    """
+    Same as `request`, but made over an `AsyncTransport` without blocking the event
+    loop.
+    """
+    if cache is not None and cache.caches(endpoint):
+        resp = await _cached_response_async(cache, endpoint, params, metrics)
+        if resp is None:
+            with stream_data(None):
+                resp = await request_async(
+                    endpoint,
+                    token,
+                    *params,
+                    transport=transport,
+                    rate_limiter=rate_limiter,
+                    metrics=metrics,
+                    single_flight=single_flight,
+                )
+            await cache.set_async(endpoint, params, resp)
+
+        return resp
+
+    if single_flight is not None and single_flight.coalesces(endpoint):
+        key = (id(transport), token, request_key(endpoint, params))
+
+        async def send():
+            with stream_data(None):
+                return await request_async(
+                    endpoint,
+                    token,
+                    *params,
+                    transport=transport,
+                    rate_limiter=rate_limiter,
+                    metrics=metrics,
+                )
+
+        return await single_flight.do_async(key, send)
+
+    if metrics is None:
+        resp, _ = await _request_with_retries_async(
+            endpoint, token, params, transport, rate_limiter
+        )
+        return _handle_response(resp)
+
+    with measure(metrics, endpoint.value) as measurement:
+        resp, measurement.retries = await _request_with_retries_async(
+            endpoint, token, params, transport, rate_limiter
+        )
+        measurement.status = _status_code(resp)
+
+        return _handle_response(resp)
+
+
+async def _request_with_retries_async(endpoint, token, params, transport, rate_limiter):
+    backoff = _Backoff()
+    retries = 0
+
+    while True:
+        if rate_limiter is not None:
+            await rate_limiter.acquire_async(endpoint)
+
+        try:
+            resp = await transport.call(
+                endpoint.value, _endpoint_params(endpoint, token, params)
+            )
+        except (ExpatError, ProtocolError) as err:
+            resp = _error_response(err)
+
+        if _status_code(resp) not in _RETRY_STATUSES:
+            break
+
+        delay = backoff.next_delay()
+        if delay is None:
+            break
+
+        await asyncio.sleep(delay)
+        retries += 1
+
+    return resp, retries
+
+
+def _endpoint_params(endpoint, token, params):
+    # Use the token if the endpoint takes one
+    if endpoint in _TOKENLESS_ENDPOINTS:
+        return params
+
+    return (token, *params)
+
+
+def _error_response(err):
+    """
+    Converts the errors raised while making a request to a response when they can be
+    handled, otherwise raises the appropriate exception.
+    """
+    if isinstance(err, ExpatError):
+        # So an expat error was an error parsing the xml response. I believe this is
+        # hit when the API is having problems and sends a plaintext message instead
+        # of valid XML
+        raise SubServerError(
+            "The server sent invalid XML. Likely due to temporary server issues."
+        )
+    elif isinstance(err, ProtocolError):
+        # Try handling the `ProtocolError` appropriately
+        if err.errcode in _API_PROTOCOL_ERR_MAP:
+            return {"status": _API_PROTOCOL_ERR_MAP[err.errcode]}
+
+        # Unexpected `ProtocolError`
+        raise SubLibError(
+            "The server returned an unhandled protocol error. Please raise an"
+            f" issue in the repo ({REPO_URL}) so that this can be handled in"
+            f" the future\nProtocolError: {err}"
+        )
+    elif isinstance(err, ResponseNotReady):
+        # From what I've found this occurs when the server's keep-alive ends and the
+        # socket closes. This only seems to occur when the server is having issues,
+        # so a `SubServerError` seems appropriate.
+        raise SubServerError(
+            "The server seems to be encoutering issues. Try again later."
+        )
+
+    raise err
+
+
+def _status_code(resp):
+    # Some endpoints don't return a status when "OK" like GetSubLanguages or
+    # ServerInfo, so force the status if it's missing
+    if "status" not in resp:
+        resp["status"] = "200 OK"
+
+    return resp["status"][:3]
+
+
+def _handle_response(resp):
+    """
+    Returns the `resp` if it was successful, otherwise raises the appropriate exception.
+    """
+    status_code = _status_code(resp)
+    status_msg = resp["status"][4:]
 
-    # Handle the response
     if status_code == "200":
         return resp
     elif status_code in _API_ERROR_MAP:
-        raise _API_ERROR_MAP[status_code](status_msg)
+        err = _API_ERROR_MAP[status_code](status_msg)
+        err.status_code = status_code
+        raise err
     else:
         raise SubLibError(
             "the API returned an unhandled response, consider raising an issue to"
@@ -0,0 +1,70 @@
+import contextvars
+from contextlib import contextmanager
+from xmlrpc.client import ExpatParser, Unmarshaller
+from xmlrpc.client import getparser as _stdlib_getparser
+
+# Handler that the items of the `data` array in responses get streamed to
+_data_handler = contextvars.ContextVar("_data_handler", default=None)
+
+
+@contextmanager
+def stream_data(handler):
+    """
+    While active, each element of the `data` array in the responses parsed by the
+    library's transports (in the current thread or task) is passed to `handler` as soon
+    as it's parsed. The array in the parsed response is left empty, so the whole
+    response never has to be held in memory at once.
+    """
+    token = _data_handler.set(handler)
+    try:
+        yield
+    finally:
+        _data_handler.reset(token)
+
+
+def getparser(use_datetime=False, use_builtin_types=False):
+    """
+    Same as `xmlrpc.client.getparser`, but streams the `data` items to the current
+    `stream_data` handler if there is one.
+    """
+    handler = _data_handler.get()
+    if handler is None:
+        return _stdlib_getparser(use_datetime, use_builtin_types)
+
+    target = _StreamingUnmarshaller(handler, use_datetime, use_builtin_types)
+    return ExpatParser(target), target
+
+
+class _StreamingUnmarshaller(Unmarshaller):
+    """
+    An `Unmarshaller` that hands off each element of the response's top level `data`
+    array to `handler` once it's complete instead of collecting them into the array.
+    """
+
+    def __init__(self, handler, use_datetime=False, use_builtin_types=False):
+        super().__init__(use_datetime, use_builtin_types)
+
+        self._handler = handler
+        # Where the elements of the `data` array start on the stack while inside it
+        self._data_mark = None
+
+    def start(self, tag, attrs):
+        # The response's struct is the only mark, so the last thing on the stack is the
+        # name of the member that this array is the value of
+        if tag == "array" and len(self._marks) == 1 and self._stack[-1:] == ["data"]:
+            self._data_mark = len(self._stack)
+
+        super().start(tag, attrs)
+
+    def end(self, tag):
+        super().end(tag)
+
+        if self._data_mark is None:
+            return
+
+        if len(self._marks) == 1:
+            # Left the `data` array
+            self._data_mark = None
+        elif len(self._marks) == 2 and len(self._stack) > self._data_mark:
+            # Just finished an element of the `data` array
+            self._handler(self._stack.pop())
@@ -0,0 +1,498 @@
+import asyncio
+
+# See: https://github.com/LovecraftianHorror/subwinder/issues/52#issuecomment-637333960
+# if you want to know why `request` isn't imported with `from`
+import subwinder._request
+from subwinder._constants import API_BASE
+from subwinder._request import Endpoints
+from subwinder._unmarshal import stream_data
+from subwinder.core import (
+    _add_search_result,
+    _build_search_query,
+    _dedupe_search_queries,
+    _extract_previews,
+    _fan_out_search_results,
+    _list_languages,
+    _parse_comments,
+    _parse_guess_media,
+    _prepare_downloads,
+    _rank_search_results,
+    _resolve_credentials,
+    _save_downloads,
+    _search_batch_size,
+    _sub_container_ids,
+    _validate_search_queries,
+)
+from subwinder.exceptions import SubDownloadError
+from subwinder.info import FullUser, ServerInfo
+from subwinder.lang import _converter
+from subwinder.names import NameFormatter
+from subwinder.ranking import rank_guess_media, rank_search_subtitles
+from subwinder.transport import AsyncTransport
+
+
+async def _batch(function, batch_size, max_concurrency, iterables, *args, **kwargs):
+    """
+    Same as `core._batch`, but runs up to `max_concurrency` of the batched calls at the
+    same time.
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def run(chunked):
+        async with semaphore:
+            return await function(*chunked, *args, **kwargs)
+
+    tasks = []
+    for i in range(0, len(iterables[0]), batch_size):
+        chunked = [iterable[i : i + batch_size] for iterable in iterables]
+        tasks.append(asyncio.ensure_future(run(chunked)))
+
+    try:
+        chunk_results = await asyncio.gather(*tasks)
+    except BaseException:
+        # Don't leave the other batches running in the background
+        for task in tasks:
+            task.cancel()
+        raise
+
+    results = []
+    for result in chunk_results:
+        if result is not None:
+            results += result
+
+    return results
+
+
+async def _batch_iter(
+    function, batch_size, max_concurrency, iterables, *args, **kwargs
+):
+    """
+    Same as `_batch`, but an async generator that yields each batch's chunks of
+    `iterables` along with its result in the order that the calls finish.
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def run(chunked):
+        async with semaphore:
+            return chunked, await function(*chunked, *args, **kwargs)
+
+    tasks = []
+    for i in range(0, len(iterables[0]), batch_size):
+        chunked = [iterable[i : i + batch_size] for iterable in iterables]
+        tasks.append(asyncio.ensure_future(run(chunked)))
+
+    try:
+        for task in asyncio.as_completed(tasks):
+            yield await task
+    finally:
+        # Don't leave the other batches running if iterating stopped early
+        for task in tasks:
+            task.cancel()
+
+
+async def _run_blocking(function, *args):
+    # Anything that can block (like file I/O) gets run in the default executor to keep
+    # the event loop free
+    return await asyncio.get_running_loop().run_in_executor(None, function, *args)
+
+
+class AsyncSubwinder:
+    """
+    The `asyncio` counterpart to `Subwinder` used for all unauthenticated
+    functionality exposed by the library.
+    """
+
+    _token = None
+
+    def __init__(
+        self,
+        transport=None,
+        rate_limiter=None,
+        max_concurrency=4,
+        metrics=None,
+        api_base=None,
+        cache=None,
+        single_flight=None,
+    ):
+        """
+        By default each `AsyncSubwinder` gets its own `AsyncTransport` (to `api_base`
+        if given) which is closed along with it, but a different `transport` can be
+        provided to use instead. A `rate_limiter` (like a `RateLimiter`) can be
+        provided to meter requests before they're sent, a `metrics` hook (like a
+        `MetricsCollector`) to record measurements for each request, a `ResponseCache`
+        to reuse responses from idempotent endpoints, and a `SingleFlight` to coalesce
+        identical requests that are in flight at once. Batched requests have up to
+        `max_concurrency` batches in flight at once.
+        """
+        if max_concurrency < 1:
+            raise ValueError(
+                f"`max_concurrency` must be at least 1, got {max_concurrency}"
+            )
+        if transport is not None and api_base is not None:
+            raise ValueError("`api_base` should be given to the `transport` instead")
+
+        self._owns_transport = transport is None
+        if transport is None:
+            transport = AsyncTransport(API_BASE if api_base is None else api_base)
+        self._transport = transport
+        self._rate_limiter = rate_limiter
+        self._metrics = metrics
+        self._cache = cache
+        self._single_flight = single_flight
+        self.max_concurrency = max_concurrency
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}()"
+
+    async def close(self):
+        """
+        Closes the transport if it was created by this object.
+        """
+        if self._owns_transport:
+            await self._transport.close()
+
+    async def _request(self, endpoint, *params):
+        """
+        Call the API `Endpoint` represented by `method` with any of the given `params`.
+        """
+        return await subwinder._request.request_async(
+            endpoint,
+            self._token,
+            *params,
+            transport=self._transport,
+            rate_limiter=self._rate_limiter,
+            metrics=self._metrics,
+            cache=self._cache,
+            single_flight=self._single_flight,
+        )
+
+    async def _batch(self, function, batch_size, iterables):
+        return await _batch(function, batch_size, self.max_concurrency, iterables)
+
+    async def _refresh_langs(self):
+        """
+        Same as `Subwinder._refresh_langs`, but the language list is requested without
+        blocking the event loop.
+        """
+        if _converter._is_fresh(_converter._last_updated):
+            return
+
+        resp = await self._request(Endpoints.GET_SUB_LANGUAGES)
+        _converter._update(resp["data"])
+
+    async def daily_download_info(self):
+        """
+        Returns `DownloadInfo` for the current client.
+        """
+        return (await self.server_info()).daily_download_info
+
+    async def get_languages(self):
+        """
+        Gets a list of the supported languages for the API in their various formats.
+        """
+        await self._refresh_langs()
+        return _list_languages()
+
+    async def server_info(self):
+        """
+        Returns `ServerInfo` for the opensubtitles.
+        """
+        return ServerInfo.from_data(await self._request(Endpoints.SERVER_INFO))
+
+
+class AsyncAuthSubwinder(AsyncSubwinder):
+    """
+    The `asyncio` counterpart to `AuthSubwinder`. Logging in is done when entering
+    `async with` and logging out when exiting it.
+    """
+
+    limited_search_size: bool
+
+    def __init__(
+        self,
+        username=None,
+        password=None,
+        password_hash=None,
+        useragent=None,
+        transport=None,
+        rate_limiter=None,
+        max_concurrency=4,
+        metrics=None,
+        api_base=None,
+        cache=None,
+        single_flight=None,
+    ):
+        """
+        Takes the same credentials as `AuthSubwinder` (including the env vars) while
+        `transport`, `rate_limiter`, `max_concurrency`, `metrics`, `api_base`,
+        `cache`, and `single_flight` are the same as for `AsyncSubwinder`.
+        """
+        super().__init__(
+            transport,
+            rate_limiter,
+            max_concurrency,
+            metrics,
+            api_base,
+            cache,
+            single_flight,
+        )
+
+        (
+            self._username,
+            self._password_hash,
+            self._useragent,
+            self.limited_search_size,
+        ) = _resolve_credentials(username, password, password_hash, useragent)
+
+    async def __aenter__(self):
+        try:
+            await self._login()
+        except BaseException:
+            await self.close()
+            raise
+
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        try:
+            # Logout on exiting `async with` if all is well
+            if exc_type is None:
+                await self._logout()
+        finally:
+            await self.close()
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(_token: {repr(self._token)})"
+
+    async def _login(self):
+        """
+        Handles logging in the user and storing the auth token. Automatically called on
+        entering `async with` so no need to call it directly.
+        """
+        resp = await self._request(
+            Endpoints.LOG_IN, self._username, self._password_hash, "en", self._useragent
+        )
+        self._token = resp["token"]
+
+    async def _logout(self):
+        """
+        Attempts to log out the user from the current session. Automatically called on
+        exiting `async with` so no need to call it directly.
+        """
+        await self._request(Endpoints.LOG_OUT)
+        self._token = None
+
+    async def download_subtitles(
+        self,
+        downloads,
+        download_dir=None,
+        name_formatter=NameFormatter("{upload_filename}"),
+    ):
+        """
+        Same as `AuthSubwinder.download_subtitles`.
+        """
+        # Naming the files can need the language list
+        await self._refresh_langs()
+        sub_containers, download_paths = _prepare_downloads(
+            downloads, download_dir, name_formatter
+        )
+
+        # Check that the user has enough downloads remaining to satisfy all `downloads`
+        daily_remaining = (await self.daily_download_info()).remaining
+        if daily_remaining < len(downloads):
+            raise SubDownloadError(
+                f"Not enough daily downloads remaining ({daily_remaining} <"
+                f" {len(downloads)})"
+            )
+
+        # Download the subtitles in batches of 20, per api spec
+        await self._batch(
+            self._download_subtitles, 20, [sub_containers, download_paths]
+        )
+
+        # Return the list of paths where subtitle files were saved
+        return download_paths
+
+    async def _download_subtitles(self, sub_containers, filepaths):
+        sub_file_ids = [sub_container.file_id for sub_container in sub_containers]
+
+        resp = await self._request(Endpoints.DOWNLOAD_SUBTITLES, sub_file_ids)
+        await _run_blocking(_save_downloads, resp["data"], filepaths)
+
+    async def get_comments(self, sub_containers):
+        """
+        Same as `AuthSubwinder.get_comments`.
+        """
+        ids = _sub_container_ids(sub_containers, "id")
+        data = (await self._request(Endpoints.GET_COMMENTS, ids))["data"]
+
+        return _parse_comments(ids, data)
+
+    async def user_info(self):
+        """
+        Get information stored for the current user.
+        """
+        resp = await self._request(Endpoints.GET_USER_INFO)
+
+        # The preferred languages get converted with the language list
+        await self._refresh_langs()
+        return FullUser.from_data(resp["data"])
+
+    async def ping(self):
+        """
+        Pings the API to keep the session active.
+        """
+        await self._request(Endpoints.NO_OPERATION)
+
+    async def guess_media(
+        self,
+        queries,
+        ranking_func=rank_guess_media,
+        *rank_args,
+        **rank_kwargs,
+    ):
+        """
+        Same as `guess_media_unranked`, but selects the best result using `ranking_func`
+        """
+        results = await self.guess_media_unranked(queries)
+
+        selected = []
+        for result, query in zip(results, queries):
+            selected.append(ranking_func(result, query, *rank_args, **rank_kwargs))
+
+        return selected
+
+    async def guess_media_unranked(self, queries):
+        """
+        Same as `AuthSubwinder.guess_media_unranked`.
+        """
+        # Batch to 3 per api spec
+        return await self._batch(self._guess_media_unranked, 3, [queries])
+
+    async def _guess_media_unranked(self, queries):
+        resp = await self._request(Endpoints.GUESS_MOVIE_FROM_STRING, queries)
+        return _parse_guess_media(queries, resp["data"])
+
+    async def search_subtitles(
+        self,
+        queries,
+        ranking_func=rank_search_subtitles,
+        *rank_args,
+        **rank_kwargs,
+    ):
+        """
+        Same as `search_subtitles_unranked`, but the results are run through the
+        `ranking_func` first to try and determine the best result.
+        """
+        if isinstance(queries, zip):
+            queries = list(queries)
+
+        groups = await self.search_subtitles_unranked(queries)
+
+        selected = []
+        for group, (query, _) in zip(groups, queries):
+            selected.append(
+                _rank_search_results(ranking_func, group, query, rank_args, rank_kwargs)
+            )
+
+        return selected
+
+    async def search_subtitles_unranked(self, queries):
+        """
+        Same as `AuthSubwinder.search_subtitles_unranked`.
+        """
+        await self._refresh_langs()
+        queries = _validate_search_queries(queries)
+
+        unique, positions = _dedupe_search_queries(queries)
+        unique_groups = await self._batch(
+            self._search_subtitles_unranked,
+            _search_batch_size(self.limited_search_size),
+            [unique],
+        )
+
+        groups = [None] * len(queries)
+        for index, group in _fan_out_search_results(
+            queries, positions, enumerate(unique_groups)
+        ):
+            groups[index] = group
+
+        return groups
+
+    async def _search_subtitles_unranked(self, queries):
+        internal_queries = [_build_search_query(q, l) for q, l in queries]
+        groups = [[] for _ in queries]
+
+        def add_result(raw_result):
+            _add_search_result(groups, queries, raw_result)
+
+        # Results are added as they're parsed, so any left in `data` weren't streamed
+        with stream_data(add_result):
+            resp = await self._request(Endpoints.SEARCH_SUBTITLES, internal_queries)
+        for raw_result in resp["data"]:
+            add_result(raw_result)
+
+        return groups
+
+    async def search_subtitles_iter(
+        self,
+        queries,
+        ranking_func=rank_search_subtitles,
+        *rank_args,
+        **rank_kwargs,
+    ):
+        """
+        Same as `search_subtitles`, but an async generator that yields the
+        `(query, result)` pairs as each batch of queries comes back.
+        """
+        async for query, group in self.search_subtitles_unranked_iter(queries):
+            yield query, _rank_search_results(
+                ranking_func, group, query[0], rank_args, rank_kwargs
+            )
+
+    async def search_subtitles_unranked_iter(self, queries):
+        """
+        Same as `search_subtitles_unranked`, but an async generator that yields the
+        `(query, results)` pairs as each batch of queries comes back. Batches run
+        concurrently so they're yielded in the order they finish.
+        """
+        await self._refresh_langs()
+        queries = _validate_search_queries(queries)
+
+        # The unique queries' indices are batched alongside them to know where the
+        # results go when batches finish out of order
+        unique, positions = _dedupe_search_queries(queries)
+        batches = _batch_iter(
+            lambda chunk, _: self._search_subtitles_unranked(chunk),
+            _search_batch_size(self.limited_search_size),
+            self.max_concurrency,
+            [unique, list(range(len(unique)))],
+        )
+        try:
+            async for (_, unique_indices), groups in batches:
+                unique_results = zip(unique_indices, groups)
+                for index, group in _fan_out_search_results(
+                    queries, positions, unique_results
+                ):
+                    yield queries[index], group
+        finally:
+            await batches.aclose()
+
+    async def preview_subtitles(self, sub_containers):
+        """
+        Same as `AuthSubwinder.preview_subtitles`.
+        """
+        file_ids = _sub_container_ids(sub_containers, "file_id")
+
+        # Batch to 20 per api spec
+        return await self._batch(self._preview_subtitles, 20, [file_ids])
+
+    async def _preview_subtitles(self, ids):
+        resp = await self._request(Endpoints.PREVIEW_SUBTITLES, ids)
+        return _extract_previews(resp["data"])
@@ -0,0 +1,334 @@
+import asyncio
+import contextvars
+import copy
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from subwinder._internal_utils import request_key
+from subwinder._request import Endpoints
+
+# Seconds that responses from each of the idempotent endpoints stay fresh for
+DEFAULT_TTLS = {
+    Endpoints.GET_COMMENTS: 10 * 60,
+    Endpoints.GUESS_MOVIE_FROM_STRING: 24 * 60 * 60,
+    Endpoints.PREVIEW_SUBTITLES: 24 * 60 * 60,
+    Endpoints.SEARCH_SUBTITLES: 60 * 60,
+    Endpoints.SERVER_INFO: 60,
+    Endpoints.SUGGEST_MOVIE: 24 * 60 * 60,
+}
+
+# Set while the caches are being bypassed in the current thread or task
+_bypassing = contextvars.ContextVar("_bypassing", default=False)
+
+
+@contextmanager
+def bypass_cache():
+    """
+    While active, requests made in the current thread (or task) skip looking up their
+    responses in any `ResponseCache`. The fresh responses are still stored.
+    """
+    token = _bypassing.set(True)
+    try:
+        yield
+    finally:
+        _bypassing.reset(token)
+
+
+class HashCache:
+    """
+    A persistent cache of `special_hash` results stored in an SQLite database. Entries
+    are keyed off of the file's device and inode and only count as a hit when the size
+    and modification time still match, so changed files automatically get rehashed.
+    """
+
+    def __init__(self, db_path):
+        """
+        Opens (or creates) the cache stored at `db_path`.
+        """
+        self.hits = 0
+        self.misses = 0
+
+        # Connection gets shared between threads (bulk hashing) so guard it ourselves
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(db_path), check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS hashes ("
+                " device INTEGER NOT NULL,"
+                " inode INTEGER NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " mtime_ns INTEGER NOT NULL,"
+                " path TEXT NOT NULL,"
+                " hash TEXT NOT NULL,"
+                " PRIMARY KEY (device, inode)"
+                ")"
+            )
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(hits: {self.hits}, misses: {self.misses})"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM hashes").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def get(self, stat):
+        """
+        Returns the cached hash for the file described by the `os.stat_result` `stat`
+        or `None` if there isn't a valid entry.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT size, mtime_ns, hash FROM hashes"
+                " WHERE device = ? AND inode = ?",
+                (stat.st_dev, stat.st_ino),
+            ).fetchone()
+
+            # Entries are only valid if the file hasn't changed since it was hashed
+            if row is not None and row[:2] == (stat.st_size, stat.st_mtime_ns):
+                self.hits += 1
+                return row[2]
+
+            self.misses += 1
+            return None
+
+    def set(self, filepath, stat, hash):
+        """
+        Stores the `hash` for the file at `filepath` described by `stat`.
+        """
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO hashes VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    stat.st_dev,
+                    stat.st_ino,
+                    stat.st_size,
+                    stat.st_mtime_ns,
+                    os.path.abspath(filepath),
+                    hash,
+                ),
+            )
+
+    def prune(self, vacuum=True):
+        """
+        Evicts entries for any files that no longer exist (or whose path now points to
+        a different file) and then optionally `vacuum`s the database to reclaim the
+        space. Returns the number of evicted entries.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT device, inode, path FROM hashes"
+            ).fetchall()
+
+        # Stat outside of the lock so that hashing isn't stalled on the filesystem
+        stale = []
+        for device, inode, path in rows:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                # Missing, no longer reachable, or otherwise unusable
+                stale.append((device, inode, path))
+                continue
+
+            if (stat.st_dev, stat.st_ino) != (device, inode):
+                stale.append((device, inode, path))
+
+        with self._lock:
+            # Matching on the path too avoids evicting entries that were replaced since
+            with self._conn:
+                evicted = self._conn.executemany(
+                    "DELETE FROM hashes WHERE device = ? AND inode = ? AND path = ?",
+                    stale,
+                ).rowcount
+
+            if vacuum:
+                self._conn.execute("VACUUM")
+
+        return evicted
+
+
+class ResponseCache:
+    """
+    Caches the successful responses from the idempotent endpoints in `ttls` (mapping
+    `Endpoints` to the seconds that their responses stay fresh) so that repeated
+    requests with the same parameters don't need to hit the API again. Up to
+    `max_entries` responses are kept in memory with the least recently used ones
+    getting evicted first. If a `db_path` is given then responses are also stored in
+    an SQLite database there so that they outlive the process and can be shared.
+    """
+
+    def __init__(self, ttls=DEFAULT_TTLS, max_entries=1024, db_path=None):
+        if max_entries < 1:
+            raise ValueError(f"`max_entries` must be at least 1, got {max_entries}")
+
+        self.ttls = dict(ttls)
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+        self._conn = None
+        if db_path is not None:
+            self._conn = sqlite3.connect(str(db_path), check_same_thread=False)
+            with self._lock, self._conn:
+                self._conn.execute("PRAGMA journal_mode=WAL")
+                self._conn.execute("PRAGMA synchronous=NORMAL")
+                self._conn.execute(
+                    "CREATE TABLE IF NOT EXISTS responses ("
+                    " key TEXT PRIMARY KEY,"
+                    " expires REAL NOT NULL,"
+                    " response TEXT NOT NULL"
+                    ")"
+                )
+                self._conn.execute(
+                    "DELETE FROM responses WHERE expires <= ?", (time.time(),)
+                )
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(hits: {self.hits}, misses: {self.misses})"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+
+    def caches(self, endpoint):
+        """
+        Returns whether responses from `endpoint` get cached.
+        """
+        return endpoint in self.ttls
+
+    def get(self, endpoint, params):
+        """
+        Returns a copy of the cached response for calling `endpoint` with `params` or
+        `None` if there isn't a fresh one (or the cache is being bypassed).
+        """
+        if not self.caches(endpoint) or _bypassing.get():
+            return None
+
+        key = request_key(endpoint, params)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= now:
+                del self._entries[key]
+                entry = None
+
+            if entry is None and self._conn is not None:
+                entry = self._load(key, now)
+                if entry is not None:
+                    self._store(key, entry)
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+
+        # Callers are free to mutate what they get back
+        return copy.deepcopy(entry[1])
+
+    def set(self, endpoint, params, response):
+        """
+        Stores the `response` for calling `endpoint` with `params`.
+        """
+        if not self.caches(endpoint):
+            return
+
+        key = request_key(endpoint, params)
+        entry = (time.time() + self.ttls[endpoint], copy.deepcopy(response))
+        with self._lock:
+            self._store(key, entry)
+
+            if self._conn is not None:
+                try:
+                    serialized = json.dumps(response)
+                except TypeError:
+                    # Only plain responses can be persisted
+                    return
+
+                with self._conn:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO responses VALUES (?, ?, ?)",
+                        (key, entry[0], serialized),
+                    )
+
+    async def get_async(self, endpoint, params):
+        """
+        Same as `.get(...)`, but looking in the database is run without blocking the
+        event loop.
+        """
+        if self._conn is None:
+            return self.get(endpoint, params)
+
+        return await self._run_in_executor(self.get, endpoint, params)
+
+    async def set_async(self, endpoint, params, response):
+        """
+        Same as `.set(...)`, but storing to the database is run without blocking the
+        event loop.
+        """
+        if self._conn is None:
+            return self.set(endpoint, params, response)
+
+        return await self._run_in_executor(self.set, endpoint, params, response)
+
+    async def _run_in_executor(self, function, *args):
+        # Run in our context so that `bypass_cache` still applies from the executor
+        context = contextvars.copy_context()
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, context.run, function, *args)
+
+    def clear(self):
+        """
+        Evicts every entry from the cache (persisted ones included).
+        """
+        with self._lock:
+            self._entries.clear()
+            if self._conn is not None:
+                with self._conn:
+                    self._conn.execute("DELETE FROM responses")
+
+    def _store(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _load(self, key, now):
+        row = self._conn.execute(
+            "SELECT expires, response FROM responses WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None or row[0] <= now:
+            return None
+
+        return row[0], json.loads(row[1])
@@ -7,22 +7,29 @@ except ImportError:
     ATOMIC_DOWNLOADS_SUPPORT = False
 
 
+import copy
 import hashlib
+import logging
 import os
+import threading
+import time
 
 # See: https://github.com/LovecraftianHorror/subwinder/issues/52#issuecomment-637333960
 # if you want to know why `request` isn't imported with `from`
 import subwinder._request
 from subwinder import utils
-from subwinder._constants import DEV_USERAGENT, Env
+from subwinder._constants import API_BASE, DEV_USERAGENT, Env
 from subwinder._internal_utils import type_check
-from subwinder._request import Endpoints
+from subwinder._request import _TOKENLESS_ENDPOINTS, Endpoints
+from subwinder._unmarshal import stream_data
 from subwinder.exceptions import (
     SubAuthError,
     SubDownloadError,
     SubLangError,
     SubLibError,
+    SubwinderError,
 )
+from subwinder.executor import SerialExecutor
 from subwinder.info import (
     Comment,
     Episode,
@@ -34,19 +41,24 @@ from subwinder.info import (
     Subtitles,
     build_media,
 )
-from subwinder.lang import LangFormat, lang_2s, lang_3s, lang_longs
+from subwinder.lang import LangFormat, _converter, lang_2s, lang_3s, lang_longs
 from subwinder.media import MediaFile
+from subwinder.multicall import MultiCall
 from subwinder.names import NameFormatter
 from subwinder.ranking import rank_guess_media, rank_search_subtitles
 
+_logger = logging.getLogger(__name__)
+
 
 def _build_search_query(query, lang):
     """
     Helper function for `AuthSubwinder.search_subtitles(...)` that handles converting
     the `query` to the appropriate `dict` of information for the API.
     """
-    # All queries take a language
-    internal_query = {"sublanguageid": lang_2s.convert(lang, LangFormat.LANG_3)}
+    # All queries take a language, or a comma-separated list of them
+    langs = [lang] if isinstance(lang, str) else lang
+    sub_lang_ids = [lang_2s.convert(lang_2, LangFormat.LANG_3) for lang_2 in langs]
+    internal_query = {"sublanguageid": ",".join(sub_lang_ids)}
 
     # Handle all the different formats for seaching for subtitles
     if isinstance(query, MediaFile):
@@ -67,40 +79,445 @@ def _build_search_query(query, lang):
     return internal_query
 
 
-def _batch(function, batch_size, iterables, *args, **kwargs):
+_SERIAL_EXECUTOR = SerialExecutor()
+
+
+def _batch(function, batch_size, iterables, *args, executor=None, **kwargs):
     """
     Helper function that batches calls of `function` with at most `batch_size` amount of
-    `iterables` each call. Both `args` and `kwargs` will be passed in directly.
+    `iterables` each call. The calls are run by the `executor` (one after another by
+    default). Both `args` and `kwargs` will be passed in directly.
     """
     results = []
-    for i in range(0, len(iterables[0]), batch_size):
-        chunked = []
-        for iterable in iterables:
-            chunked.append(iterable[i : i + batch_size])
-
-        result = function(*chunked, *args, **kwargs)
+    batches = _batch_iter(
+        function, batch_size, iterables, *args, executor=executor, **kwargs
+    )
+    for _, result in batches:
         if result is not None:
             results += result
 
     return results
 
 
+def _batch_iter(function, batch_size, iterables, *args, executor=None, **kwargs):
+    """
+    Same as `_batch`, but returns an iterator that yields each batch's chunks of
+    `iterables` along with its result as soon as that call finishes (in order).
+    """
+
+    def run(chunked):
+        return chunked, function(*chunked, *args, **kwargs)
+
+    chunks = (
+        [iterable[i : i + batch_size] for iterable in iterables]
+        for i in range(0, len(iterables[0]), batch_size)
+    )
+
+    return (_SERIAL_EXECUTOR if executor is None else executor).map(run, chunks)
+
+
+def _resolve_credentials(username, password, password_hash, useragent):
+    """
+    Helper function for the authenticated clients that fills in any credentials from
+    the env vars and validates them. Returns the `username`, `password_hash`,
+    `useragent` and whether the search size is limited by the useragent.
+    """
+    # Try to get any info from env vars if not passed in
+    useragent = os.environ.get(Env.USERAGENT.value) or useragent
+    username = os.environ.get(Env.USERNAME.value) or username
+    password = os.environ.get(Env.PASSWORD.value) or password
+    password_hash = os.environ.get(Env.PASSWORD_HASH.value) or password_hash
+
+    # TODO: these SubAuthErrors should really be TypeErrors or ValueErrors
+    if password_hash is not None and password is not None:
+        raise SubAuthError(
+            "`password` and `password_hash` are mutually exclusive. Only one or the"
+            " other should be set"
+        )
+
+    # Send the password as an md5 hash
+    if password is not None:
+        password_hash = hashlib.md5(password.encode("UTF-8")).hexdigest()
+
+    limited_search_size = False
+    if useragent is None or useragent == DEV_USERAGENT:
+        # TODO: warn on this once logging is setup
+        useragent = DEV_USERAGENT
+        limited_search_size = True
+
+    if username is None:
+        raise SubAuthError(
+            "missing `username`, set when initializing `AuthSubwinder` or with the"
+            f" {Env.USERNAME.value} env var"
+        )
+
+    if password_hash is None:
+        raise SubAuthError(
+            "missing password hash, this can be set from either password or"
+            " password_hash when initializing `AuthSubwinder` or by setting either"
+            f" the {Env.PASSWORD.value} or {Env.PASSWORD_HASH.value} env var"
+        )
+
+    return username, password_hash, useragent, limited_search_size
+
+
+def _prepare_downloads(downloads, download_dir, name_formatter):
+    """
+    Helper function that gets the `Subtitles` and the path to save them to for each of
+    the `downloads`.
+    """
+    type_check(downloads, (list, tuple))
+
+    sub_containers = []
+    download_paths = []
+    for download in downloads:
+        # All downloads should be some container for `Subtitles`
+        type_check(download, (SearchResult, Subtitles))
+
+        # Assume minimal info to begin
+        media_dirname = None
+        media_filename = None
+        subtitles = download
+        if isinstance(download, SearchResult):
+            # `SearchResult` holds more info than `Subtitles`
+            subtitles = download.subtitles
+            media_dirname = download.media.get_dirname()
+            media_filename = download.media.get_filename()
+        sub_containers.append(subtitles)
+
+        download_paths.append(
+            name_formatter.generate(
+                subtitles, media_filename, media_dirname, download_dir
+            )
+        )
+
+    return sub_containers, download_paths
+
+
+def _save_downloads(data, filepaths):
+    """
+    Helper function that extracts the downloaded subtitles in `data` and saves them to
+    their `filepaths`.
+    """
+    for result, fpath in zip(data, filepaths):
+        subtitles = utils.extract(result["data"])
+
+        # Create the directories if needed, then save the file
+        dirpath = fpath.parent
+        dirpath.mkdir(exist_ok=True)
+
+        # Write atomically if possible, otherwise fall back to regular writing
+        if ATOMIC_DOWNLOADS_SUPPORT:
+            with atomic_write(fpath, mode="wb") as f:
+                f.write(subtitles)
+        else:
+            with fpath.open("wb") as f:
+                f.write(subtitles)
+
+
+def _sub_container_ids(sub_containers, attr):
+    """
+    Helper function that gets the `attr` id from the `Subtitles` of each of the
+    `sub_containers`.
+    """
+    type_check(sub_containers, (list, tuple))
+
+    ids = []
+    for sub_container in sub_containers:
+        type_check(sub_container, (SearchResult, Subtitles))
+
+        if isinstance(sub_container, SearchResult):
+            sub_container = sub_container.subtitles
+        ids.append(getattr(sub_container, attr))
+
+    return ids
+
+
+def _parse_comments(ids, data):
+    """
+    Helper function that groups the `Comment`s in `data` by the order of `ids`.
+    """
+    # Group the results, if any, by the query order
+    groups = [[] for _ in ids]
+    if data:
+        for id, comments in data.items():
+            # Returned `id` has a leading _ for some reason so strip it
+            index = ids.index(id[1:])
+            groups[index] = data[id]
+
+    # Pack results, if any, into `Comment` objects
+    comments = []
+    for raw_comments in groups:
+        comments.append([Comment.from_data(c) for c in raw_comments])
+
+    return comments
+
+
+def _parse_guess_media(queries, data):
+    """
+    Helper function that converts the raw guesses in `data` to `GuessMediaResult`s in
+    the order of `queries`.
+    """
+    # Special case: `""` is just silently excluded from the response so force it
+    if "" in queries and "" not in data:
+        data[""] = {}
+
+    # Convert the raw results to `GuessMediaResult`
+    return [GuessMediaResult.from_data(data[query]) for query in queries]
+
+
+def _validate_search_queries(queries):
+    """
+    Helper function that verifies all the search `queries` are correct before doing any
+    requests. Returns the `queries` as a `list`.
+    """
+    type_check(queries, (list, tuple, zip))
+
+    # Expand out the `zip` to a `list`
+    if isinstance(queries, zip):
+        queries = list(queries)
+
+    VALID_CLASSES = (MediaFile, Movie, Episode)
+    for query_pair in queries:
+        if not isinstance(query_pair, (list, tuple)) or len(query_pair) != 2:
+            raise ValueError(
+                "The `search_subtitles` variants expect a list of pairs of the form"
+                "(<queryable>, <2 letter language code or list of them>)"
+            )
+
+        query, langs = query_pair
+        type_check(query, VALID_CLASSES)
+
+        if isinstance(langs, str):
+            langs = [langs]
+        elif not isinstance(langs, (list, tuple)) or not langs:
+            raise ValueError(
+                "Search languages should be a 2 letter language code or a non-empty"
+                f" list of them, got {repr(langs)}"
+            )
+
+        for lang_2 in langs:
+            if lang_2 not in lang_2s:
+                # Show both the 2-char and long name if invalid lang is given
+                lang_map = [f"{k} -> {v}" for k, v in zip(lang_2s, lang_longs)]
+                lang_map = "\n".join(lang_map)
+
+                raise SubLangError(
+                    f"'{lang_2}' not found in valid lang list:\n{lang_map}"
+                )
+
+    return queries
+
+
+def _search_batch_size(limited_search_size):
+    # The API limits to 5 results if the dev useragent is given so only search one
+    # item at a time. Otherwise use 20 since there should be plenty of options from
+    # the up to 500 results returned
+    return 1 if limited_search_size else 20
+
+
+def _add_search_result(groups, queries, raw_result):
+    """
+    Helper function that adds the `raw_result` as a `SearchResult` to the group of the
+    query that it matched from `queries`.
+    """
+    # Results are returned in an arbitrary order so first figure out the query
+    query_index = int(raw_result["QueryNumber"])
+    query, _ = queries[query_index]
+
+    # Go ahead and format the result as a `SearchResult`
+    result = SearchResult.from_data(raw_result)
+    result.media.set_dirname(query.get_dirname())
+    result.media.set_filename(query.get_filename())
+
+    groups[query_index].append(result)
+
+
+def _dedupe_search_queries(queries):
+    """
+    Helper function that collapses identical search `queries` (the same hash and size
+    or `imdbid`, season, and episode along with the same language) so that each is only
+    searched once. Returns the unique queries along with the index of the unique query
+    for each of `queries`.
+    """
+    unique = []
+    positions = []
+    seen = {}
+    for query, lang in queries:
+        key = tuple(sorted(_build_search_query(query, lang).items()))
+        if key not in seen:
+            seen[key] = len(unique)
+            unique.append((query, lang))
+
+        positions.append(seen[key])
+
+    return unique, positions
+
+
+def _fan_out_search_results(queries, positions, unique_results):
+    """
+    Helper function that takes the `(unique_index, group)` pairs for the queries from
+    `_dedupe_search_queries` and yields the `(index, group)` for every one of `queries`
+    that they came from. Duplicates get their own copies of the results with their own
+    dirname and filename, and queries for several languages get their results split up
+    by language.
+    """
+    indices = {}
+    for index, position in enumerate(positions):
+        indices.setdefault(position, []).append(index)
+
+    for position, group in unique_results:
+        first, *duplicates = indices[position]
+        yield first, _split_search_results(group, queries[first][1])
+
+        for index in duplicates:
+            query, langs = queries[index]
+            results = copy.deepcopy(group)
+            for result in results:
+                result.media.set_dirname(query.get_dirname())
+                result.media.set_filename(query.get_filename())
+
+            yield index, _split_search_results(results, langs)
+
+
+def _split_search_results(group, langs):
+    """
+    Helper function that splits the `group` of results for a query searching in
+    several `langs` into a `dict` of the results for each language. Queries for a
+    single language keep their `group` as is.
+    """
+    if isinstance(langs, str):
+        return group
+
+    return {
+        lang_2: [result for result in group if result.subtitles.lang_2 == lang_2]
+        for lang_2 in langs
+    }
+
+
+def _rank_search_results(ranking_func, group, query, rank_args, rank_kwargs):
+    """
+    Helper function that picks the best of the `group` of results for `query` with the
+    `ranking_func`, or the best for each language if the `group` was split up by
+    language.
+    """
+    if isinstance(group, dict):
+        return {
+            lang_2: ranking_func(results, query, *rank_args, **rank_kwargs)
+            for lang_2, results in group.items()
+        }
+
+    return ranking_func(group, query, *rank_args, **rank_kwargs)
+
+
+def _list_languages():
+    return list(zip(lang_2s, lang_3s, lang_longs))
+
+
+def _extract_previews(data):
+    """
+    Helper function that extracts and decodes each of the previews in `data`.
+    """
+    previews = []
+    for preview in data:
+        encoding = preview["encoding"]
+        contents = preview["contents"]
+
+        # Extract and decode the previews
+        previews.append(utils.extract(contents).decode(encoding))
+
+    return previews
+
+
 class Subwinder:
     """
     The class used for all unauthenticated functionality exposed by the library.
     """
 
     _token = None
+    # Any extra options passed through to `request`, only holds what's been customized
+    _request_options = {}
+    _executor = None
+
+    def __init__(
+        self,
+        transport=None,
+        rate_limiter=None,
+        metrics=None,
+        api_base=None,
+        cache=None,
+        single_flight=None,
+        executor=None,
+    ):
+        """
+        By default all `Subwinder`s share one pool of connections to the API, but a
+        different `transport` (like a `SafePooledTransport`) can be provided to use
+        instead. A `rate_limiter` (like a `RateLimiter`) can be provided to meter
+        requests before they're sent, and a `metrics` hook (like a `MetricsCollector`)
+        to record measurements for each request. `api_base` overrides the URL of the
+        API (like for pointing at a local stand-in server), a `ResponseCache` can be
+        given as the `cache` to reuse responses from idempotent endpoints, a
+        `SingleFlight` to coalesce identical requests that are in flight at once, and
+        an `executor` (like a `ThreadedExecutor`) to run batched requests with.
+        """
+        self._request_options = {}
+        if transport is not None or api_base is not None:
+            self._request_options["client"] = subwinder._request.build_client(
+                transport, API_BASE if api_base is None else api_base
+            )
+        if rate_limiter is not None:
+            self._request_options["rate_limiter"] = rate_limiter
+        if metrics is not None:
+            self._request_options["metrics"] = metrics
+        if cache is not None:
+            self._request_options["cache"] = cache
+        if single_flight is not None:
+            self._request_options["single_flight"] = single_flight
+        self._executor = executor
 
     def __repr__(self):
         return f"{self.__class__.__name__}()"
 
+    def _batch(self, function, batch_size, iterables):
+        return _batch(function, batch_size, iterables, executor=self._executor)
+
+    def _batch_iter(self, function, batch_size, iterables):
+        return _batch_iter(function, batch_size, iterables, executor=self._executor)
+
+    def _session_token(self):
+        return self._token
+
     def _request(self, endpoint, *params):
         """
         Call the API `Endpoint` represented by `method` with any of the given `params`.
         """
         # Call the `request` function with our token
-        return subwinder._request.request(endpoint, self._token, *params)
+        return subwinder._request.request(
+            endpoint, self._token, *params, **self._request_options
+        )
+
+    def _multicall(self, calls):
+        """
+        Sends the `(endpoint, params)` `calls` together for a `MultiCall` returning the
+        outcome of each.
+        """
+        return subwinder._request.multicall(
+            calls, self._session_token(), **self._request_options
+        )
+
+    def _refresh_langs(self):
+        """
+        Refreshes the shared language list if it's stale. Goes through our own
+        `_request_options` so that it uses the same client as everything else.
+        """
+        _converter._maybe_update(**self._request_options)
+
+    def batch(self):
+        """
+        Returns a `MultiCall` that queues up calls to this object's methods so that
+        their requests are sent together in `system.multicall` requests.
+        """
+        return MultiCall(self)
 
     def daily_download_info(self):
         """
@@ -112,7 +529,8 @@ class Subwinder:
         """
         Gets a list of the supported languages for the API in their various formats.
         """
-        return list(zip(lang_2s, lang_3s, lang_longs))
+        self._refresh_langs()
+        return _list_languages()
 
     def server_info(self):
         """
@@ -128,53 +546,67 @@ class AuthSubwinder(Subwinder):
     """
 
     limited_search_size: bool
+    # `(username, password_hash, useragent)` used to log in again when needed
+    _credentials = None
+    _token_store = None
+    _keep_alive_thread = None
 
     def __init__(
-        self, username=None, password=None, password_hash=None, useragent=None
+        self,
+        username=None,
+        password=None,
+        password_hash=None,
+        useragent=None,
+        transport=None,
+        rate_limiter=None,
+        metrics=None,
+        api_base=None,
+        cache=None,
+        single_flight=None,
+        executor=None,
+        token_store=None,
+        lazy_login=False,
+        keep_alive=None,
     ):
         """
         Signs in the user with the given `username`, `password` and program's
         `useragent`. These can also be set as environment variables instead if that's
         preferable. If the parameter is passed in and the env var is set then the
-        parameter is used.
-        """
-        # Try to get any info from env vars if not passed in
-        useragent = os.environ.get(Env.USERAGENT.value) or useragent
-        username = os.environ.get(Env.USERNAME.value) or username
-        password = os.environ.get(Env.PASSWORD.value) or password
-        password_hash = os.environ.get(Env.PASSWORD_HASH.value) or password_hash
-
-        # TODO: these SubAuthErrors should really be TypeErrors or ValueErrors
-        if password_hash is not None and password is not None:
-            raise SubAuthError(
-                "`password` and `password_hash` are mutually exclusive. Only one or the"
-                " other should be set"
-            )
-
-        # Send the password as an md5 hash
-        if password is not None:
-            password_hash = hashlib.md5(password.encode("UTF-8")).hexdigest()
-
-        self.limited_search_size = False
-        if useragent is None or useragent == DEV_USERAGENT:
-            # TODO: warn on this once logging is setup
-            useragent = DEV_USERAGENT
-            self.limited_search_size = True
-
-        if username is None:
-            raise SubAuthError(
-                "missing `username`, set when initializing `AuthSubwinder` or with the"
-                f" {Env.USERNAME.value} env var"
-            )
+        parameter is used. `transport`, `rate_limiter`, `metrics`, `api_base`,
+        `cache`, `single_flight`, and `executor` are the same as for `Subwinder`. A
+        still valid token from the `token_store` (like a `FileTokenStore`) is reused
+        instead of logging in, and with `lazy_login` logging in waits till the first
+        request that needs it. With `keep_alive` a background thread pings the API once
+        the session has been idle for that many seconds so that it doesn't expire.
+        """
+        super().__init__(
+            transport, rate_limiter, metrics, api_base, cache, single_flight, executor
+        )
 
-        if password_hash is None:
-            raise SubAuthError(
-                "missing password hash, this can be set from either password or"
-                " password_hash when initializing `AuthSubwinder` or by setting either"
-                f" the {Env.PASSWORD.value} or {Env.PASSWORD_HASH.value} env var"
+        (
+            username,
+            password_hash,
+            useragent,
+            self.limited_search_size,
+        ) = _resolve_credentials(username, password, password_hash, useragent)
+
+        self._credentials = (username, password_hash, useragent)
+        self._token_store = token_store
+        self._login_lock = threading.Lock()
+        self._last_request = time.monotonic()
+
+        if token_store is not None:
+            self._token = token_store.load(self._token_key())
+        if self._token is None and not lazy_login:
+            self._token = self._login(username, password_hash, useragent)
+            self._save_token()
+
+        if keep_alive is not None:
+            self._keep_alive_stop = threading.Event()
+            self._keep_alive_thread = threading.Thread(
+                target=self._keep_alive, args=(keep_alive,), daemon=True
             )
-
-        self._token = self._login(username, password_hash, useragent)
+            self._keep_alive_thread.start()
 
     def __enter__(self):
         return self
@@ -182,15 +614,130 @@ class AuthSubwinder(Subwinder):
     def __exit__(self, exc_type, exc_value, traceback):
         # Logout on exiting `with` if all is well
         if exc_type is None:
-            self._logout()
+            self.close()
+        else:
+            self._stop_keep_alive()
 
     def __repr__(self):
         return f"{self.__class__.__name__}(_token: {repr(self._token)})"
 
+    def close(self):
+        """
+        Stops the `keep_alive` thread and logs out of the session just like exiting
+        `with` does. The session is kept around instead if there's a `token_store`.
+        Only needed when `AuthSubwinder` isn't used with `with`.
+        """
+        self._stop_keep_alive()
+
+        # Unless the session is being kept around in the `token_store` for later (or
+        # there was never a session)
+        if self._token_store is None and self._token is not None:
+            self._logout()
+
+    def _request(self, endpoint, *params):
+        if self._credentials is None or endpoint in _TOKENLESS_ENDPOINTS:
+            return super()._request(endpoint, *params)
+
+        token = self._session_token()
+        try:
+            return super()._request(endpoint, *params)
+        except SubAuthError as e:
+            # Only a rejected session (401) is fixed by logging in again. The other
+            # auth errors are about the useragent which a new session won't help
+            if e.status_code != "401":
+                raise
+
+            # Most likely the session expired, so log in again and retry just once
+            self._relogin(token)
+            return super()._request(endpoint, *params)
+
+    def _multicall(self, calls):
+        if self._credentials is None:
+            return super()._multicall(calls)
+
+        token = self._session_token()
+        outcomes = super()._multicall(calls)
+
+        # Same as with `_request`, calls rejected for an expired session get retried
+        # once after logging in again
+        rejected = [
+            index
+            for index, outcome in enumerate(outcomes)
+            if isinstance(outcome, SubAuthError) and outcome.status_code == "401"
+        ]
+        if rejected:
+            self._relogin(token)
+            retried = super()._multicall([calls[index] for index in rejected])
+            for index, outcome in zip(rejected, retried):
+                outcomes[index] = outcome
+
+        return outcomes
+
+    def _session_token(self):
+        # Every authenticated request goes through here, so it counts as activity
+        self._last_request = time.monotonic()
+
+        # Handles the deferred login for `lazy_login`
+        if self._token is None and self._credentials is not None:
+            with self._login_lock:
+                if self._token is None:
+                    self._token = self._login(*self._credentials)
+                    self._save_token()
+
+        return self._token
+
+    def _relogin(self, stale_token):
+        with self._login_lock:
+            # Another thread may have already replaced the stale token
+            if self._token == stale_token:
+                self._token = self._login(*self._credentials)
+                self._save_token()
+
+    def _keep_alive(self, interval):
+        while True:
+            idle = time.monotonic() - self._last_request
+            if self._keep_alive_stop.wait(max(interval - idle, 0)):
+                return
+
+            # Only ping if there wasn't any other request in the meantime
+            if time.monotonic() - self._last_request < interval:
+                continue
+
+            if self._token is None:
+                # Nothing to keep alive till logging in, so check back later
+                self._last_request = time.monotonic()
+                continue
+
+            try:
+                self.ping()
+            except (SubwinderError, OSError) as e:
+                # The ping counted as activity so this tries again after `interval`.
+                # Network errors are included so that one blip doesn't end the thread
+                _logger.warning("Keep-alive ping failed, retrying later: %r", e)
+                continue
+
+            # The session was extended so the stored token stays good for longer too
+            self._save_token()
+
+    def _stop_keep_alive(self):
+        if self._keep_alive_thread is not None:
+            self._keep_alive_stop.set()
+            self._keep_alive_thread.join()
+            self._keep_alive_thread = None
+
+    def _token_key(self):
+        username, _, useragent = self._credentials
+        return f"{useragent}:{username}"
+
+    def _save_token(self):
+        if self._token_store is not None:
+            self._token_store.save(self._token_key(), self._token)
+
     def _login(self, username, password, useragent):
         """
         Handles logging in the user with the provided information and storing the auth
-        token. Automatically called by `__init__` so no need to call it directly.
+        token. Automatically called by `__init__` (or on the first request that needs
+        it with `lazy_login`) so no need to call it directly.
         """
         resp = self._request(Endpoints.LOG_IN, username, password, "en", useragent)
         return resp["token"]
@@ -200,9 +747,14 @@ class AuthSubwinder(Subwinder):
         Attempts to log out the user from the current session. Automatically called on
         exiting `with` so no need to call it directly.
         """
+        self._stop_keep_alive()
+
         self._request(Endpoints.LOG_OUT)
         self._token = None
 
+        if self._token_store is not None:
+            self._token_store.clear(self._token_key())
+
     def download_subtitles(
         self,
         downloads,
@@ -215,30 +767,11 @@ class AuthSubwinder(Subwinder):
         `download_dir` is provided. Files are automatically named according to the
         provided `name_format`.
         """
-        type_check(downloads, (list, tuple))
-
-        sub_containers = []
-        download_paths = []
-        for download in downloads:
-            # All downloads should be some container for `Subtitles`
-            type_check(download, (SearchResult, Subtitles))
-
-            # Assume minimal info to begin
-            media_dirname = None
-            media_filename = None
-            subtitles = download
-            if isinstance(download, SearchResult):
-                # `SearchResult` holds more info than `Subtitles`
-                subtitles = download.subtitles
-                media_dirname = download.media.get_dirname()
-                media_filename = download.media.get_filename()
-            sub_containers.append(subtitles)
-
-            download_paths.append(
-                name_formatter.generate(
-                    subtitles, media_filename, media_dirname, download_dir
-                )
-            )
+        # Naming the files can need the language list
+        self._refresh_langs()
+        sub_containers, download_paths = _prepare_downloads(
+            downloads, download_dir, name_formatter
+        )
 
         # TODO: don't need to do this if there's nothing to download
         # Check that the user has enough downloads remaining to satisfy all `downloads`
@@ -250,7 +783,7 @@ class AuthSubwinder(Subwinder):
             )
 
         # Download the subtitles in batches of 20, per api spec
-        _batch(self._download_subtitles, 20, [sub_containers, download_paths])
+        self._batch(self._download_subtitles, 20, [sub_containers, download_paths])
 
         # Return the list of paths where subtitle files were saved
         return download_paths
@@ -261,57 +794,26 @@ class AuthSubwinder(Subwinder):
         sub_file_ids = [sub_container.file_id for sub_container in sub_containers]
 
         data = self._request(Endpoints.DOWNLOAD_SUBTITLES, sub_file_ids)["data"]
-
-        for result, fpath in zip(data, filepaths):
-            subtitles = utils.extract(result["data"])
-
-            # Create the directories if needed, then save the file
-            dirpath = fpath.parent
-            dirpath.mkdir(exist_ok=True)
-
-            # Write atomically if possible, otherwise fall back to regular writing
-            if ATOMIC_DOWNLOADS_SUPPORT:
-                with atomic_write(fpath, mode="wb") as f:
-                    f.write(subtitles)
-            else:
-                with fpath.open("wb") as f:
-                    f.write(subtitles)
+        _save_downloads(data, filepaths)
 
     def get_comments(self, sub_containers):
         """
         Get all `Comment`s for the provided `search_results` if there are any.
         """
-        type_check(sub_containers, (list, tuple))
-
-        ids = []
-        for sub_container in sub_containers:
-            type_check(sub_container, (SearchResult, Subtitles))
-
-            if isinstance(sub_container, SearchResult):
-                sub_container = sub_container.subtitles
-            ids.append(sub_container.id)
+        ids = _sub_container_ids(sub_containers, "id")
         data = self._request(Endpoints.GET_COMMENTS, ids)["data"]
 
-        # Group the results, if any, by the query order
-        groups = [[] for _ in sub_containers]
-        if data:
-            for id, comments in data.items():
-                # Returned `id` has a leading _ for some reason so strip it
-                index = ids.index(id[1:])
-                groups[index] = data[id]
-
-        # Pack results, if any, into `Comment` objects
-        comments = []
-        for raw_comments in groups:
-            comments.append([Comment.from_data(c) for c in raw_comments])
-
-        return comments
+        return _parse_comments(ids, data)
 
     def user_info(self):
         """
         Get information stored for the current user.
         """
-        return FullUser.from_data(self._request(Endpoints.GET_USER_INFO)["data"])
+        data = self._request(Endpoints.GET_USER_INFO)["data"]
+
+        # The preferred languages get converted with the language list
+        self._refresh_langs()
+        return FullUser.from_data(data)
 
     def ping(self):
         """
@@ -348,17 +850,12 @@ class AuthSubwinder(Subwinder):
         type_check(queries, (list, tuple))
 
         # Batch to 3 per api spec
-        return _batch(self._guess_media_unranked, 3, [queries])
+        return self._batch(self._guess_media_unranked, 3, [queries])
 
     def _guess_media_unranked(self, queries):
         data = self._request(Endpoints.GUESS_MOVIE_FROM_STRING, queries)["data"]
 
-        # Special case: `""` is just silently excluded from the response so force it
-        if "" in queries and "" not in data:
-            data[""] = {}
-
-        # Convert the raw results to `GuessMediaResult`
-        return [GuessMediaResult.from_data(data[query]) for query in queries]
+        return _parse_guess_media(queries, data)
 
     # TODO: can we ensure that the `search_result` was matched using a file hash before
     #       calling this endpoint
@@ -414,7 +911,9 @@ class AuthSubwinder(Subwinder):
         # And select the best results with the `ranking_func`
         selected = []
         for group, (query, _) in zip(groups, queries):
-            selected.append(ranking_func(group, query, *rank_args, **rank_kwargs))
+            selected.append(
+                _rank_search_results(ranking_func, group, query, rank_args, rank_kwargs)
+            )
 
         return selected
 
@@ -426,66 +925,98 @@ class AuthSubwinder(Subwinder):
         also gets passed the provided `*args` and `**kwargs`.
         """
         # Verify that all the queries are correct before doing any requests
-        type_check(queries, (list, tuple, zip))
-
-        # Expand out the `zip` to a `list`
-        if isinstance(queries, zip):
-            queries = list(queries)
-
-        VALID_CLASSES = (MediaFile, Movie, Episode)
-        for query_pair in queries:
-            if not isinstance(query_pair, (list, tuple)) or len(query_pair) != 2:
-                raise ValueError(
-                    "The `search_subtitles` variants expect a list of pairs of the form"
-                    "(<queryable>, <2 letter language code>)"
-                )
-
-            query, lang_2 = query_pair
-            type_check(query, VALID_CLASSES)
-
-            if lang_2 not in lang_2s:
-                # Show both the 2-char and long name if invalid lang is given
-                lang_map = [f"{k} -> {v}" for k, v in zip(lang_2s, lang_longs)]
-                lang_map = "\n".join(lang_map)
-
-                raise SubLangError(
-                    f"'{lang_2}' not found in valid lang list:\n{lang_map}"
-                )
+        self._refresh_langs()
+        queries = _validate_search_queries(queries)
 
-        # The API limits to 5 results if the dev useragent is given so only search one
-        # item at a time. Otherwise use 20 since there should be plenty of options from
-        # the up to 500 results returned
-        if self.limited_search_size:
-            batch_size = 1
-        else:
-            batch_size = 20
-
-        return _batch(
+        # Only search for each distinct query once
+        unique, positions = _dedupe_search_queries(queries)
+        unique_groups = self._batch(
             self._search_subtitles_unranked,
-            batch_size,
-            [queries],
+            _search_batch_size(self.limited_search_size),
+            [unique],
         )
 
+        groups = [None] * len(queries)
+        for index, group in _fan_out_search_results(
+            queries, positions, enumerate(unique_groups)
+        ):
+            groups[index] = group
+
+        return groups
+
     def _search_subtitles_unranked(self, queries):
         internal_queries = [_build_search_query(q, l) for q, l in queries]
-        data = self._request(Endpoints.SEARCH_SUBTITLES, internal_queries)["data"]
 
         # Go through the results and organize them in the order of `queries`
-        groups = [[] for _ in internal_queries]
-        for raw_result in data:
-            # Results are returned in an arbitrary order so first figure out the query
-            query_index = int(raw_result["QueryNumber"])
-            query, _ = queries[query_index]
+        groups = [[] for _ in queries]
 
-            # Go ahead and format the result as a `SearchResult`
-            result = SearchResult.from_data(raw_result)
-            result.media.set_dirname(query.get_dirname())
-            result.media.set_filename(query.get_filename())
+        def add_result(raw_result):
+            _add_search_result(groups, queries, raw_result)
 
-            groups[query_index].append(result)
+        # Results are added as they're parsed, so any left in `data` weren't streamed
+        with stream_data(add_result):
+            data = self._request(Endpoints.SEARCH_SUBTITLES, internal_queries)["data"]
+        for raw_result in data:
+            add_result(raw_result)
 
         return groups
 
+    def search_subtitles_iter(
+        self,
+        queries,
+        ranking_func=rank_search_subtitles,
+        *rank_args,
+        **rank_kwargs,
+    ):
+        """
+        Same as `search_subtitles`, but returns an iterator that yields the
+        `(query, result)` pairs as each batch of queries comes back instead of waiting
+        on all of them.
+        """
+        pairs = self.search_subtitles_unranked_iter(queries)
+
+        return (
+            (
+                query,
+                _rank_search_results(
+                    ranking_func, group, query[0], rank_args, rank_kwargs
+                ),
+            )
+            for query, group in pairs
+        )
+
+    def search_subtitles_unranked_iter(self, queries):
+        """
+        Same as `search_subtitles_unranked`, but returns an iterator that yields the
+        `(query, results)` pairs as each batch of queries comes back instead of waiting
+        on all of them.
+        """
+        # Still verify all the queries up front instead of on the first `next()`
+        self._refresh_langs()
+        queries = _validate_search_queries(queries)
+
+        unique, positions = _dedupe_search_queries(queries)
+        batches = self._batch_iter(
+            self._search_subtitles_unranked,
+            _search_batch_size(self.limited_search_size),
+            [unique],
+        )
+        unique_groups = (group for _, groups in batches for group in groups)
+
+        def pairs():
+            # Duplicates can come back early, so hold on to them till it's their turn
+            finished = {}
+            next_index = 0
+            for index, group in _fan_out_search_results(
+                queries, positions, enumerate(unique_groups)
+            ):
+                finished[index] = group
+                while next_index in finished:
+                    yield queries[next_index], finished.pop(next_index)
+                    next_index += 1
+
+        return pairs()
+
     def suggest_media(self, query):
         """
         Suggest results for guesses of what media is described by `query`.
@@ -547,29 +1078,14 @@ class AuthSubwinder(Subwinder):
         Gets a preview for the subtitles represented by `results`. Useful for being able
         to see part of the subtitles without eating into your daily download limit.
         """
-        type_check(sub_containers, (list, tuple))
-
         # Get the subtitles file_ids from `sub_containers`
-        file_ids = []
-        for sub_container in sub_containers:
-            type_check(sub_container, (SearchResult, Subtitles))
-            if isinstance(sub_container, SearchResult):
-                sub_container = sub_container.subtitles
-            file_ids.append(sub_container.file_id)
+        file_ids = _sub_container_ids(sub_containers, "file_id")
 
         # Batch to 20 per api spec
-        return _batch(self._preview_subtitles, 20, [file_ids])
+        return self._batch(self._preview_subtitles, 20, [file_ids])
 
     def _preview_subtitles(self, ids):
         data = self._request(Endpoints.PREVIEW_SUBTITLES, ids)["data"]
 
         # Unpack our data
-        previews = []
-        for preview in data:
-            encoding = preview["encoding"]
-            contents = preview["contents"]
-
-            # Extract and decode the previews
-            previews.append(utils.extract(contents).decode(encoding))
-
-        return previews
+        return _extract_previews(data)
@@ -2,9 +2,12 @@ class SubwinderError(Exception):
     """
     This is the base exception that all the other custom exceptions are derived from.
     It's honestly just used when either something violates an assumption I made about
-    the API.
+    the API. Errors raised from an API response have the response's `status_code`
+    (like `"401"`), otherwise it's `None`.
     """
 
+    status_code = None
+
 
 # TODO: Return more info here like the invalid lang type and lang code
 class SubLangError(SubwinderError):
@@ -14,7 +17,6 @@ class SubLangError(SubwinderError):
     """
 
 
-# TODO: Return the error type here
 class SubAuthError(SubwinderError):
     """
     Raised when trying to use `AuthSubwinder` without providing a username, password, or
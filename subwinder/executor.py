@@ -0,0 +1,189 @@
+import contextvars
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from subwinder._internal_utils import bounded_map
+
+# The `AdaptiveExecutor` (and the round it's on) that requests should report back to
+_feedback = contextvars.ContextVar("_feedback", default=None)
+
+
+def _report_status(status_code, congested):
+    """
+    Lets the `AdaptiveExecutor` running the current batch (if any) know how a request
+    went. `congested` is set for any response that means backing off.
+    """
+    feedback = _feedback.get()
+    if feedback is not None:
+        executor, epoch = feedback
+        if congested:
+            executor._on_congestion(epoch)
+        elif status_code == "200":
+            executor._on_success()
+
+
+class BatchExecutor:
+    """
+    Base class for anything that runs the batched requests made by methods like
+    `AuthSubwinder.search_subtitles` where the API limits how much can be sent in one
+    request.
+    """
+
+    def map(self, function, iterable):
+        """
+        Returns an iterator of the results of calling `function` on each item from
+        `iterable` in the same order as `iterable`.
+        """
+        raise NotImplementedError
+
+
+class SerialExecutor(BatchExecutor):
+    """
+    Runs each batch one after another. This is the default.
+    """
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}()"
+
+    def map(self, function, iterable):
+        return map(function, iterable)
+
+
+class ThreadedExecutor(BatchExecutor):
+    """
+    Runs up to `max_workers` batches at the same time using a pool of threads while
+    still returning the results in order.
+    """
+
+    def __init__(self, max_workers=4):
+        if max_workers < 1:
+            raise ValueError(f"`max_workers` must be at least 1, got {max_workers}")
+
+        self.max_workers = max_workers
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(max_workers: {self.max_workers})"
+
+    def map(self, function, iterable):
+        # Each batch runs in the caller's context so things like `bypass_cache` and
+        # `track_transfer` still apply from the worker threads
+        def run(item):
+            context, value = item
+            return context.run(function, value)
+
+        items = ((contextvars.copy_context(), value) for value in iterable)
+
+        return bounded_map(run, items, self.max_workers)
+
+
+class AdaptiveExecutor(BatchExecutor):
+    """
+    Runs batches at the same time like `ThreadedExecutor`, but adjusts how many are in
+    flight based on how the API is responding. The limit grows additively while
+    requests succeed and gets cut multiplicatively whenever the API responds that it's
+    rate limiting or overloaded (429, 503, 506, or 520). `concurrency` is the current
+    limit and `backoffs` counts how many times it's been cut.
+    """
+
+    def __init__(
+        self,
+        min_concurrency=1,
+        max_concurrency=16,
+        initial_concurrency=4,
+        increase=1,
+        decrease=0.5,
+    ):
+        """
+        The limit starts at `initial_concurrency` and stays within `min_concurrency`
+        and `max_concurrency`. It grows by about `increase` for each round of requests
+        that succeed and gets multiplied by `decrease` on backing off.
+        """
+        if min_concurrency < 1:
+            raise ValueError(
+                f"`min_concurrency` must be at least 1, got {min_concurrency}"
+            )
+        if not min_concurrency <= initial_concurrency <= max_concurrency:
+            raise ValueError(
+                "`initial_concurrency` must be between `min_concurrency` and"
+                f" `max_concurrency`, got {initial_concurrency}"
+            )
+        if increase <= 0:
+            raise ValueError(f"`increase` must be positive, got {increase}")
+        if not 0 < decrease < 1:
+            raise ValueError(f"`decrease` must be between 0 and 1, got {decrease}")
+
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.increase = increase
+        self.decrease = decrease
+        self.backoffs = 0
+
+        self._lock = threading.Lock()
+        self._limit = float(initial_concurrency)
+        # Bumped on every cut so one burst of errors only cuts the limit once
+        self._epoch = 0
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(concurrency: {self.concurrency})"
+
+    @property
+    def concurrency(self):
+        return int(self._limit)
+
+    def map(self, function, iterable):
+        def run(item):
+            context, value = item
+            return context.run(self._run, function, value)
+
+        iterator = iter(iterable)
+        pending = deque()
+        executor = ThreadPoolExecutor(max_workers=self.max_concurrency)
+        try:
+            while True:
+                # Top up to the current limit before waiting on anything
+                running = [future for future in pending if not future.done()]
+                while len(running) < self.concurrency:
+                    try:
+                        item = (contextvars.copy_context(), next(iterator))
+                    except StopIteration:
+                        break
+
+                    future = executor.submit(run, item)
+                    pending.append(future)
+                    running.append(future)
+
+                if not pending:
+                    return
+
+                if pending[0].done():
+                    yield pending.popleft().result()
+                else:
+                    wait(running, return_when=FIRST_COMPLETED)
+        finally:
+            # Don't bother running anything that's left if the caller bailed early
+            for future in pending:
+                future.cancel()
+            executor.shutdown()
+
+    def _run(self, function, value):
+        with self._lock:
+            epoch = self._epoch
+
+        _feedback.set((self, epoch))
+        return function(value)
+
+    def _on_success(self):
+        with self._lock:
+            limit = self._limit + self.increase / self._limit
+            self._limit = min(limit, self.max_concurrency)
+
+    def _on_congestion(self, epoch):
+        with self._lock:
+            # Requests started before the last cut were already accounted for
+            if epoch != self._epoch:
+                return
+
+            self._epoch += 1
+            self.backoffs += 1
+            self._limit = max(self._limit * self.decrease, self.min_concurrency)
@@ -389,7 +389,7 @@ class GuessMediaResult:
         # So this one is a bit complicated, from what I've seen sometimes this is a
         # `dict` where the key is the IMDB id, and sometimes its a `list` with length 1
         from_string = data[FROM_STRING_KEY]
-        if type(from_string) == dict:
+        if isinstance(from_string, dict):
             from_string = list(from_string.values())
 
         if len(from_string) > 0:
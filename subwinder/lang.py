@@ -1,5 +1,6 @@
 # Note: this whole file uses enough global variables to make my skin crawl, but I can't
 # really think of a nicer way of exposing everything
+import threading
 from dataclasses import dataclass
 from datetime import datetime
 from enum import Enum
@@ -37,30 +38,48 @@ class _LangConverter:
     """
 
     def __init__(self):
+        # Held while refreshing so that threads needing a refresh at the same time
+        # share one request
+        self._update_lock = threading.Lock()
         self.default()
 
-    def _fetch(self):
-        return subwinder._request.request(Endpoints.GET_SUB_LANGUAGES, None)["data"]
+    def _fetch(self, **request_options):
+        return subwinder._request.request(
+            Endpoints.GET_SUB_LANGUAGES, None, **request_options
+        )["data"]
 
-    def _maybe_update(self, force=False):
+    def _maybe_update(self, force=False, **request_options):
         # Language list should refresh every hour, return early if still fresh unless
         # update is `force`d
-        if not force and self._last_updated is not None:
-            if (datetime.now() - self._last_updated).total_seconds() < 3600:
+        last_updated = self._last_updated
+        if not force and self._is_fresh(last_updated):
+            return
+
+        with self._update_lock:
+            # Some other thread already refreshed the list while we were waiting
+            if self._last_updated != last_updated:
                 return
 
-        # Get language list from api
-        lang_sets = self._fetch()
+            # Get language list from api, `request_options` let clients send it over
+            # their own connection (like one with a different `api_base`)
+            self._update(self._fetch(**request_options))
 
-        # Reset then recollect info
-        self.default()
+    def _update(self, lang_sets):
+        # Collect the info before swapping it in so readers never see a partial list
+        langs = [[] for _ in LangFormat]
         for lang_set in lang_sets:
             for lang_format in LangFormat:
                 lang = lang_set[_LangKey.from_format(lang_format).value]
-                self._langs[lang_format.value].append(lang)
+                langs[lang_format.value].append(lang)
 
         # Refresh updated time
-        self._last_updated = datetime.now()
+        self.set(datetime.now(), langs)
+
+    def _is_fresh(self, last_updated):
+        if last_updated is None:
+            return False
+
+        return (datetime.now() - last_updated).total_seconds() < 3600
 
     def default(self):
         self.set(None, [[] for _ in list(LangFormat)])
@@ -1,7 +1,21 @@
+import os
+import sqlite3
 from dataclasses import dataclass
+from datetime import datetime
 from pathlib import Path
+from typing import List
 
-from subwinder.utils import special_hash
+from subwinder._constants import TIME_FORMAT
+from subwinder._internal_utils import bounded_map, type_check
+from subwinder.exceptions import SubHashError
+from subwinder.ranking import rank_search_subtitles
+from subwinder.utils import (
+    _FILE_MIN_SIZE,
+    HashBackend,
+    _as_hash_error,
+    _hash_file,
+    _is_range_reader,
+)
 
 
 @dataclass
@@ -15,17 +29,54 @@ class MediaFile:
     _dirname: Path
     _filename: Path
 
-    def __init__(self, filepath):
+    def __init__(self, filepath, cache=None, backend=HashBackend.BUFFERED):
         """
-        Builds a `MediaFile` object from a local file.
+        Builds a `MediaFile` object from a local file. The hash is looked up in the
+        `HashCache` `cache` first if one is given and the file is read using the
+        `HashBackend` `backend`. `filepath` can also be a range reader like with
+        `special_hash`.
         """
-        filepath = Path(filepath)
-        hash = special_hash(filepath)
-        size = filepath.stat().st_size
+        self._from_filepath(filepath, cache, backend)
+
+    def _from_filepath(
+        self, filepath, cache=None, backend=HashBackend.BUFFERED, stat=None
+    ):
+        hash, size = _hash_file(filepath, cache, backend, stat)
 
         self._from_parts(hash, size)
-        # Set file info from given `filepath`
-        self.set_filepath(filepath)
+        # Set file info from given `filepath` (range readers may have a `name`)
+        if _is_range_reader(filepath):
+            self.set_filepath(getattr(filepath, "name", None))
+        else:
+            self.set_filepath(filepath)
+
+        return self
+
+    @classmethod
+    def from_paths(
+        cls,
+        filepaths,
+        max_workers=8,
+        ordered=True,
+        cache=None,
+        backend=HashBackend.BUFFERED,
+    ):
+        """
+        Lazily builds `MediaFile` objects for all of the `filepaths` using up to
+        `max_workers` threads. Any file that can't be hashed (including ones that are
+        missing or unreadable) yields a `SubHashError` instead. Results are in the same
+        order as `filepaths` unless `ordered` is `False` in which case they're yielded
+        as soon as they're ready. `cache` and `backend` are used for each file just
+        like with the constructor.
+        """
+
+        def try_from_path(filepath):
+            try:
+                return cls(filepath, cache, backend)
+            except (SubHashError, OSError) as e:
+                return _as_hash_error(filepath, e)
+
+        return bounded_map(try_from_path, filepaths, max_workers, ordered)
 
     @classmethod
     def from_parts(cls, hash, size, dirname=None, filename=None):
@@ -73,3 +124,313 @@ class MediaFile:
 
     def get_dirname(self):
         return self._dirname
+
+
+@dataclass
+class RescanReport:
+    """
+    Data container for the changes found by `MediaLibrary.rescan(...)`.
+    """
+
+    added: List[MediaFile]
+    changed: List[MediaFile]
+    removed: List[Path]
+
+    @property
+    def delta(self):
+        """
+        All the `MediaFile`s that are either new or changed since the last scan.
+        """
+        return self.added + self.changed
+
+
+class MediaLibrary:
+    """
+    Helpers for working with whole directories of media files. Building a
+    `MediaLibrary` with an `index_path` keeps a persistent index of the scanned files
+    so that rescans only have to hash and search for files that are new or changed.
+    """
+
+    def __init__(self, index_path):
+        """
+        Opens (or creates) the file index stored at `index_path`.
+        """
+        self._conn = sqlite3.connect(str(index_path))
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS files ("
+                " dirname TEXT NOT NULL,"
+                " filename TEXT NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " mtime_ns INTEGER NOT NULL,"
+                " hash TEXT NOT NULL,"
+                " last_searched TEXT,"
+                " last_result TEXT,"
+                " PRIMARY KEY (dirname, filename)"
+                ")"
+            )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        return self._conn.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+
+    def close(self):
+        self._conn.close()
+
+    @classmethod
+    def scan(
+        cls,
+        root,
+        extensions=None,
+        min_size=_FILE_MIN_SIZE,
+        cache=None,
+        backend=HashBackend.BUFFERED,
+    ):
+        """
+        Lazily walks the directory tree under `root` yielding a `MediaFile` for every
+        file that's at least `min_size` bytes. `extensions` optionally limits the files
+        to those with a matching (case-insensitive) extension. Files that can't be
+        hashed are skipped. `cache` and `backend` are used for each file just like with
+        the `MediaFile` constructor.
+        """
+        for _, matches, _ in cls._scan_dirs(root, extensions, min_size):
+            for entry, stat in matches or []:
+                media = _try_media_from_entry(entry, stat, cache, backend)
+                if media is not None:
+                    yield media
+
+    def rescan(
+        self,
+        root,
+        extensions=None,
+        min_size=_FILE_MIN_SIZE,
+        cache=None,
+        backend=HashBackend.BUFFERED,
+    ):
+        """
+        Scans `root` just like `.scan(...)`, but only hashes files that are new or have
+        a different size or modification time from what's in the index. The index is
+        updated to match and a `RescanReport` of the changes is returned.
+        """
+        root = os.path.abspath(root)
+        report = RescanReport(added=[], changed=[], removed=[])
+
+        visited = set()
+        # Paths that couldn't be checked, so nothing under them is known to be gone
+        unchecked = []
+        with self._conn:
+            for dirname, matches, failed in self._scan_dirs(root, extensions, min_size):
+                visited.add(dirname)
+                if matches is None:
+                    unchecked.append(dirname)
+                    continue
+
+                unchecked += [os.path.join(dirname, name) for name in failed]
+                self._rescan_dir(dirname, matches, failed, cache, backend, report)
+
+            # Anything left in directories that weren't visited is gone now
+            rows = self._conn.execute("SELECT DISTINCT dirname FROM files")
+            for (dirname,) in rows.fetchall():
+                if dirname in visited or not _is_relative_to(dirname, root):
+                    continue
+                if any(_is_relative_to(dirname, path) for path in unchecked):
+                    continue
+
+                for (filename,) in self._conn.execute(
+                    "SELECT filename FROM files WHERE dirname = ?", (dirname,)
+                ).fetchall():
+                    report.removed.append(Path(dirname, filename))
+                self._conn.execute("DELETE FROM files WHERE dirname = ?", (dirname,))
+
+        return report
+
+    def _rescan_dir(self, dirname, matches, failed, cache, backend, report):
+        known = {
+            filename: (size, mtime_ns)
+            for filename, size, mtime_ns in self._conn.execute(
+                "SELECT filename, size, mtime_ns FROM files WHERE dirname = ?",
+                (dirname,),
+            )
+            # Entries that couldn't be checked keep whatever is in the index
+            if filename not in failed
+        }
+
+        for entry, stat in matches:
+            identity = known.pop(entry.name, None)
+            if identity == (stat.st_size, stat.st_mtime_ns):
+                # Unchanged so there's no need to even hash it
+                continue
+
+            try:
+                media = _media_from_entry(entry, stat, cache, backend)
+            except (SubHashError, FileNotFoundError):
+                # Couldn't be hashed, so treat it like it isn't there
+                if identity is not None:
+                    known[entry.name] = identity
+                continue
+            except OSError:
+                # It's still there, but can't be read right now so leave it be
+                continue
+
+            # Any previous search results are stale now
+            self._conn.execute(
+                "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, NULL, NULL)",
+                (dirname, entry.name, stat.st_size, stat.st_mtime_ns, media.hash),
+            )
+            if identity is None:
+                report.added.append(media)
+            else:
+                report.changed.append(media)
+
+        # Everything we didn't come across was removed
+        for filename in known:
+            report.removed.append(Path(dirname, filename))
+        self._conn.executemany(
+            "DELETE FROM files WHERE dirname = ? AND filename = ?",
+            [(dirname, filename) for filename in known],
+        )
+
+    def unsearched(self):
+        """
+        Yields a `MediaFile` for every file in the index that hasn't been searched for
+        since it was added or changed.
+        """
+        rows = self._conn.execute(
+            "SELECT hash, size, dirname, filename FROM files"
+            " WHERE last_searched IS NULL"
+        )
+        for hash, size, dirname, filename in rows:
+            yield MediaFile.from_parts(hash, size, dirname, filename)
+
+    def search_subtitles(
+        self,
+        asw,
+        media,
+        lang,
+        ranking_func=rank_search_subtitles,
+        *rank_args,
+        **rank_kwargs,
+    ):
+        """
+        Searches for subtitles in `lang` for all of the `media` using the
+        `AuthSubwinder` `asw` and records the outcome of each search in the index.
+        Typically `media` would be the `.delta` from a `RescanReport`. Returns the same
+        results as `AuthSubwinder.search_subtitles(...)`. The index only holds one
+        result per file, so `lang` has to be a single language.
+        """
+        # Checked upfront so a bad `lang` doesn't waste any requests
+        type_check(lang, str)
+
+        media = list(media)
+        results = asw.search_subtitles(
+            [(m, lang) for m in media], ranking_func, *rank_args, **rank_kwargs
+        )
+
+        searched = datetime.now().strftime(TIME_FORMAT)
+        with self._conn:
+            self._conn.executemany(
+                "UPDATE files SET last_searched = ?, last_result = ?"
+                " WHERE dirname = ? AND filename = ?",
+                [
+                    (
+                        searched,
+                        None if result is None else result.subtitles.file_id,
+                        os.fspath(m.get_dirname()),
+                        os.fspath(m.get_filename()),
+                    )
+                    for m, result in zip(media, results)
+                ],
+            )
+
+        return results
+
+    def last_search(self, media):
+        """
+        Gets the outcome of the last search for `media` in the index as a tuple of the
+        time it was searched and the `file_id` of the subtitles that were found. Either
+        can be `None` if it hasn't been searched or nothing was found.
+        """
+        row = self._conn.execute(
+            "SELECT last_searched, last_result FROM files"
+            " WHERE dirname = ? AND filename = ?",
+            (os.fspath(media.get_dirname()), os.fspath(media.get_filename())),
+        ).fetchone()
+
+        if row is None or row[0] is None:
+            return None, None
+
+        return datetime.strptime(row[0], TIME_FORMAT), row[1]
+
+    @staticmethod
+    def _scan_dirs(root, extensions=None, min_size=_FILE_MIN_SIZE):
+        """
+        Yields `(dirname, matches, failed)` for every directory under `root` where
+        `matches` is a `list` of `(entry, stat)` for each file in that directory that
+        matches the filters and `failed` is a `set` of the names of entries that
+        couldn't be checked. `matches` is `None` if the directory couldn't be listed.
+        """
+        if extensions is not None:
+            # Normalize to lowercase with a leading "."
+            extensions = {"." + ext.lower().lstrip(".") for ext in extensions}
+
+        # Only directories that are still waiting to be scanned are held on to, so
+        # memory doesn't grow with the number of files
+        pending_dirs = [os.fspath(root)]
+        while pending_dirs:
+            dirname = pending_dirs.pop()
+            try:
+                scanner = os.scandir(dirname)
+            except OSError:
+                # Unreadable directories get skipped just like with `os.walk`
+                yield dirname, None, set()
+                continue
+
+            matches = []
+            failed = set()
+            with scanner:
+                for entry in scanner:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            pending_dirs.append(entry.path)
+                            continue
+
+                        if not entry.is_file():
+                            continue
+
+                        if extensions is not None:
+                            _, ext = os.path.splitext(entry.name)
+                            if ext.lower() not in extensions:
+                                continue
+
+                        # The size check reuses the `stat` we have to do anyways
+                        stat = entry.stat()
+                    except OSError:
+                        failed.add(entry.name)
+                        continue
+
+                    if stat.st_size >= min_size:
+                        matches.append((entry, stat))
+
+            yield dirname, matches, failed
+
+
+def _media_from_entry(entry, stat, cache, backend):
+    media = MediaFile.__new__(MediaFile)
+    return media._from_filepath(entry.path, cache, backend, stat)
+
+
+def _try_media_from_entry(entry, stat, cache, backend):
+    try:
+        return _media_from_entry(entry, stat, cache, backend)
+    except (SubHashError, OSError):
+        # Too small to hash, unreadable, or it disappeared since getting listed
+        return None
+
+
+def _is_relative_to(path, root):
+    return path == root or path.startswith(os.path.join(root, ""))
@@ -0,0 +1,197 @@
+import copy
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from subwinder.transport import track_transfer
+
+# Upper bounds in seconds for the latency histogram buckets
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+@dataclass
+class RequestMetrics:
+    """
+    Everything measured for one call to an endpoint. `status` is the status code of the
+    response or the name of the exception raised if there wasn't one. `latency` is the
+    total time in seconds including any retries while `sent_bytes` and
+    `received_bytes` are the sizes of the bodies on the wire (these are only measured
+    when using the library's transports). `cached` is set when the response came from
+    a `ResponseCache` instead of the API.
+    """
+
+    endpoint: str
+    status: Optional[str] = None
+    latency: float = 0.0
+    retries: int = 0
+    sent_bytes: int = 0
+    received_bytes: int = 0
+    cached: bool = False
+
+
+class MetricsHook:
+    """
+    Base class for anything that wants to receive the `RequestMetrics` for every
+    request made by a `Subwinder` that it's passed to.
+    """
+
+    def record(self, metrics):
+        """
+        Called with the `RequestMetrics` after each request finishes.
+        """
+        raise NotImplementedError
+
+
+@dataclass
+class EndpointStats:
+    """
+    Totals for all the requests to one endpoint. `latency_counts` holds the number of
+    requests that fell in each of the `buckets` with one final count for anything
+    slower than the last bucket. `cache_hits` counts the requests that were answered by
+    a `ResponseCache`.
+    """
+
+    buckets: tuple
+    statuses: Dict[str, int] = field(default_factory=dict)
+    latency_counts: List[int] = field(default_factory=list)
+    latency_sum: float = 0.0
+    retries: int = 0
+    sent_bytes: int = 0
+    received_bytes: int = 0
+    cache_hits: int = 0
+
+    def __post_init__(self):
+        if not self.latency_counts:
+            self.latency_counts = [0] * (len(self.buckets) + 1)
+
+    @property
+    def count(self):
+        return sum(self.statuses.values())
+
+    @property
+    def cache_hit_ratio(self):
+        return self.cache_hits / self.count if self.count else 0.0
+
+
+class MetricsCollector(MetricsHook):
+    """
+    Thread-safe in-memory `MetricsHook` that totals up the requests for each endpoint
+    with a latency histogram using the upper bounds in `buckets`.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._endpoints = {}
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(endpoints: {len(self._endpoints)})"
+
+    def record(self, metrics):
+        with self._lock:
+            stats = self._endpoints.get(metrics.endpoint)
+            if stats is None:
+                stats = self._endpoints[metrics.endpoint] = EndpointStats(self.buckets)
+
+            stats.statuses[metrics.status] = stats.statuses.get(metrics.status, 0) + 1
+            stats.latency_counts[bisect_left(self.buckets, metrics.latency)] += 1
+            stats.latency_sum += metrics.latency
+            stats.retries += metrics.retries
+            stats.sent_bytes += metrics.sent_bytes
+            stats.received_bytes += metrics.received_bytes
+            stats.cache_hits += metrics.cached
+
+    def stats(self):
+        """
+        Returns a snapshot of the `EndpointStats` keyed by endpoint name.
+        """
+        with self._lock:
+            return copy.deepcopy(self._endpoints)
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
+
+
+def to_prometheus(collector, prefix="subwinder", executor=None):
+    """
+    Formats everything in the `MetricsCollector` in the Prometheus text exposition
+    format with each metric name starting with `prefix`. The current concurrency and
+    number of back offs are included for an `AdaptiveExecutor` given as `executor`.
+    """
+    endpoints = sorted(collector.stats().items())
+    lines = []
+
+    def add_metric(name, kind, help_text):
+        lines.append(f"# HELP {prefix}_{name} {help_text}")
+        lines.append(f"# TYPE {prefix}_{name} {kind}")
+
+    add_metric("requests_total", "counter", "Requests by endpoint and status.")
+    for endpoint, stats in endpoints:
+        for status, count in sorted(stats.statuses.items()):
+            labels = f'endpoint="{endpoint}",status="{status}"'
+            lines.append(f"{prefix}_requests_total{{{labels}}} {count}")
+
+    name = "request_duration_seconds"
+    add_metric(name, "histogram", "Request latency including retries.")
+    for endpoint, stats in endpoints:
+        # Prometheus buckets are cumulative
+        cumulative = 0
+        bounds = [str(bound) for bound in stats.buckets] + ["+Inf"]
+        for bound, count in zip(bounds, stats.latency_counts):
+            cumulative += count
+            labels = f'endpoint="{endpoint}",le="{bound}"'
+            lines.append(f"{prefix}_{name}_bucket{{{labels}}} {cumulative}")
+
+        labels = f'endpoint="{endpoint}"'
+        lines.append(f"{prefix}_{name}_sum{{{labels}}} {stats.latency_sum}")
+        lines.append(f"{prefix}_{name}_count{{{labels}}} {stats.count}")
+
+    for name, attr, help_text in (
+        ("request_retries_total", "retries", "Retries spent backing off."),
+        ("request_sent_bytes_total", "sent_bytes", "Request bytes on the wire."),
+        (
+            "response_received_bytes_total",
+            "received_bytes",
+            "Response bytes on the wire.",
+        ),
+        ("request_cache_hits_total", "cache_hits", "Requests answered by a cache."),
+    ):
+        add_metric(name, "counter", help_text)
+        for endpoint, stats in endpoints:
+            labels = f'endpoint="{endpoint}"'
+            lines.append(f"{prefix}_{name}{{{labels}}} {getattr(stats, attr)}")
+
+    if executor is not None:
+        add_metric("batch_concurrency", "gauge", "Batches allowed in flight at once.")
+        lines.append(f"{prefix}_batch_concurrency {executor.concurrency}")
+        add_metric("batch_backoffs_total", "counter", "Cuts to the batch concurrency.")
+        lines.append(f"{prefix}_batch_backoffs_total {executor.backoffs}")
+
+    return "\n".join(lines) + "\n"
+
+
+@contextmanager
+def measure(hook, endpoint):
+    """
+    Measures the request to the `endpoint` (by name) made within the `with` statement,
+    then passes the `RequestMetrics` on to `hook`. The `status` and `retries` should be
+    filled in by the caller.
+    """
+    metrics = RequestMetrics(endpoint)
+    start = time.perf_counter()
+    try:
+        with track_transfer() as transfer:
+            yield metrics
+    except BaseException as err:
+        if metrics.status is None:
+            metrics.status = type(err).__name__
+        raise
+    finally:
+        metrics.latency = time.perf_counter() - start
+        metrics.sent_bytes = transfer.sent_bytes
+        metrics.received_bytes = transfer.received_bytes
+        hook.record(metrics)
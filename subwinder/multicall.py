@@ -0,0 +1,137 @@
+import copy
+import functools
+from concurrent.futures import Future
+
+
+class _Queued(BaseException):
+    """
+    Unwinds a queued call once it makes a request that hasn't been sent yet. It's a
+    `BaseException` so that the call's own error handling doesn't catch it.
+    """
+
+
+class MultiCall:
+    """
+    Queues up calls to the public methods of a `Subwinder` (or `AuthSubwinder`) which
+    each return a `concurrent.futures.Future` for their result. Once sent, the
+    requests made by all the queued calls are bundled together into `system.multicall`
+    requests so that independent calls share round trips to the API.
+    """
+
+    def __init__(self, subwinder):
+        self._subwinder = subwinder
+        self._calls = []
+
+        # The responses for the call that's currently running, in the order that it
+        # made the requests, and how many it's used so far
+        self._outcomes = []
+        self._used = 0
+        # The request that the current call is waiting on
+        self._queued = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # Send everything off on exiting `with` if all is well
+        if exc_type is None:
+            self.send()
+        else:
+            for *_, future in self._calls:
+                future.cancel()
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(queued: {len(self._calls)})"
+
+    def __getattr__(self, name):
+        method = getattr(self._subwinder, name)
+        if name.startswith("_") or not callable(method):
+            raise AttributeError(f"Only public methods can be queued, not '{name}'")
+
+        @functools.wraps(method)
+        def queue(*args, **kwargs):
+            future = Future()
+            self._calls.append((name, args, kwargs, future))
+            return future
+
+        return queue
+
+    def send(self):
+        """
+        Runs all the queued calls, sending their requests together in rounds until they
+        are all finished. The result or exception for each call is set on its `Future`.
+        """
+        # Skip over any calls that were cancelled in the meantime
+        calls = [
+            (*call, [])
+            for call in self._calls
+            if call[-1].set_running_or_notify_cancel()
+        ]
+        self._calls = []
+
+        # The queued methods run on a copy whose requests get queued for the next round
+        # instead of being sent right away
+        proxy = copy.copy(self._subwinder)
+        proxy._request = self._queue_request
+        # Each call can only wait on one request at a time
+        proxy._executor = None
+
+        # Every call runs till it either finishes or makes a request that hasn't been
+        # sent yet. Once a round of requests comes back the waiting calls are run again
+        # from the start with their earlier requests answered from what came back, so
+        # the calls don't each need a thread to wait in
+        while calls:
+            waiting = []
+            for call in calls:
+                request = self._run_call(proxy, *call)
+                if request is not None:
+                    waiting.append((call, request))
+
+            if not waiting:
+                break
+
+            outcomes = self._send_round([request for _, request in waiting])
+            for (call, _), outcome in zip(waiting, outcomes):
+                call[-1].append(outcome)
+
+            calls = [call for call, _ in waiting]
+
+    def _send_round(self, requests):
+        try:
+            # Goes through the `Subwinder` so that things like logging in again on an
+            # expired session still apply
+            return self._subwinder._multicall(requests)
+        except Exception as err:
+            # Nothing went through so every call gets the error
+            return [err] * len(requests)
+
+    def _queue_request(self, endpoint, *params):
+        # Requests that were already sent get their outcome from last time
+        if self._used < len(self._outcomes):
+            outcome = self._outcomes[self._used]
+            self._used += 1
+            if isinstance(outcome, BaseException):
+                raise outcome
+
+            return copy.deepcopy(outcome)
+
+        self._queued = (endpoint, params)
+        raise _Queued()
+
+    def _run_call(self, proxy, name, args, kwargs, future, outcomes):
+        """
+        Runs the call and returns the `(endpoint, params)` of the request it's waiting
+        on, or `None` once it's finished.
+        """
+        self._outcomes = outcomes
+        self._used = 0
+        try:
+            result = getattr(proxy, name)(*args, **kwargs)
+        except _Queued:
+            return self._queued
+        except BaseException as err:
+            future.set_exception(err)
+        else:
+            future.set_result(result)
+
+        return None
@@ -0,0 +1,170 @@
+import asyncio
+import sqlite3
+import threading
+import time
+
+# The API allows for 40 requests every 10 seconds per IP
+API_RATE = 40
+API_PER = 10
+
+_GLOBAL_BUCKET = "*"
+
+
+class RateLimiter:
+    """
+    A client-side token bucket that meters requests before they're sent to the API
+    instead of waiting on the server to respond with 429s. By default this matches the
+    API's limit of `rate` requests every `per` seconds.
+    """
+
+    def __init__(self, rate=API_RATE, per=API_PER, endpoint_limits=None):
+        """
+        `endpoint_limits` can optionally map `Endpoints` to their own `(rate, per)`
+        limits that get applied on top of the overall limit.
+        """
+        self._limits = {_GLOBAL_BUCKET: _validate_limit(rate, per)}
+        for endpoint, (endpoint_rate, endpoint_per) in (endpoint_limits or {}).items():
+            self._limits[endpoint.value] = _validate_limit(endpoint_rate, endpoint_per)
+
+        self._lock = threading.Lock()
+        self._buckets = {}
+
+    def __repr__(self):
+        rate, per = self._limits[_GLOBAL_BUCKET]
+        return f"{self.__class__.__name__}(rate: {rate}, per: {per})"
+
+    def acquire(self, endpoint):
+        """
+        Blocks until a request can be sent to `endpoint` without going over the limit.
+        """
+        names = self._bucket_names(endpoint)
+        while True:
+            wait = self._try_take(names)
+            if wait <= 0:
+                return
+
+            time.sleep(wait)
+
+    async def acquire_async(self, endpoint):
+        """
+        Same as `acquire`, but waits without blocking the event loop.
+        """
+        names = self._bucket_names(endpoint)
+        while True:
+            wait = await self._try_take_async(names)
+            if wait <= 0:
+                return
+
+            await asyncio.sleep(wait)
+
+    def _bucket_names(self, endpoint):
+        names = [_GLOBAL_BUCKET]
+        if endpoint.value in self._limits:
+            names.append(endpoint.value)
+
+        return names
+
+    def _try_take(self, names):
+        with self._lock:
+            return _take(self._buckets, names, self._limits, time.monotonic())
+
+    async def _try_take_async(self, names):
+        return self._try_take(names)
+
+
+class SharedRateLimiter(RateLimiter):
+    """
+    Same as `RateLimiter`, but the buckets are stored in an SQLite database at
+    `db_path` so that every process on the host using the same database shares the
+    limit.
+    """
+
+    def __init__(self, db_path, rate=API_RATE, per=API_PER, endpoint_limits=None):
+        super().__init__(rate, per, endpoint_limits)
+
+        self._conn = sqlite3.connect(
+            str(db_path), timeout=60, isolation_level=None, check_same_thread=False
+        )
+        with self._lock:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS buckets ("
+                " name TEXT PRIMARY KEY,"
+                " tokens REAL NOT NULL,"
+                " updated REAL NOT NULL"
+                ")"
+            )
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    async def _try_take_async(self, names):
+        # Waiting on the database's write lock blocks, so keep it off the event loop
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self._try_take, names)
+
+    def _try_take(self, names):
+        with self._lock:
+            # Take the write lock up front so that other processes wait their turn
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                buckets = {}
+                for name in names:
+                    row = self._conn.execute(
+                        "SELECT tokens, updated FROM buckets WHERE name = ?", (name,)
+                    ).fetchone()
+                    if row is not None:
+                        buckets[name] = row
+
+                # Wall clock time since monotonic clocks aren't shared between processes
+                wait = _take(buckets, names, self._limits, time.time())
+
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO buckets VALUES (?, ?, ?)",
+                    [(name, *buckets[name]) for name in names],
+                )
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+            self._conn.execute("COMMIT")
+
+        return wait
+
+
+def _validate_limit(rate, per):
+    # Buckets hold at most `rate` tokens, so they could never fill up to the one token
+    # that a request needs with a lower rate
+    if rate < 1 or per <= 0:
+        raise ValueError(
+            f"Rate limits need a rate of at least 1 and a positive period, got {rate}"
+            f" per {per}s"
+        )
+
+    return rate, per
+
+
+def _take(buckets, names, limits, now):
+    """
+    Refills each of the `buckets` for `names` up to `now`, then takes a token from all
+    of them if they all have one. Returns `0` if the tokens were taken, otherwise the
+    number of seconds to wait till they will all have one.
+    """
+    wait = 0
+    for name in names:
+        rate, per = limits[name]
+        # Buckets start out full
+        tokens, updated = buckets.get(name, (rate, now))
+
+        tokens = min(rate, tokens + (now - updated) * rate / per)
+        buckets[name] = (tokens, now)
+
+        if tokens < 1:
+            wait = max(wait, (1 - tokens) * per / rate)
+
+    if wait == 0:
+        for name in names:
+            tokens, updated = buckets[name]
+            buckets[name] = (tokens - 1, updated)
+
+    return wait
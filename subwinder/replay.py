@@ -0,0 +1,249 @@
+import asyncio
+import gzip
+import json
+import threading
+import time
+from collections import defaultdict, deque
+from xmlrpc.client import Fault, ProtocolError, Transport, dumps, loads
+
+from subwinder._unmarshal import _data_handler, getparser
+from subwinder.exceptions import SubLibError
+from subwinder.transport import (
+    AsyncTransport,
+    SafePooledTransport,
+    _BodyParser,
+    _StatsMixin,
+)
+
+
+def _encode_request(method, params):
+    # Matches how both `ServerProxy` and `AsyncTransport` build the request body
+    return dumps(params, method, allow_none=True)
+
+
+def _parse_body(body, use_datetime=False, use_builtin_types=False):
+    # Parsed the same way as a real response so that `stream_data` still applies
+    body_parser = _BodyParser(*getparser(use_datetime, use_builtin_types), False)
+    body_parser.feed(body)
+    return body_parser.close(), body_parser
+
+
+class _Recorder:
+    """
+    Writes each exchange with the API out to a gzipped file of JSON lines.
+    """
+
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        self._file = gzip.open(str(path), "wt", encoding="utf-8")
+
+    def record(self, request_body, call, use_datetime, use_builtin_types):
+        """
+        Makes the request with `call` then records and returns the response. The
+        response is fetched whole and parsed again afterwards, so that streamed `data`
+        still ends up in the recording.
+        """
+        method = loads(request_body)[1]
+        start = time.perf_counter()
+
+        token = _data_handler.set(None)
+        try:
+            response = dumps((call(),), methodresponse=True, allow_none=True)
+        except Fault as fault:
+            response = dumps(fault, methodresponse=True, allow_none=True)
+        except ProtocolError as err:
+            self._write(method, request_body, start, err.errcode, err.errmsg, None)
+            raise
+        finally:
+            _data_handler.reset(token)
+
+        self._write(method, request_body, start, 200, "OK", response)
+
+        return _parse_body(response.encode(), use_datetime, use_builtin_types)[0]
+
+    async def record_async(self, request_body, call):
+        """
+        Same as `record`, but for a `call` that needs to be awaited.
+        """
+        method = loads(request_body)[1]
+        start = time.perf_counter()
+
+        token = _data_handler.set(None)
+        try:
+            response = dumps((await call(),), methodresponse=True, allow_none=True)
+        except Fault as fault:
+            response = dumps(fault, methodresponse=True, allow_none=True)
+        except ProtocolError as err:
+            self._write(method, request_body, start, err.errcode, err.errmsg, None)
+            raise
+        finally:
+            _data_handler.reset(token)
+
+        self._write(method, request_body, start, 200, "OK", response)
+
+        return _parse_body(response.encode())[0][0]
+
+    def _write(self, method, request_body, start, status, reason, response):
+        entry = {
+            "method": method,
+            "request": request_body,
+            "status": status,
+            "reason": reason,
+            "response": response,
+            "elapsed": round(time.perf_counter() - start, 6),
+        }
+        with self._lock:
+            self._file.write(json.dumps(entry, separators=(",", ":")) + "\n")
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+class RecordingTransport(Transport):
+    """
+    An XML-RPC transport that makes its requests over another `transport` (a new
+    `SafePooledTransport` by default) while recording every request and response to
+    the file at `path` to later be served back by a `ReplayTransport`. The recording
+    is only complete once the transport is closed. Keep in mind that the recording
+    includes everything sent to the API, login credentials included.
+    """
+
+    def __init__(self, path, transport=None, **kwargs):
+        """
+        Any `kwargs` are passed on to `xmlrpc.client.Transport`.
+        """
+        super().__init__(**kwargs)
+
+        self._owns_transport = transport is None
+        self._transport = SafePooledTransport() if transport is None else transport
+        self._recorder = _Recorder(path)
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(transport: {repr(self._transport)})"
+
+    def request(self, host, handler, request_body, verbose=False):
+        def call():
+            resp = self._transport.request(host, handler, request_body, verbose)
+            return resp[0]
+
+        return self._recorder.record(
+            request_body.decode("utf-8"),
+            call,
+            self._use_datetime,
+            self._use_builtin_types,
+        )
+
+    def close(self):
+        self._recorder.close()
+        if self._owns_transport:
+            self._transport.close()
+
+
+class AsyncRecordingTransport:
+    """
+    Same as `RecordingTransport`, but for `AsyncSubwinder` where the requests are made
+    over an `AsyncTransport` instead.
+    """
+
+    def __init__(self, path, transport=None):
+        self._owns_transport = transport is None
+        self._transport = AsyncTransport() if transport is None else transport
+        self._recorder = _Recorder(path)
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(transport: {repr(self._transport)})"
+
+    async def call(self, method, params):
+        """
+        Calls the XML-RPC `method` with `params` and returns the result.
+        """
+        return await self._recorder.record_async(
+            _encode_request(method, params),
+            lambda: self._transport.call(method, params),
+        )
+
+    async def close(self):
+        self._recorder.close()
+        if self._owns_transport:
+            await self._transport.close()
+
+
+class ReplayTransport(_StatsMixin, Transport):
+    """
+    Serves back the responses recorded by a `RecordingTransport` (or an
+    `AsyncRecordingTransport`) from the file at `path` without touching the network.
+    Works as both a synchronous and an asynchronous transport.
+    """
+
+    def __init__(self, path, latency=0, realtime=False, **kwargs):
+        """
+        Each response is delayed by `latency` seconds along with the time the original
+        request took if `realtime` is set. Any `kwargs` are passed on to
+        `xmlrpc.client.Transport`.
+        """
+        super().__init__(**kwargs)
+        self._init_stats()
+
+        self.latency = latency
+        self.realtime = realtime
+
+        # Identical requests get their responses in the order they were recorded with
+        # the last one repeating once the rest are used up
+        self._lock = threading.Lock()
+        self._entries = defaultdict(deque)
+        with gzip.open(str(path), "rt", encoding="utf-8") as file:
+            for line in file:
+                entry = json.loads(line)
+                self._entries[entry["request"]].append(entry)
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(requests: {len(self._entries)})"
+
+    def request(self, host, handler, request_body, verbose=False):
+        entry = self._next_entry(request_body.decode("utf-8"))
+
+        delay = self._delay(entry)
+        if delay > 0:
+            time.sleep(delay)
+
+        return self._respond(entry, host + handler, len(request_body))
+
+    async def call(self, method, params):
+        """
+        Same as `AsyncTransport.call`, but the result comes from the recording.
+        """
+        request_body = _encode_request(method, params)
+        entry = self._next_entry(request_body)
+
+        delay = self._delay(entry)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        return self._respond(entry, method, len(request_body.encode()))[0]
+
+    def _next_entry(self, request_body):
+        with self._lock:
+            entries = self._entries.get(request_body)
+            if not entries:
+                method = loads(request_body)[1]
+                raise SubLibError(f"No recorded response for the '{method}' request")
+
+            return entries.popleft() if len(entries) > 1 else entries[0]
+
+    def _delay(self, entry):
+        return self.latency + (entry["elapsed"] if self.realtime else 0)
+
+    def _respond(self, entry, url, sent_bytes):
+        if entry["status"] != 200:
+            raise ProtocolError(url, entry["status"], entry["reason"], {})
+
+        result, body_parser = _parse_body(
+            entry["response"].encode(), self._use_datetime, self._use_builtin_types
+        )
+        self._record(sent_bytes, body_parser)
+
+        return result
+
+    def close(self):
+        pass
@@ -0,0 +1,105 @@
+import asyncio
+import copy
+import threading
+from concurrent.futures import Future
+
+from subwinder._request import _IDEMPOTENT_ENDPOINTS
+
+
+class SingleFlight:
+    """
+    Coalesces identical requests to the idempotent `endpoints` that are in flight at
+    the same time. The first caller sends the request while any callers that show up
+    with the same request in the meantime wait on its result instead of sending a
+    duplicate. Can be shared between any number of `Subwinder`s.
+    """
+
+    def __init__(self, endpoints=_IDEMPOTENT_ENDPOINTS):
+        self.endpoints = frozenset(endpoints)
+        # Number of calls that waited on another instead of making their own request
+        self.coalesced = 0
+
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._waiting = {}
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(coalesced: {self.coalesced})"
+
+    def coalesces(self, endpoint):
+        """
+        Returns whether requests to `endpoint` get coalesced.
+        """
+        return endpoint in self.endpoints
+
+    def do(self, key, function):
+        """
+        Returns the result of calling `function` unless a call for the same `key` is
+        already in flight, in which case this waits on that call's result instead.
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+            else:
+                self._wait(key)
+
+        if not leader:
+            return copy.deepcopy(future.result())
+
+        try:
+            result = function()
+        except BaseException as err:
+            self._finish(key, future, exception=err)
+            raise
+
+        self._finish(key, future, result=result)
+        return result
+
+    async def do_async(self, key, function):
+        """
+        Same as `do`, but for a `function` that returns an awaitable.
+        """
+        key = (id(asyncio.get_running_loop()), key)
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = asyncio.get_running_loop().create_future()
+            else:
+                self._wait(key)
+
+        if not leader:
+            # Waiters being cancelled shouldn't cancel the request for everyone else
+            return copy.deepcopy(await asyncio.shield(future))
+
+        try:
+            result = await function()
+        except BaseException as err:
+            self._finish(key, future, exception=err)
+            raise
+
+        self._finish(key, future, result=result)
+        return result
+
+    def _wait(self, key):
+        self.coalesced += 1
+        self._waiting[key] = self._waiting.get(key, 0) + 1
+
+    def _finish(self, key, future, result=None, exception=None):
+        # Later callers start a new request once this one's done
+        with self._lock:
+            del self._calls[key]
+            waiting = self._waiting.pop(key, 0)
+
+        if isinstance(exception, asyncio.CancelledError):
+            future.cancel()
+        elif exception is not None:
+            future.set_exception(exception)
+            if isinstance(future, asyncio.Future):
+                # Nobody may be waiting so don't warn about it going unretrieved
+                future.exception()
+        else:
+            # Waiters get copies that the leader won't mutate out from under them
+            future.set_result(copy.deepcopy(result) if waiting else None)
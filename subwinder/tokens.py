@@ -0,0 +1,89 @@
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+# The API ends sessions after 15 minutes without any requests
+DEFAULT_MAX_AGE = 15 * 60
+
+
+class TokenStore:
+    """
+    Base class for anything that stores session tokens so that `AuthSubwinder` can
+    reuse them instead of logging in again. Tokens are stored under a `key` for the
+    user and useragent they belong to.
+    """
+
+    def load(self, key):
+        """
+        Returns the stored token for `key` or `None` if there isn't a usable one.
+        """
+        raise NotImplementedError
+
+    def save(self, key, token):
+        """
+        Stores the `token` for `key`.
+        """
+        raise NotImplementedError
+
+    def clear(self, key):
+        """
+        Removes any token stored for `key`.
+        """
+        raise NotImplementedError
+
+
+class FileTokenStore(TokenStore):
+    """
+    Stores the tokens in a JSON file at `path` that can be shared between processes.
+    Tokens that were saved more than `max_age` seconds ago are considered expired. The
+    file is only readable by the current user since the tokens are credentials.
+    """
+
+    def __init__(self, path, max_age=DEFAULT_MAX_AGE):
+        self.path = Path(path)
+        self.max_age = max_age
+
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(path: {repr(str(self.path))})"
+
+    def load(self, key):
+        with self._lock:
+            entry = self._read().get(key)
+
+        if entry is None or time.time() - entry["saved"] > self.max_age:
+            return None
+
+        return entry["token"]
+
+    def save(self, key, token):
+        with self._lock:
+            tokens = self._read()
+            tokens[key] = {"token": token, "saved": time.time()}
+            self._write(tokens)
+
+    def clear(self, key):
+        with self._lock:
+            tokens = self._read()
+            if tokens.pop(key, None) is not None:
+                self._write(tokens)
+
+    def _read(self):
+        try:
+            with self.path.open() as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            # Missing or corrupt files just mean there's nothing to reuse
+            return {}
+
+    def _write(self, tokens):
+        # Write to a temporary file first so other processes never see a partial file
+        temp_path = self.path.with_name(f".{self.path.name}.{os.getpid()}.tmp")
+        fd = os.open(str(temp_path), os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as f:
+            json.dump(tokens, f)
+
+        os.replace(str(temp_path), str(self.path))
@@ -0,0 +1,613 @@
+import asyncio
+import contextvars
+import copy
+import gzip
+import http.client
+import io
+import ssl
+import threading
+import zlib
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass
+from urllib.parse import urlsplit
+from xmlrpc.client import ProtocolError, Transport, dumps
+
+from subwinder._constants import API_BASE
+from subwinder._unmarshal import getparser
+
+# Errors that mean a reused connection went stale (the server closed the keep-alive
+# socket on its end) and that it's safe to retry on a fresh connection
+_STALE_CONNECTION_ERRORS = (
+    ConnectionError,
+    http.client.BadStatusLine,
+    http.client.ImproperConnectionState,
+)
+_ASYNC_STALE_CONNECTION_ERRORS = (ConnectionError, asyncio.IncompleteReadError)
+
+_READ_SIZE = 16 * 1024  # 16 KiB
+
+# Totals for the requests made in the current thread or task while being tracked
+_tracked_stats = contextvars.ContextVar("_tracked_stats", default=None)
+
+
+@dataclass
+class TransferStats:
+    """
+    Running totals for the requests sent over a transport. `sent_bytes` and
+    `received_bytes` are the sizes of the request and response bodies on the wire
+    (after compression) while `decoded_bytes` is the size of the response bodies after
+    decompressing them.
+    """
+
+    requests: int = 0
+    sent_bytes: int = 0
+    received_bytes: int = 0
+    decoded_bytes: int = 0
+
+
+@contextmanager
+def track_transfer():
+    """
+    Totals up the `TransferStats` for the requests that the current thread (or task)
+    makes over the library's transports while active.
+    """
+    stats = TransferStats()
+    token = _tracked_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _tracked_stats.reset(token)
+
+
+class _BodyParser:
+    """
+    Feeds a response body to the XML-RPC `parser` as it's read, decompressing it on
+    the way if it was `gzipped`.
+    """
+
+    def __init__(self, parser, unmarshaller, gzipped):
+        self._parser = parser
+        self._unmarshaller = unmarshaller
+        # `16 + MAX_WBITS` expects a gzip header and trailer around the data
+        self._decoder = zlib.decompressobj(16 + zlib.MAX_WBITS) if gzipped else None
+
+        self.received_bytes = 0
+        self.decoded_bytes = 0
+
+    def feed(self, data):
+        self.received_bytes += len(data)
+        if self._decoder is not None:
+            data = self._decoder.decompress(data)
+
+        self._feed_decoded(data)
+
+    def _feed_decoded(self, data):
+        self.decoded_bytes += len(data)
+        self._parser.feed(data)
+
+    def close(self):
+        if self._decoder is not None:
+            self._feed_decoded(self._decoder.flush())
+
+        # Any truncated data is caught by the parser as invalid XML
+        self._parser.close()
+        return self._unmarshaller.close()
+
+
+def _is_gzipped(headers):
+    return headers.get("Content-Encoding", "").lower() == "gzip"
+
+
+def _maybe_compress(request_body, encode_threshold):
+    if encode_threshold is not None and len(request_body) > encode_threshold:
+        return gzip.compress(request_body), True
+
+    return request_body, False
+
+
+class _StatsMixin:
+    def _init_stats(self):
+        self._stats = TransferStats()
+        self._stats_lock = threading.Lock()
+
+    @property
+    def stats(self):
+        """
+        A snapshot of the `TransferStats` for everything sent over this transport.
+        """
+        with self._stats_lock:
+            return copy.copy(self._stats)
+
+    def _record(self, sent_bytes, body_parser):
+        with self._stats_lock:
+            _add_transfer(self._stats, sent_bytes, body_parser)
+
+        tracked = _tracked_stats.get()
+        if tracked is not None:
+            _add_transfer(tracked, sent_bytes, body_parser)
+
+
+def _add_transfer(stats, sent_bytes, body_parser):
+    stats.requests += 1
+    stats.sent_bytes += sent_bytes
+    stats.received_bytes += body_parser.received_bytes
+    stats.decoded_bytes += body_parser.decoded_bytes
+
+
+class PooledTransport(_StatsMixin, Transport):
+    """
+    A thread-safe XML-RPC transport that keeps up to `max_connections` persistent HTTP
+    connections around to reuse between requests. Connections that the server has
+    closed in the meantime are transparently replaced. Gzipped responses are
+    decompressed as they're read.
+    """
+
+    _connection_class = http.client.HTTPConnection
+
+    def __init__(
+        self, max_connections=4, timeout=None, encode_threshold=None, **kwargs
+    ):
+        """
+        `timeout` is the socket timeout used for each connection and request bodies
+        larger than `encode_threshold` bytes are gzipped. Any `kwargs` are passed on to
+        `xmlrpc.client.Transport`.
+        """
+        super().__init__(**kwargs)
+        self._init_stats()
+
+        if max_connections < 1:
+            raise ValueError(
+                f"`max_connections` must be at least 1, got {max_connections}"
+            )
+
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.encode_threshold = encode_threshold
+
+        self._slots = threading.BoundedSemaphore(max_connections)
+        self._lock = threading.Lock()
+        self._idle = deque()
+        self._local = threading.local()
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(max_connections: {self.max_connections})"
+
+    def request(self, host, handler, request_body, verbose=False):
+        # Only `max_connections` requests can be in flight at once
+        with self._slots:
+            connection, reused = self._checkout(host)
+            try:
+                resp = self._send_request(
+                    connection, host, handler, request_body, verbose
+                )
+            except _STALE_CONNECTION_ERRORS:
+                connection.close()
+                if not reused:
+                    raise
+
+                # The server dropped our idle connection, so try once more on a new one
+                connection = self._connect(host)
+                try:
+                    resp = self._send_request(
+                        connection, host, handler, request_body, verbose
+                    )
+                except Exception:
+                    connection.close()
+                    raise
+            except ProtocolError:
+                # The error response was already read so the connection is still good
+                self._checkin(host, connection)
+                raise
+            except Exception:
+                # All unexpected errors leave the connection in a strange state
+                connection.close()
+                raise
+
+            # Failing while reading the body is never retried since some of the results
+            # may have already been passed to a `stream_data` handler
+            try:
+                self.verbose = verbose
+                result = self.parse_response(resp)
+            except Exception:
+                connection.close()
+                raise
+
+            self._checkin(host, connection)
+            return result
+
+    def _send_request(self, connection, host, handler, request_body, verbose):
+        """
+        Sends the request and returns the response once its headers are read, leaving
+        the body to be parsed.
+        """
+        # `send_request` gets its connection through `make_connection` which we point
+        # at the connection that this thread checked out
+        self._local.connection = connection
+        self._local.sent_bytes = 0
+        try:
+            self.send_request(host, handler, request_body, verbose)
+        finally:
+            self._local.connection = None
+
+        resp = connection.getresponse()
+        if resp.status == 200:
+            return resp
+
+        # We got an error response. Discard any response data and raise exception
+        resp.read()
+        raise ProtocolError(
+            host + handler, resp.status, resp.reason, dict(resp.getheaders())
+        )
+
+    def make_connection(self, host):
+        return self._local.connection
+
+    def send_content(self, connection, request_body):
+        request_body, compressed = _maybe_compress(request_body, self.encode_threshold)
+        if compressed:
+            connection.putheader("Content-Encoding", "gzip")
+
+        self._local.sent_bytes = len(request_body)
+        connection.putheader("Content-Length", str(len(request_body)))
+        connection.endheaders(request_body)
+
+    def getparser(self):
+        return getparser(self._use_datetime, self._use_builtin_types)
+
+    def parse_response(self, response):
+        body_parser = _BodyParser(*self.getparser(), _is_gzipped(response.headers))
+        while True:
+            data = response.read(_READ_SIZE)
+            if not data:
+                break
+
+            if self.verbose:
+                print("body:", repr(data))
+            body_parser.feed(data)
+
+        result = body_parser.close()
+        self._record(self._local.sent_bytes, body_parser)
+
+        return result
+
+    def _checkout(self, host):
+        with self._lock:
+            for _ in range(len(self._idle)):
+                idle_host, connection = self._idle.popleft()
+                if idle_host == host:
+                    return connection, True
+
+                # Some other host, keep it around
+                self._idle.append((idle_host, connection))
+
+        return self._connect(host), False
+
+    def _checkin(self, host, connection):
+        if connection.sock is None:
+            # Server asked to close the connection so there's nothing to reuse
+            return
+
+        with self._lock:
+            self._idle.append((host, connection))
+            while len(self._idle) > self.max_connections:
+                _, oldest = self._idle.popleft()
+                oldest.close()
+
+    def _connect(self, host):
+        chost, self._extra_headers, x509 = self.get_host_info(host)
+        connection = self._connection_class(chost, **self._connection_kwargs(x509))
+        if self.timeout is not None:
+            connection.timeout = self.timeout
+
+        return connection
+
+    def _connection_kwargs(self, x509):
+        return {}
+
+    def close(self):
+        with self._lock:
+            while self._idle:
+                _, connection = self._idle.popleft()
+                connection.close()
+
+
+class _HTTPSConnection(http.client.HTTPSConnection):
+    _tls_sessions = {}
+
+    def connect(self):
+        # Same as `HTTPSConnection.connect` except for resuming the last session
+        http.client.HTTPConnection.connect(self)
+
+        server_hostname = self._tunnel_host or self.host
+        self.sock = self._context.wrap_socket(
+            self.sock,
+            server_hostname=server_hostname,
+            session=self._tls_sessions.get(self.host),
+        )
+
+
+class SafePooledTransport(PooledTransport):
+    """
+    Same as `PooledTransport`, but over HTTPS. TLS sessions are reused when opening
+    new connections to skip the full handshake where the server allows it.
+    """
+
+    _connection_class = _HTTPSConnection
+
+    def __init__(self, max_connections=4, timeout=None, context=None, **kwargs):
+        super().__init__(max_connections, timeout, **kwargs)
+
+        # Sessions can only be resumed from the same context so all the connections
+        # need to share one
+        self.context = ssl.create_default_context() if context is None else context
+        self._tls_sessions = {}
+
+    def _connect(self, host):
+        connection = super()._connect(host)
+        connection._tls_sessions = self._tls_sessions
+
+        return connection
+
+    def _connection_kwargs(self, x509):
+        return {"context": self.context, **(x509 or {})}
+
+    def _checkin(self, host, connection):
+        # Grab the session now that the handshake (and any session tickets) are done
+        sock = connection.sock
+        if sock is not None and sock.session is not None:
+            self._tls_sessions[connection.host] = sock.session
+
+        super()._checkin(host, connection)
+
+
+class AsyncTransport(_StatsMixin):
+    """
+    A non-blocking XML-RPC transport built on `asyncio` streams that keeps up to
+    `max_connections` persistent HTTP/1.1 connections to `api_base` around to reuse
+    between requests. Connections that the server has closed in the meantime are
+    transparently replaced.
+    """
+
+    user_agent = Transport.user_agent
+
+    def __init__(
+        self,
+        api_base=API_BASE,
+        max_connections=4,
+        timeout=None,
+        context=None,
+        encode_threshold=None,
+    ):
+        """
+        `timeout` is the number of seconds each request can take and `context` is the
+        `ssl.SSLContext` used when `api_base` is HTTPS. Request bodies larger than
+        `encode_threshold` bytes are gzipped.
+        """
+        self._init_stats()
+
+        if max_connections < 1:
+            raise ValueError(
+                f"`max_connections` must be at least 1, got {max_connections}"
+            )
+
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.encode_threshold = encode_threshold
+
+        url = urlsplit(api_base)
+        self._host = url.hostname
+        self._netloc = url.netloc
+        self._handler = url.path or "/"
+        if url.scheme == "https":
+            self._port = url.port or 443
+            self.context = ssl.create_default_context() if context is None else context
+        else:
+            self._port = url.port or 80
+            self.context = None
+
+        # Created lazily so that it belongs to the running event loop
+        self._slots = None
+        self._idle = deque()
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(max_connections: {self.max_connections})"
+
+    async def call(self, method, params):
+        """
+        Calls the XML-RPC `method` with `params` and returns the result.
+        """
+        body = dumps(params, method, allow_none=True).encode(
+            "utf-8", "xmlcharrefreplace"
+        )
+        body, compressed = _maybe_compress(body, self.encode_threshold)
+
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_connections)
+
+        # Only `max_connections` requests can be in flight at once
+        async with self._slots:
+            if self.timeout is None:
+                status, reason, headers, result = await self._request(body, compressed)
+            else:
+                status, reason, headers, result = await asyncio.wait_for(
+                    self._request(body, compressed), self.timeout
+                )
+
+        if status != 200:
+            raise ProtocolError(
+                self._netloc + self._handler, status, reason, dict(headers)
+            )
+
+        return result[0]
+
+    async def _request(self, body, compressed):
+        streams, reused = await self._checkout()
+        try:
+            head = await self._send_request(streams, body, compressed)
+        except _ASYNC_STALE_CONNECTION_ERRORS:
+            streams[1].close()
+            if not reused:
+                raise
+
+            # The server dropped our idle connection, so try once more on a new one
+            streams = await self._connect()
+            try:
+                head = await self._send_request(streams, body, compressed)
+            except BaseException:
+                streams[1].close()
+                raise
+        except BaseException:
+            # All unexpected errors (and cancelling) leave the connection in a strange
+            # state
+            streams[1].close()
+            raise
+
+        status, reason, headers, chunks, keep_alive = head
+        # Failing while reading the body is never retried since some of the results
+        # may have already been passed to a `stream_data` handler
+        try:
+            result = await self._read_body(status, headers, chunks, len(body))
+        except BaseException:
+            streams[1].close()
+            raise
+
+        if keep_alive:
+            self._checkin(streams)
+        else:
+            streams[1].close()
+
+        return status, reason, headers, result
+
+    async def _send_request(self, streams, body, compressed):
+        """
+        Sends the request and reads the response up to the end of the headers. Returns
+        the status, reason, and headers along with an iterator over the body's chunks
+        and whether the connection can be kept alive.
+        """
+        reader, writer = streams
+
+        writer.write(self._request_head(len(body), compressed) + body)
+        await writer.drain()
+
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionResetError("The server closed the connection")
+        version, status, *reason = (
+            status_line.decode("iso-8859-1").rstrip("\r\n").split(" ", 2)
+        )
+
+        raw_headers = []
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            raw_headers.append(line)
+        headers = http.client.parse_headers(
+            io.BytesIO(b"".join(raw_headers + [b"\r\n"]))
+        )
+
+        keep_alive = (
+            version == "HTTP/1.1" and headers.get("Connection", "").lower() != "close"
+        )
+        if headers.get("Transfer-Encoding", "").lower() == "chunked":
+            chunks = _iter_chunked(reader)
+        elif "Content-Length" in headers:
+            chunks = _iter_sized(reader, int(headers["Content-Length"]))
+        else:
+            # The body runs till the server closes the connection
+            chunks = _iter_sized(reader, None)
+            keep_alive = False
+
+        return int(status), "".join(reason), headers, chunks, keep_alive
+
+    async def _read_body(self, status, headers, chunks, sent_bytes):
+        if status != 200:
+            # Discard the error response
+            async for _ in chunks:
+                pass
+            return None
+
+        body_parser = _BodyParser(*getparser(), _is_gzipped(headers))
+        async for data in chunks:
+            body_parser.feed(data)
+        result = body_parser.close()
+
+        self._record(sent_bytes, body_parser)
+
+        return result
+
+    def _request_head(self, content_length, compressed):
+        return (
+            f"POST {self._handler} HTTP/1.1\r\n"
+            f"Host: {self._netloc}\r\n"
+            f"User-Agent: {self.user_agent}\r\n"
+            "Accept-Encoding: gzip\r\n"
+            "Content-Type: text/xml\r\n"
+            + ("Content-Encoding: gzip\r\n" if compressed else "")
+            + f"Content-Length: {content_length}\r\n"
+            "\r\n"
+        ).encode("iso-8859-1")
+
+    async def _checkout(self):
+        while self._idle:
+            reader, writer = self._idle.popleft()
+            # Skip over any connections that we already know were closed
+            if not reader.at_eof():
+                return (reader, writer), True
+
+            writer.close()
+
+        return await self._connect(), False
+
+    def _checkin(self, streams):
+        self._idle.append(streams)
+        while len(self._idle) > self.max_connections:
+            _, oldest = self._idle.popleft()
+            oldest.close()
+
+    async def _connect(self):
+        return await asyncio.open_connection(self._host, self._port, ssl=self.context)
+
+    async def close(self):
+        while self._idle:
+            _, writer = self._idle.popleft()
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except OSError:
+                # Already closed on the server's end
+                pass
+
+
+async def _iter_sized(reader, size):
+    # A `size` of `None` reads till the end of the stream
+    while size is None or size > 0:
+        read_size = _READ_SIZE if size is None else min(size, _READ_SIZE)
+        data = await reader.read(read_size)
+        if not data:
+            if size is None:
+                break
+
+            raise asyncio.IncompleteReadError(b"", size)
+
+        if size is not None:
+            size -= len(data)
+        yield data
+
+
+async def _iter_chunked(reader):
+    while True:
+        size_line = await reader.readline()
+        size = int(size_line.split(b";")[0], 16)
+        if size == 0:
+            break
+
+        async for data in _iter_sized(reader, size):
+            yield data
+        # Each chunk ends with a CRLF
+        await reader.readline()
+
+    # Skip over any trailers
+    while await reader.readline() not in (b"\r\n", b"\n", b""):
+        pass
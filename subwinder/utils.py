@@ -1,10 +1,66 @@
+# Optional dependency: numpy
+try:
+    import numpy
+
+    NUMPY_SUPPORT = True
+except ImportError:
+    NUMPY_SUPPORT = False
+
+
 import base64
 import gzip
+import mmap
 import os
+import sys
+import threading
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from enum import Enum
 from pathlib import Path
 
+from subwinder._internal_utils import bounded_map
 from subwinder.exceptions import SubHashError
 
+_CHUNK_SIZE_BYTES = 64 * 1024
+_FILE_MIN_SIZE = _CHUNK_SIZE_BYTES * 2
+
+# Each thread gets its own buffer for holding the hashed chunks so that hashing many
+# files doesn't keep reallocating the same 128 KiB
+_buffers = threading.local()
+
+
+class HashBackend(Enum):
+    """
+    The different ways `special_hash` can read the chunks of the file that get hashed.
+    """
+
+    # Regular buffered python file objects
+    BUFFERED = "buffered"
+    # Positional reads straight into a reusable buffer (falls back to `BUFFERED` on
+    # platforms without `os.pread`)
+    PREAD = "pread"
+    # Memory maps the file and sums the chunks in place
+    MMAP = "mmap"
+
+
+class BaseRangeReader:
+    """
+    Base class for media sources that can be hashed without being a local file (like
+    something in object storage). `special_hash` and `MediaFile` accept any object that
+    has a `size` in bytes and a `read_range(offset, length)` method that returns the
+    `length` bytes starting at `offset`, so inheriting from this is optional. An
+    optional `name` is used as the filepath by `MediaFile`.
+    """
+
+    size = None
+    name = None
+
+    def read_range(self, offset, length):
+        raise NotImplementedError(
+            "The base range reader is only meant to be inherited from to ensure"
+            " structure"
+        )
+
 
 def extract(bytes):
     """
@@ -16,30 +72,209 @@ def extract(bytes):
 
 # As per API spec with some tweaks to make it a bit nicer
 # https://trac.opensubtitles.org/projects/opensubtitles/wiki/HashSourceCodes
-def special_hash(filepath):
+def special_hash(filepath, cache=None, backend=HashBackend.BUFFERED):
+    """
+    The "special hash" used by opensubtitles representing a specific media file. If a
+    `HashCache` is passed as `cache` then it is checked before reading the file.
+    `backend` selects the `HashBackend` used to read the file. `filepath` can also be
+    a range reader (see `BaseRangeReader`) in which case only the hashed chunks are
+    read from it and both `cache` and `backend` are ignored.
+    """
+    hash, _ = _hash_file(filepath, cache, backend)
+    return hash
+
+
+def hash_many(
+    filepaths, max_workers=8, ordered=True, cache=None, backend=HashBackend.BUFFERED
+):
+    """
+    Lazily hashes all of the `filepaths` using up to `max_workers` threads, yielding
+    `(filepath, hash)` pairs. Files that can't be hashed (including ones that are
+    missing or unreadable) give a `SubHashError` in place of the hash instead of
+    stopping everything. Pairs come back in the same order
+    as `filepaths` unless `ordered` is `False` in which case they come back as soon as
+    they're done. `cache` and `backend` are used for each file just like with
+    `special_hash`.
+    """
+
+    def try_special_hash(filepath):
+        try:
+            return filepath, special_hash(filepath, cache, backend)
+        except (SubHashError, OSError) as e:
+            return filepath, _as_hash_error(filepath, e)
+
+    return bounded_map(try_special_hash, filepaths, max_workers, ordered)
+
+
+def _as_hash_error(filepath, err):
     """
-    The "special hash" used by opensubtitles representing a specific media file.
+    Converts an `OSError` from trying to read the file at `filepath` into a
+    `SubHashError` so that bulk hashing can report it with the rest.
     """
-    CHUNK_SIZE_BYTES = 64 * 1024
-    FILE_MIN_SIZE = CHUNK_SIZE_BYTES * 2
+    if isinstance(err, SubHashError):
+        return err
+
+    hash_err = SubHashError(f"Failed reading '{filepath}': {err}")
+    hash_err.__cause__ = err
+    return hash_err
+
+
+def _hash_file(filepath, cache=None, backend=HashBackend.BUFFERED, stat=None):
+    """
+    Gets both the `special_hash` and size of the file at `filepath` going through the
+    `cache` if one is provided. A `stat` for the file can be passed in if the caller
+    already has one to save having to `stat` the file again.
+    """
+    if _is_range_reader(filepath):
+        return _read_hash_range(filepath)
 
     # Force `filepath` to be `Path`
     filepath = Path(filepath)
 
+    if cache is None:
+        return _read_hash(filepath, backend)
+
+    if stat is None:
+        stat = filepath.stat()
+    hash = cache.get(stat)
+    if hash is None:
+        hash, _ = _read_hash(filepath, backend)
+        cache.set(filepath, stat, hash)
+
+    return hash, stat.st_size
+
+
+def _read_hash(filepath, backend=HashBackend.BUFFERED):
+    if backend == HashBackend.PREAD and hasattr(os, "pread"):
+        return _read_hash_pread(filepath)
+    elif backend == HashBackend.MMAP:
+        return _read_hash_mmap(filepath)
+
+    return _read_hash_buffered(filepath)
+
+
+def _read_hash_buffered(filepath):
     with filepath.open("rb") as file:
-        filesize = filepath.stat().st_size
+        filesize = os.fstat(file.fileno()).st_size
+        _check_filesize(filepath, filesize)
+
+        buffer = _hash_buffer()
+        # Read the first chunk of the file
+        _read_exactly(file, buffer[:_CHUNK_SIZE_BYTES])
+        # and the last chunk
+        file.seek(-_CHUNK_SIZE_BYTES, os.SEEK_END)
+        _read_exactly(file, buffer[_CHUNK_SIZE_BYTES:])
+
+    hasher = _SumHasher(filesize)
+    hasher.update(buffer)
+
+    return hasher.hexdigest(), filesize
+
+
+def _read_hash_pread(filepath):
+    fd = os.open(filepath, os.O_RDONLY)
+    try:
+        filesize = os.fstat(fd).st_size
+        _check_filesize(filepath, filesize)
+
+        # Positional reads mean there's no seeking and no file object to allocate
+        buffer = _hash_buffer()
+        _pread_exactly(fd, buffer[:_CHUNK_SIZE_BYTES], 0, filepath)
+        _pread_exactly(
+            fd, buffer[_CHUNK_SIZE_BYTES:], filesize - _CHUNK_SIZE_BYTES, filepath
+        )
+    finally:
+        os.close(fd)
+
+    hasher = _SumHasher(filesize)
+    hasher.update(buffer)
+
+    return hasher.hexdigest(), filesize
+
+
+def _read_hash_mmap(filepath):
+    with filepath.open("rb") as file:
+        filesize = os.fstat(file.fileno()).st_size
+        _check_filesize(filepath, filesize)
+
         hasher = _SumHasher(filesize)
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            # Note: all views into `mapped` need to be gone before it gets closed
+            with memoryview(mapped) as view:
+                hasher.update(view[:_CHUNK_SIZE_BYTES])
+                hasher.update(view[-_CHUNK_SIZE_BYTES:])
 
-        if filesize < FILE_MIN_SIZE:
-            raise SubHashError(f"Filesize is below minimum of {FILE_MIN_SIZE} bytes")
+    return hasher.hexdigest(), filesize
+
+
+def _read_hash_range(reader):
+    filesize = reader.size
+    _check_filesize(reader, filesize)
+
+    # Round trips are what's expensive for remote sources, so fetch the last chunk in
+    # the background while we get the first
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        tail = executor.submit(
+            reader.read_range, filesize - _CHUNK_SIZE_BYTES, _CHUNK_SIZE_BYTES
+        )
+        head = reader.read_range(0, _CHUNK_SIZE_BYTES)
+        tail = tail.result()
+
+    hasher = _SumHasher(filesize)
+    for chunk in (head, tail):
+        if len(chunk) != _CHUNK_SIZE_BYTES:
+            raise SubHashError(
+                f"Expected {_CHUNK_SIZE_BYTES} bytes from '{reader}', but got"
+                f" {len(chunk)}"
+            )
+        hasher.update(chunk)
+
+    return hasher.hexdigest(), filesize
 
-        # Hash the first chunk of the file
-        hasher.update(file.read(CHUNK_SIZE_BYTES))
-        # and the last chunk
-        file.seek(-CHUNK_SIZE_BYTES, os.SEEK_END)
-        hasher.update(file.read(CHUNK_SIZE_BYTES))
 
-    return hasher.hexdigest()
+def _is_range_reader(obj):
+    return hasattr(obj, "read_range") and hasattr(obj, "size")
+
+
+def _check_filesize(filepath, filesize):
+    if filesize < _FILE_MIN_SIZE:
+        raise SubHashError(
+            f"Filesize of '{filepath}' is below minimum of {_FILE_MIN_SIZE} bytes"
+        )
+
+
+def _hash_buffer():
+    try:
+        return _buffers.view
+    except AttributeError:
+        _buffers.view = memoryview(bytearray(_FILE_MIN_SIZE))
+        return _buffers.view
+
+
+def _read_exactly(file, view):
+    # `readinto` is allowed to return short reads, so keep going till `view` is full
+    while view:
+        num_read = file.readinto(view)
+        if not num_read:
+            raise SubHashError(f"'{file.name}' was truncated while it was being hashed")
+
+        view = view[num_read:]
+
+
+def _pread_exactly(fd, view, offset, filepath):
+    while view:
+        if hasattr(os, "preadv"):
+            num_read = os.preadv(fd, [view], offset)
+        else:
+            data = os.pread(fd, len(view), offset)
+            num_read = len(data)
+            view[:num_read] = data
+
+        if not num_read:
+            raise SubHashError(f"'{filepath}' was truncated while it was being hashed")
+
+        view = view[num_read:]
+        offset += num_read
 
 
 class _SumHasher:
@@ -49,11 +284,34 @@ class _SumHasher:
         self.block_size = 8
 
     def update(self, values):
-        for i in range(0, len(values), self.block_size):
-            chunk = values[i : i + self.block_size]
-            self.hash += int.from_bytes(chunk, byteorder="little")
+        values = memoryview(values).cast("B")
+
+        # Sum all the whole words at once and handle any trailing bytes on their own
+        num_whole = len(values) - len(values) % self.block_size
+        self.hash += _sum_words(values[:num_whole])
+        if num_whole < len(values):
+            self.hash += int.from_bytes(values[num_whole:], byteorder="little")
 
     def hexdigest(self):
         # Keep output in `self.digest_size`
         temp = self.hash & 2 ** (self.digest_size * 8) - 1
         return f"{temp:016x}"
+
+
+def _sum_words(view):
+    """
+    Sums `view` as little-endian unsigned 64-bit words. The result is only accurate
+    modulo 2 ** 64 which is all that the hash keeps anyways.
+    """
+    if NUMPY_SUPPORT:
+        # `uint64` addition wraps on overflow which is exactly what we want
+        return int(numpy.frombuffer(view, dtype="<u8").sum(dtype=numpy.uint64))
+
+    if sys.byteorder == "little":
+        # Native words are already little-endian so reinterpret the bytes in place
+        return sum(view.cast("Q"))
+
+    words = array("Q")
+    words.frombytes(view)
+    words.byteswap()
+    return sum(words)
@@ -28,6 +28,11 @@ DEV_TESTS = TEST_DIR / "dev_tests"
 DEV_ASSETS = DEV_TESTS / "assets"
 
 MEDIA1 = MediaFile.from_parts("18379ac9af039390", 366876694, "/path/to", "file.mkv")
+# Same as `MEDIA1`, but with their own hashes so that searching for them isn't deduped
+DISTINCT_MEDIA = [
+    MediaFile.from_parts(f"{i:016x}", 366876694, "/path/to", "file.mkv")
+    for i in range(6)
+]
 USER_INFO1 = User("1332962", "elderman")
 
 FULL_USER_INFO1 = FullUser(
@@ -0,0 +1,14 @@
+from dev.bench_hash.bench_hash import bench_hash, format_results
+from subwinder.utils import HashBackend
+
+
+def test_bench_hash(tmp_path):
+    results = bench_hash(tmp_path, 256 * 1024, 2, 1)
+
+    # Should have timings for every backend on both the random and fake media files
+    assert len(results) == 2
+    for timings in results.values():
+        assert list(timings) == list(HashBackend)
+        assert all(seconds > 0 for seconds in timings.values())
+
+    assert "us/file" in format_results(results)
@@ -0,0 +1,134 @@
+import threading
+from pathlib import Path
+from unittest.mock import patch
+from xmlrpc.client import ProtocolError
+
+import pytest
+
+import subwinder._request
+from dev.fake_server.fake_server import (
+    LANGS,
+    FakeApi,
+    FakeServer,
+    Faults,
+    build_catalog,
+)
+from subwinder import AuthSubwinder, MediaFile, Subwinder
+from subwinder._request import Endpoints, build_client, request
+from subwinder.exceptions import SubLibError
+from subwinder.info import Episode, Movie
+
+
+@pytest.fixture
+def fake_server():
+    api = FakeApi(build_catalog(subs_per_lang=2), Faults(rate=None, seed=0))
+    with FakeServer(api) as server:
+        thread = threading.Thread(target=server.serve_forever, args=(0.01,))
+        thread.daemon = True
+        thread.start()
+
+        yield server
+
+        server.shutdown()
+
+
+def _auth_subwinder(server):
+    return AuthSubwinder(
+        "<username>", "<password>", None, "<useragent>", api_base=server.api_base
+    )
+
+
+def test_build_catalog():
+    catalog = build_catalog(subs_per_lang=2)
+
+    # 11 default entries with 2 subtitles for each language
+    assert len(catalog) == 11 * len(LANGS) * 2
+    assert len({sub["IDSubtitleFile"] for sub in catalog}) == len(catalog)
+
+    fringe, night_watch = catalog[0], catalog[len(LANGS) * 2]
+    assert (fringe["MovieKind"], fringe["SeriesSeason"]) == ("episode", "4")
+    assert fringe["MovieHash"] == "18379ac9af039390"
+    assert (night_watch["MovieName"], night_watch["MovieYear"]) == (
+        "Night Watch",
+        "2004",
+    )
+
+
+def test_fake_server_auth(fake_server):
+    asw = _auth_subwinder(fake_server)
+
+    assert asw.user_info().name == "<username>"
+    assert Subwinder(
+        api_base=fake_server.api_base
+    ).server_info().total_subtitle_files == len(fake_server.api.catalog)
+
+    # Endpoints that need a token reject missing or stale ones
+    client = build_client(api_base=fake_server.api_base)
+    with pytest.raises(SubLibError):
+        request(Endpoints.GET_USER_INFO, "<bad token>", client=client)
+
+    asw._logout()
+    with pytest.raises(SubLibError):
+        request(Endpoints.NO_OPERATION, asw._token, client=client)
+
+
+def test_fake_server_search_and_download(fake_server, tmp_path):
+    asw = _auth_subwinder(fake_server)
+    fringe = MediaFile.from_parts("18379ac9af039390", 366876694, tmp_path, "fringe.mkv")
+    movie = Movie("Night Watch", 2004, "1000001", None, None)
+
+    results = asw.search_subtitles_unranked([(fringe, "en"), (movie, "fr")])
+    assert [len(group) for group in results] == [2, 2]
+    assert isinstance(results[0][0].media, Episode)
+    assert results[1][0].subtitles.lang_2 == "fr"
+
+    paths = asw.download_subtitles([results[0][0]], tmp_path)
+    assert Path(paths[0]).read_bytes().startswith(b"1\n")
+    assert asw.preview_subtitles([results[1][0]])[0].startswith("1\n")
+
+    guesses = asw.guess_media_unranked(["Charade (1963) 1080p", "nothing"])
+    assert guesses[0].best_guess.name == "Charade"
+    assert guesses[1].best_guess is None
+
+
+def test_fake_server_languages(fake_server, no_fake_langs):
+    # Nothing should go to the real API, language list included
+    with patch.object(subwinder._request, "_client") as mocked:
+        asw = _auth_subwinder(fake_server)
+        assert asw.get_languages() == LANGS
+
+        movie = Movie("Night Watch", 2004, "1000001", None, None)
+        results = asw.search_subtitles_unranked([(movie, "en")])
+        assert results[0][0].subtitles.lang_2 == "en"
+
+    assert mocked.mock_calls == []
+
+
+def test_fake_server_batch_limits(fake_server):
+    asw = _auth_subwinder(fake_server)
+
+    with pytest.raises(SubLibError):
+        asw._request(Endpoints.GUESS_MOVIE_FROM_STRING, ["a", "b", "c", "d"])
+    with pytest.raises(SubLibError):
+        asw._request(Endpoints.DOWNLOAD_SUBTITLES, [str(i) for i in range(21)])
+
+
+def test_fake_server_faults(fake_server):
+    client = build_client(api_base=fake_server.api_base)
+    faults = fake_server.api.faults
+
+    faults.maintenance = True
+    assert client.ServerInfo()["status"] == "506 Server under maintenance"
+    faults.maintenance = False
+
+    faults.error_rate = 1
+    with pytest.raises(ProtocolError) as err:
+        client.ServerInfo()
+    assert err.value.errcode == 503
+    faults.error_rate = 0
+
+    # The connection is still good after the error
+    faults.rate, faults.per = 2, 60
+    assert "status" not in client.ServerInfo()
+    assert "status" not in client.ServerInfo()
+    assert client.ServerInfo()["status"] == "429 Too many requests"
@@ -0,0 +1,271 @@
+import asyncio
+import json
+import threading
+import time
+from xmlrpc.client import ProtocolError
+
+import pytest
+
+from subwinder._request import Endpoints, request_async
+from subwinder.aio import AsyncAuthSubwinder, AsyncSubwinder, _batch, _batch_iter
+from subwinder.exceptions import SubLibError
+from subwinder.transport import AsyncTransport
+from tests.constants import (
+    DISTINCT_MEDIA,
+    FULL_USER_INFO1,
+    SEARCH_RESULT2,
+    SERVER_INFO,
+    SUBWINDER_RESPONSES,
+)
+from tests.utils import ThreadedXMLRPCServer
+
+
+def _load_response(name):
+    with (SUBWINDER_RESPONSES / f"{name}.json").open() as f:
+        return json.load(f)
+
+
+class _FakeApi:
+    """
+    Just enough of the API to run the async clients against.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.calls = []
+
+    def _dispatch(self, method, params):
+        self.calls.append(method)
+        return getattr(self, method)(*params)
+
+    def LogIn(self, username, password_hash, lang, useragent):
+        return {"status": "200 OK", "token": f"<{username}'s token>"}
+
+    def LogOut(self, token):
+        return {"status": "200 OK"}
+
+    def NoOperation(self, token):
+        return {"status": "200 OK"}
+
+    def ServerInfo(self):
+        return _load_response("server_info")
+
+    def GetUserInfo(self, token):
+        return {"status": "200 OK", "data": _load_response("full_user_info")}
+
+    def GetSubLanguages(self):
+        data = [{"ISO639": "en", "SubLanguageID": "eng", "LanguageName": "English"}]
+        return {"status": "200 OK", "data": data}
+
+    def SearchSubtitles(self, token, queries):
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+        # Give the other batches a chance to overlap
+        time.sleep(0.05)
+        raw_result = _load_response("search_subtitles")["data"][0]
+        data = [dict(raw_result, QueryNumber=str(i)) for i in range(len(queries))]
+
+        with self._lock:
+            self.in_flight -= 1
+
+        return {"status": "200 OK", "data": data}
+
+
+@pytest.fixture
+def server():
+    with ThreadedXMLRPCServer() as server:
+        server.api = _FakeApi()
+        server.register_instance(server.api)
+
+        yield server
+
+
+def test_AsyncTransport(server):
+    server.register_function(lambda value: value, "Echo")
+    MAX_CONNECTIONS = 3
+
+    async def main():
+        transport = AsyncTransport(server.api_base, MAX_CONNECTIONS)
+        results = await asyncio.gather(
+            *(transport.call("Echo", (i,)) for i in range(20))
+        )
+        await transport.close()
+
+        return results
+
+    assert asyncio.run(main()) == list(range(20))
+    assert len(server.RequestHandlerClass.connections) <= MAX_CONNECTIONS
+
+    with pytest.raises(ValueError):
+        AsyncTransport(max_connections=0)
+
+
+def test_AsyncTransport_reconnects_stale(server):
+    server.RequestHandlerClass.drop_connections = True
+
+    async def main():
+        transport = AsyncTransport(server.api_base)
+        for _ in range(3):
+            await transport.call("ServerInfo", ())
+        await transport.close()
+
+    asyncio.run(main())
+
+    # Each dropped connection needed to be replaced
+    assert len(server.RequestHandlerClass.connections) == 3
+
+
+def test_AsyncTransport_no_retry_mid_body(server):
+    calls = 0
+
+    async def broken_body(*args):
+        nonlocal calls
+        calls += 1
+        raise ConnectionResetError
+
+    async def main():
+        transport = AsyncTransport(server.api_base)
+        await transport.call("ServerInfo", ())
+
+        # Results could have already been streamed from the body so it's not retried
+        transport._read_body = broken_body
+        with pytest.raises(ConnectionResetError):
+            await transport.call("ServerInfo", ())
+        await transport.close()
+
+    asyncio.run(main())
+    assert calls == 1
+
+
+def test_AsyncTransport_gzip(server):
+    server.register_function(lambda value: value, "Echo")
+    DATA = "Very compressible " * 1000
+
+    async def main():
+        transport = AsyncTransport(server.api_base, encode_threshold=1000)
+        result = await transport.call("Echo", (DATA,))
+        await transport.close()
+
+        return result, transport.stats
+
+    result, stats = asyncio.run(main())
+
+    # Both the request and the response were gzipped on the wire
+    assert result == DATA
+    assert stats.requests == 1
+    assert stats.sent_bytes < len(DATA)
+    assert stats.received_bytes < len(DATA) < stats.decoded_bytes
+
+
+def test_request_async_errors(server):
+    async def main(api_base):
+        transport = AsyncTransport(api_base)
+        try:
+            return await request_async(Endpoints.SERVER_INFO, None, transport=transport)
+        finally:
+            await transport.close()
+
+    assert "xmlrpc_version" in asyncio.run(main(server.api_base))
+
+    # Unknown paths get a 404 which isn't something the API should ever send
+    with pytest.raises(SubLibError) as excinfo:
+        asyncio.run(main(server.api_base + "missing"))
+    assert isinstance(excinfo.value.__context__, ProtocolError)
+
+
+def test__batch():
+    in_flight = 0
+    max_in_flight = 0
+
+    async def function(values):
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+
+        return [value * 2 for value in values]
+
+    result = asyncio.run(_batch(function, 2, 3, [list(range(15))]))
+
+    # Results are kept in order while at most 3 batches ran at once
+    assert result == [value * 2 for value in range(15)]
+    assert max_in_flight == 3
+
+
+def test__batch_iter():
+    async def function(values):
+        # Later batches finish first
+        await asyncio.sleep(0.01 * (3 - values[0]))
+        return [value * 2 for value in values]
+
+    async def main():
+        return [pair async for pair in _batch_iter(function, 1, 3, [[0, 1, 2]])]
+
+    assert asyncio.run(main()) == [([[2]], [4]), ([[1]], [2]), ([[0]], [0])]
+
+
+def test_AsyncSubwinder(server):
+    async def main():
+        async with AsyncSubwinder(AsyncTransport(server.api_base)) as sw:
+            return await sw.server_info(), await sw.get_languages()
+
+    assert asyncio.run(main()) == (
+        SERVER_INFO,
+        [
+            ("de", "ger", "German"),
+            ("en", "eng", "English"),
+            ("fr", "fre", "French"),
+        ],
+    )
+
+    with pytest.raises(ValueError):
+        AsyncSubwinder(max_concurrency=0)
+
+
+def test_AsyncSubwinder_languages(server, no_fake_langs):
+    async def main():
+        async with AsyncSubwinder(AsyncTransport(server.api_base)) as sw:
+            return await sw.get_languages()
+
+    # The language list comes from the same server as everything else
+    assert asyncio.run(main()) == [("en", "eng", "English")]
+    assert server.api.calls == ["GetSubLanguages"]
+
+
+def test_AsyncAuthSubwinder(server):
+    QUERIES = [(media, "en") for media in DISTINCT_MEDIA[:5]]
+
+    async def main():
+        asw = AsyncAuthSubwinder(
+            "<username>",
+            "<password>",
+            transport=AsyncTransport(server.api_base, max_connections=8),
+            max_concurrency=3,
+        )
+        async with asw:
+            assert asw._token == "<<username>'s token>"
+
+            user_info = await asw.user_info()
+            await asw.ping()
+            results = await asw.search_subtitles_unranked(QUERIES)
+            pairs = [pair async for pair in asw.search_subtitles_iter(QUERIES)]
+
+        return user_info, results, pairs
+
+    user_info, results, pairs = asyncio.run(main())
+    assert user_info == FULL_USER_INFO1
+    # The dev useragent searches one query at a time
+    assert results == [[SEARCH_RESULT2]] * 5
+    # Batches finish in any order
+    assert sorted(pairs, key=lambda pair: pair[0][0].hash) == [
+        (query, SEARCH_RESULT2) for query in QUERIES
+    ]
+    assert server.api.max_in_flight == 3
+    assert server.api.calls == ["LogIn", "GetUserInfo", "NoOperation"] + [
+        "SearchSubtitles"
+    ] * 10 + ["LogOut"]
@@ -0,0 +1,235 @@
+import asyncio
+import os
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+
+import subwinder._request
+from subwinder import MediaFile, utils
+from subwinder._request import (
+    Endpoints,
+    _client,
+    _multicall_with_retries,
+    build_client,
+    multicall,
+    request,
+    request_async,
+)
+from subwinder._unmarshal import stream_data
+from subwinder.cache import HashCache, ResponseCache, bypass_cache
+from subwinder.exceptions import SubAuthError
+from subwinder.metrics import MetricsCollector
+from subwinder.transport import PooledTransport
+from subwinder.utils import special_hash
+from tests.utils import RandomTempFile, ThreadedXMLRPCServer
+
+
+def test_HashCache(tmp_path):
+    with HashCache(tmp_path / "hashes.db") as cache, RandomTempFile(
+        128 * 1024, seed=1
+    ) as rand_file:
+        # First lookup has to read the file
+        assert special_hash(rand_file, cache) == "25182dd38c3b3793"
+        assert (cache.hits, cache.misses) == (0, 1)
+
+        # Second lookup should come straight from the cache
+        with patch.object(utils, "_read_hash") as mocked:
+            media = MediaFile(rand_file, cache)
+            mocked.assert_not_called()
+        assert media.hash == "25182dd38c3b3793"
+        assert media.size == 128 * 1024
+        assert (cache.hits, cache.misses) == (1, 1)
+
+        # Changing the modification time invalidates the entry
+        stat = rand_file.stat()
+        os.utime(rand_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        assert special_hash(rand_file, cache) == "25182dd38c3b3793"
+        assert (cache.hits, cache.misses) == (1, 2)
+        assert len(cache) == 1
+
+        # Nothing to prune while the file still exists
+        assert cache.prune() == 0
+        assert len(cache) == 1
+
+    # The entry should persist, but get pruned now that the file is gone
+    with HashCache(tmp_path / "hashes.db") as cache:
+        assert len(cache) == 1
+        assert cache.prune() == 1
+        assert len(cache) == 0
+
+
+def test_HashCache_prune_unreachable(tmp_path):
+    media_dir = tmp_path / "media"
+    media_dir.mkdir()
+    filepath = media_dir / "movie.mkv"
+    filepath.write_bytes(b"\0" * 1024)
+
+    with HashCache(tmp_path / "hashes.db") as cache:
+        cache.set(filepath, filepath.stat(), "0123456789abcdef")
+
+        # Replacing the directory with a file makes the stat fail with something other
+        # than `FileNotFoundError`, which should still be treated as stale
+        filepath.unlink()
+        media_dir.rmdir()
+        media_dir.write_bytes(b"")
+
+        assert cache.prune(vacuum=False) == 1
+        assert len(cache) == 0
+
+
+def test_ResponseCache(tmp_path):
+    RESP = {"status": "200 OK", "data": [{"IDSubtitleFile": "1"}]}
+    QUERY = [{"moviehash": "0123456789abcdef", "moviebytesize": 1234}]
+
+    with ResponseCache(max_entries=2, db_path=tmp_path / "responses.db") as cache:
+        assert cache.get(Endpoints.SEARCH_SUBTITLES, (QUERY,)) is None
+        cache.set(Endpoints.SEARCH_SUBTITLES, (QUERY,), RESP)
+
+        # Keys are normalized so that equivalent params share an entry
+        same_query = [{"moviebytesize": "1234", "moviehash": "0123456789abcdef"}]
+        cached = cache.get(Endpoints.SEARCH_SUBTITLES, [same_query])
+        assert cached == RESP
+        assert (cache.hits, cache.misses) == (1, 1)
+
+        # Callers get their own copy
+        cached["data"].clear()
+        assert cache.get(Endpoints.SEARCH_SUBTITLES, (QUERY,)) == RESP
+
+        with bypass_cache():
+            assert cache.get(Endpoints.SEARCH_SUBTITLES, (QUERY,)) is None
+
+        # Only idempotent endpoints get cached
+        cache.set(Endpoints.DOWNLOAD_SUBTITLES, (["1"],), RESP)
+        assert cache.get(Endpoints.DOWNLOAD_SUBTITLES, (["1"],)) is None
+
+        # Least recently used entries get evicted from memory first
+        cache.set(Endpoints.PREVIEW_SUBTITLES, (["1"],), RESP)
+        cache.get(Endpoints.SEARCH_SUBTITLES, (QUERY,))
+        cache.set(Endpoints.PREVIEW_SUBTITLES, (["2"],), RESP)
+        assert len(cache) == 2
+
+        # Expired entries are gone
+        with patch("subwinder.cache.time.time", return_value=time.time() + 61):
+            assert cache.get(Endpoints.SERVER_INFO, ()) is None
+        cache.set(Endpoints.SERVER_INFO, (), RESP)
+        with patch("subwinder.cache.time.time", return_value=time.time() + 61):
+            assert cache.get(Endpoints.SERVER_INFO, ()) is None
+
+    # Evicted entries can still be found in the database
+    with ResponseCache(db_path=tmp_path / "responses.db") as cache:
+        assert cache.get(Endpoints.PREVIEW_SUBTITLES, (["1"],)) == RESP
+        cache.clear()
+        assert cache.get(Endpoints.PREVIEW_SUBTITLES, (["2"],)) is None
+
+
+def test_request_cache():
+    RESP = {"status": "200 OK", "data": [1, 2, 3]}
+    cache = ResponseCache()
+    collector = MetricsCollector()
+
+    with patch.object(_client, "SearchSubtitles", return_value=RESP) as mocked:
+        for _ in range(3):
+            resp = request(
+                Endpoints.SEARCH_SUBTITLES,
+                "<token>",
+                [{"imdbid": "1"}],
+                cache=cache,
+                metrics=collector,
+            )
+            assert resp == RESP
+
+        mocked.assert_called_once()
+
+        with bypass_cache():
+            request(
+                Endpoints.SEARCH_SUBTITLES, "<token>", [{"imdbid": "1"}], cache=cache
+            )
+        assert mocked.call_count == 2
+
+    stats = collector.stats()["SearchSubtitles"]
+    assert (stats.count, stats.cache_hits) == (3, 2)
+    assert stats.cache_hit_ratio == pytest.approx(2 / 3)
+
+    # Failed responses aren't cached
+    with patch.object(_client, "ServerInfo", return_value={"status": "401 Nope"}):
+        with pytest.raises(SubAuthError):
+            request(Endpoints.SERVER_INFO, None, cache=cache)
+    assert cache.get(Endpoints.SERVER_INFO, ()) is None
+
+
+def test_request_async_cache(tmp_path):
+    RESP = {"status": "200 OK", "data": [1, 2, 3]}
+
+    class Transport:
+        calls = 0
+
+        async def call(self, method, params):
+            self.calls += 1
+            return RESP
+
+    with ResponseCache(db_path=tmp_path / "responses.db") as cache:
+        threads = set()
+        for name in ("get", "set"):
+            method = getattr(cache, name)
+
+            def tracked(*args, method=method):
+                threads.add(threading.get_ident())
+                return method(*args)
+
+            setattr(cache, name, tracked)
+
+        async def main():
+            transport = Transport()
+            for _ in range(2):
+                resp = await request_async(
+                    Endpoints.SERVER_INFO, None, transport=transport, cache=cache
+                )
+                assert resp == RESP
+
+            with bypass_cache():
+                await request_async(
+                    Endpoints.SERVER_INFO, None, transport=transport, cache=cache
+                )
+
+            return threading.get_ident(), transport.calls
+
+        loop_thread, calls = asyncio.run(main())
+
+    # Only the first and bypassed calls made requests
+    assert calls == 2
+    # And the database was never touched from the event loop
+    assert threads and loop_thread not in threads
+
+
+def test_request_cache_streaming():
+    RESP = {"status": "200 OK", "data": list(range(50))}
+
+    with ThreadedXMLRPCServer() as server:
+        server.register_function(lambda token, queries: RESP, "SearchSubtitles")
+        server.register_multicall_functions()
+
+        cache = ResponseCache()
+        client = build_client(PooledTransport(), server.api_base)
+
+        # The full response is cached even while streaming is requested
+        streamed = []
+        with stream_data(streamed.append):
+            resp = request(
+                Endpoints.SEARCH_SUBTITLES, "<token>", [], client=client, cache=cache
+            )
+        assert resp == RESP
+        assert cache.get(Endpoints.SEARCH_SUBTITLES, ([],)) == RESP
+
+        # Cached calls are left out of the `system.multicall` request
+        CALLS = [
+            (Endpoints.SEARCH_SUBTITLES, ([],)),
+            (Endpoints.SEARCH_SUBTITLES, ([1],)),
+        ]
+        with patch.object(
+            subwinder._request, "_multicall_with_retries", wraps=_multicall_with_retries
+        ) as mocked:
+            assert multicall(CALLS, "<token>", client=client, cache=cache) == [RESP] * 2
+        mocked.assert_called_once_with(CALLS[1:], "<token>", client, None)
+        assert cache.get(Endpoints.SEARCH_SUBTITLES, ([1],)) == RESP
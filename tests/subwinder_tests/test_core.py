@@ -1,3 +1,4 @@
+import copy
 import json
 from datetime import datetime
 from pathlib import Path
@@ -6,9 +7,9 @@ from unittest.mock import call, patch
 
 import pytest
 
-from subwinder import AuthSubwinder, Subwinder
+from subwinder import AuthSubwinder, MediaFile, Subwinder
 from subwinder._request import Endpoints
-from subwinder.exceptions import SubDownloadError
+from subwinder.exceptions import SubDownloadError, SubLangError
 from subwinder.info import Comment, Movie, TvSeries, User
 from subwinder.names import NameFormatter
 from tests.constants import (
@@ -309,6 +310,104 @@ def test_search_subtitles():
     )
 
 
+def test_search_subtitles_iter():
+    QUERIES = [(MEDIA1, "en"), (MOVIE_INFO1, "fr"), (EPISODE_INFO1, "de")]
+    asw = _dummy_auth_subwinder()
+    asw.limited_search_size = True
+
+    def search(queries):
+        return [[SEARCH_RESULT2] for _ in queries]
+
+    with patch.object(asw, "_search_subtitles_unranked", side_effect=search) as mocked:
+        results = asw.search_subtitles_iter(QUERIES)
+        # Nothing is searched till the results are asked for
+        assert mocked.call_count == 0
+
+        # Then each batch is searched as it's needed
+        assert next(results) == (QUERIES[0], SEARCH_RESULT2)
+        assert mocked.call_count == 1
+        assert list(results) == [(query, SEARCH_RESULT2) for query in QUERIES[1:]]
+        assert mocked.call_count == 3
+
+    # Queries are still checked up front
+    with pytest.raises(SubLangError):
+        asw.search_subtitles_unranked_iter([(MEDIA1, "<bad lang>")])
+
+
+def test_search_subtitles_dedupe():
+    # A copy of `MEDIA1` somewhere else
+    media_copy = MediaFile.from_parts(MEDIA1.hash, MEDIA1.size, "/other", "copy.mkv")
+    QUERIES = [(MEDIA1, "en"), (MOVIE_INFO1, "en"), (media_copy, "en"), (MEDIA1, "fr")]
+    asw = _dummy_auth_subwinder()
+    asw.limited_search_size = True
+
+    def search(queries):
+        return [[copy.deepcopy(SEARCH_RESULT2)] for _ in queries]
+
+    with patch.object(asw, "_search_subtitles_unranked", side_effect=search) as mocked:
+        groups = asw.search_subtitles_unranked(QUERIES)
+        pairs = list(asw.search_subtitles_unranked_iter(QUERIES))
+
+    # The copy is only searched for once
+    assert mocked.call_args_list == [call(QUERIES[i : i + 1]) for i in (0, 1, 3)] * 2
+    assert [query for query, _ in pairs] == QUERIES
+    assert [group for _, group in pairs] == groups
+
+    # While still getting its own results with its own name
+    (copied,) = groups[2]
+    assert copied is not groups[0][0]
+    assert copied.media.get_dirname() == Path("/other")
+    assert copied.media.get_filename() == Path("copy.mkv")
+    assert groups[0][0].media.get_dirname() == MEDIA1.get_dirname()
+
+
+def test_search_subtitles_multiple_langs():
+    QUERIES = [(MEDIA1, ["en", "fr"]), (MEDIA1, "en")]
+    CALL = (
+        Endpoints.SEARCH_SUBTITLES,
+        [
+            {
+                "sublanguageid": "eng,fre",
+                "moviehash": "18379ac9af039390",
+                "moviebytesize": "366876694",
+            },
+            {
+                "sublanguageid": "eng",
+                "moviehash": "18379ac9af039390",
+                "moviebytesize": "366876694",
+            },
+        ],
+    )
+    with (SUBWINDER_RESPONSES / "search_subtitles.json").open() as f:
+        RESP = json.load(f)
+
+    # Both languages are searched for in one query and split back up by language (the
+    # response only has results for the first query)
+    _standard_asw_mock(
+        "search_subtitles_unranked",
+        "_request",
+        [QUERIES],
+        RESP,
+        CALL,
+        [{"en": [SEARCH_RESULT2], "fr": []}, []],
+    )
+    # With the best result picked for each language
+    _standard_asw_mock(
+        "search_subtitles",
+        "_request",
+        [QUERIES],
+        RESP,
+        CALL,
+        [{"en": SEARCH_RESULT2, "fr": None}, None],
+    )
+
+    asw = _dummy_auth_subwinder()
+    with pytest.raises(SubLangError):
+        asw.search_subtitles_unranked([(MEDIA1, ["en", "<bad lang>"])])
+    with pytest.raises(ValueError):
+        asw.search_subtitles_unranked([(MEDIA1, [])])
+
+
 # XXX: combine this with the above
 def test__search_subtitles_unranked():
     QUERIES = [[(MEDIA1, "en")]]
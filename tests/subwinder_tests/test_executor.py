@@ -0,0 +1,186 @@
+import contextvars
+import json
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+
+from subwinder import AuthSubwinder
+from subwinder._request import Endpoints, _Backoff, request
+from subwinder.executor import (
+    AdaptiveExecutor,
+    SerialExecutor,
+    ThreadedExecutor,
+    _report_status,
+)
+from subwinder.ratelimit import RateLimiter
+from tests.constants import DISTINCT_MEDIA, SEARCH_RESULT2, SUBWINDER_RESPONSES
+from tests.utils import ThreadedXMLRPCServer
+
+
+class FakeSearch:
+    """
+    Searches that take long enough to overlap while tracking how many do.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+        with (SUBWINDER_RESPONSES / "search_subtitles.json").open() as f:
+            self.raw_result = json.load(f)["data"][0]
+
+    def search_subtitles(self, token, queries):
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+        time.sleep(0.05)
+
+        with self._lock:
+            self.in_flight -= 1
+
+        data = [dict(self.raw_result, QueryNumber=str(i)) for i in range(len(queries))]
+        return {"status": "200 OK", "data": data}
+
+
+class CountingRateLimiter(RateLimiter):
+    def __init__(self):
+        super().__init__()
+        self.acquired = []
+
+    def acquire(self, endpoint):
+        self.acquired.append(endpoint)
+        super().acquire(endpoint)
+
+
+def test_SerialExecutor():
+    results = SerialExecutor().map(lambda value: value * 2, range(5))
+    assert list(results) == [0, 2, 4, 6, 8]
+
+
+def test_ThreadedExecutor():
+    lock = threading.Lock()
+    in_flight = 0
+    max_in_flight = 0
+
+    def double(value):
+        nonlocal in_flight, max_in_flight
+        with lock:
+            in_flight += 1
+            max_in_flight = max(max_in_flight, in_flight)
+
+        # Later values finish first
+        time.sleep(0.01 * (10 - value))
+
+        with lock:
+            in_flight -= 1
+
+        return value * 2
+
+    # Results stay in order while at most 3 ran at once
+    results = ThreadedExecutor(3).map(double, range(10))
+    assert list(results) == [value * 2 for value in range(10)]
+    assert max_in_flight == 3
+
+    with pytest.raises(ValueError):
+        ThreadedExecutor(0)
+
+
+def test_ThreadedExecutor_context():
+    var = contextvars.ContextVar("var", default=None)
+
+    # Calls run in the context of whoever started the `map`
+    token = var.set("<value>")
+    try:
+        results = ThreadedExecutor(2).map(lambda _: var.get(), range(4))
+        assert list(results) == ["<value>"] * 4
+    finally:
+        var.reset(token)
+
+
+def test_executor_batches():
+    QUERIES = [(media, "en") for media in DISTINCT_MEDIA]
+    search = FakeSearch()
+    rate_limiter = CountingRateLimiter()
+
+    with ThreadedXMLRPCServer() as server:
+        server.register_function(
+            lambda *args: {"status": "200 OK", "token": "<token>"}, "LogIn"
+        )
+        server.register_function(search.search_subtitles, "SearchSubtitles")
+
+        asw = AuthSubwinder(
+            "<username>",
+            "<password>",
+            api_base=server.api_base,
+            rate_limiter=rate_limiter,
+            executor=ThreadedExecutor(3),
+        )
+        # The dev useragent searches one query at a time
+        assert asw.search_subtitles(QUERIES) == [SEARCH_RESULT2] * 6
+
+    assert search.max_in_flight == 3
+    # Every batch still went through the rate limiter
+    assert rate_limiter.acquired.count(Endpoints.SEARCH_SUBTITLES) == 6
+
+
+def test_AdaptiveExecutor():
+    lock = threading.Lock()
+    in_flight = 0
+    max_in_flight = 0
+
+    def overloaded_past_3(value):
+        nonlocal in_flight, max_in_flight
+        with lock:
+            in_flight += 1
+            max_in_flight = max(max_in_flight, in_flight)
+            congested = in_flight > 3
+
+        _report_status("429" if congested else "200", congested)
+        time.sleep(0.01)
+
+        with lock:
+            in_flight -= 1
+
+        return value
+
+    executor = AdaptiveExecutor(max_concurrency=8, initial_concurrency=8)
+    assert list(executor.map(overloaded_past_3, range(60))) == list(range(60))
+
+    # It backed off from the start and then kept hovering around what worked
+    assert executor.backoffs > 1
+    assert executor.concurrency <= 5
+
+    # While things going well lets it grow back up to the max
+    assert list(executor.map(lambda value: _report_status("200", False), range(60)))
+    assert executor.concurrency == 8
+
+    with pytest.raises(ValueError):
+        AdaptiveExecutor(initial_concurrency=32)
+    with pytest.raises(ValueError):
+        AdaptiveExecutor(decrease=1)
+
+
+def test_AdaptiveExecutor_request():
+    class Client:
+        def __init__(self):
+            self.statuses = ["429 Too many requests", "503 Busy", "200 OK"]
+
+        def ServerInfo(self):
+            return {"status": self.statuses.pop(0)}
+
+    executor = AdaptiveExecutor(initial_concurrency=8)
+
+    def server_info(_):
+        return request(Endpoints.SERVER_INFO, None, client=Client())
+
+    # Requests let the executor know about any responses that need backing off, but
+    # only one cut is made for them
+    with patch.object(_Backoff, "next_delay", return_value=0):
+        list(executor.map(server_info, range(1)))
+
+    assert executor.backoffs == 1
+    assert executor.concurrency == 4
@@ -1,3 +1,5 @@
+import threading
+import time
 from datetime import timedelta
 from unittest.mock import call, patch
 
@@ -63,3 +65,29 @@ def test_globals(no_fake_langs):
 
         # `_get_languages` should only be called once
         mocked.assert_called_once_with()
+
+
+def test_LangConverter_concurrent_refresh():
+    converter = _LangConverter()
+    release = threading.Event()
+
+    def slow_fetch():
+        release.wait(5)
+        return RESP
+
+    with patch.object(converter, "_fetch", side_effect=slow_fetch) as mocked:
+        threads = [
+            threading.Thread(target=converter.list, args=(LangFormat.LANG_2,))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+
+        # Let every thread pile up on the refresh before it finishes
+        time.sleep(0.1)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+    mocked.assert_called_once_with()
+    assert converter.list(LangFormat.LANG_2) == ["de", "en", "fr"]
@@ -1,7 +1,18 @@
+import os
+import shutil
+from datetime import datetime
 from pathlib import Path
+from unittest.mock import Mock, patch
+
+import pytest
 
 from subwinder import MediaFile
-from tests.utils import RandomTempFile
+from subwinder.cache import HashCache
+from subwinder.exceptions import SubHashError
+from subwinder.media import MediaLibrary
+from subwinder.ranking import rank_search_subtitles
+from tests.constants import SEARCH_RESULT2
+from tests.utils import LocalRangeReader, RandomTempFile
 
 
 def test_Media():
@@ -13,3 +24,148 @@ def test_Media():
         assert media.get_filename() == Path(rand_file.name)
         assert media.get_dirname() == rand_file.parent
         assert media.get_filepath() == rand_file
+
+
+def test_Media_range_reader():
+    with RandomTempFile(128 * 1024, seed=1) as rand_file:
+        assert MediaFile(LocalRangeReader(rand_file)) == MediaFile(rand_file)
+
+
+def test_from_paths():
+    with RandomTempFile(128 * 1024, seed=1) as file1, RandomTempFile(
+        1024, seed=2
+    ) as file2:
+        # Generators should be fine since the paths are consumed lazily
+        results = list(MediaFile.from_paths(iter([file1, file2, file1]), 2))
+        missing = list(MediaFile.from_paths([file1.parent / "missing.mkv"]))
+
+    assert isinstance(missing[0], SubHashError)
+    assert results[0] == results[2]
+    assert results[0].hash == "25182dd38c3b3793"
+    assert results[0].get_filepath() == file1
+    assert isinstance(results[1], SubHashError)
+
+
+def test_MediaLibrary_scan(tmp_path):
+    DIRS = [tmp_path, tmp_path / "nested", tmp_path / "nested" / "deeper"]
+    for directory in DIRS[1:]:
+        directory.mkdir()
+
+    expected = []
+    for i, directory in enumerate(DIRS):
+        with RandomTempFile(128 * 1024, seed=i) as rand_file:
+            shutil.copy(rand_file, directory / f"media_{i}.MKV")
+            shutil.copy(rand_file, directory / f"media_{i}.txt")
+        expected.append(MediaFile(directory / f"media_{i}.MKV"))
+
+        # Too small to get picked up
+        with RandomTempFile(1024, seed=i) as rand_file:
+            shutil.copy(rand_file, directory / f"tiny_{i}.mkv")
+
+    def key(media):
+        return str(media.get_filepath())
+
+    scanned = MediaLibrary.scan(tmp_path, extensions=["mkv", ".avi"])
+    assert sorted(scanned, key=key) == sorted(expected, key=key)
+
+    # Without filters everything big enough to hash gets picked up
+    assert len(list(MediaLibrary.scan(tmp_path))) == 2 * len(DIRS)
+    assert len(list(MediaLibrary.scan(tmp_path, min_size=256 * 1024))) == 0
+
+    # Cache lookups should reuse the `stat` from scanning
+    with HashCache(tmp_path / "hashes.db") as cache:
+        with patch.object(Path, "stat") as mocked:
+            assert len(list(MediaLibrary.scan(DIRS[2], cache=cache))) == 2
+            mocked.assert_not_called()
+        assert cache.misses == 2
+
+
+def test_MediaLibrary_rescan(tmp_path):
+    root = tmp_path / "library"
+    nested = root / "nested"
+    nested.mkdir(parents=True)
+    FILES = [root / "a.mkv", nested / "b.mkv", nested / "c.mkv"]
+    for seed, filepath in enumerate(FILES):
+        with RandomTempFile(128 * 1024, seed=seed) as rand_file:
+            shutil.copy(rand_file, filepath)
+
+    def paths(media):
+        return sorted(m.get_filepath() for m in media)
+
+    with MediaLibrary(tmp_path / "index.db") as library:
+        # Everything is new on the first scan
+        report = library.rescan(root)
+        assert paths(report.added) == sorted(FILES)
+        assert report.changed == report.removed == []
+        assert paths(library.unsearched()) == sorted(FILES)
+
+        # Nothing changed so nothing should get hashed
+        with patch("subwinder.media._media_from_entry") as mocked:
+            report = library.rescan(root)
+            mocked.assert_not_called()
+        assert report.added == report.changed == report.removed == []
+
+        # Searching should only record the outcome for the searched media
+        asw = Mock()
+        asw.search_subtitles.return_value = [SEARCH_RESULT2, None]
+        searched = [m for m in library.unsearched() if m.get_filepath() != FILES[2]]
+        results = library.search_subtitles(asw, searched, "en")
+        assert results == [SEARCH_RESULT2, None]
+        asw.search_subtitles.assert_called_once_with(
+            [(m, "en") for m in searched], rank_search_subtitles
+        )
+        assert paths(library.unsearched()) == [FILES[2]]
+        searched_at, file_id = library.last_search(searched[0])
+        assert isinstance(searched_at, datetime)
+        assert file_id == SEARCH_RESULT2.subtitles.file_id
+        assert library.last_search(searched[1])[1] is None
+
+        # Only a single language fits in the index and nothing gets searched otherwise
+        asw.reset_mock()
+        with pytest.raises(TypeError):
+            library.search_subtitles(asw, searched, ["en", "fr"])
+        asw.search_subtitles.assert_not_called()
+
+        # Files that can't be read right now are left alone instead of aborting
+        stat = FILES[2].stat()
+        os.utime(FILES[2], ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        with patch.object(Path, "open", side_effect=PermissionError):
+            report = library.rescan(root)
+            assert list(MediaLibrary.scan(nested)) == []
+        assert report.added == report.changed == report.removed == []
+        assert len(library) == 3
+
+        # Same with directories that can't be listed and files that can't be checked
+        scandir = os.scandir
+
+        def failing_scandir(path):
+            if path == str(nested):
+                raise PermissionError
+            return scandir(path)
+
+        with patch("os.scandir", side_effect=failing_scandir):
+            report = library.rescan(root)
+        assert report.added == report.changed == report.removed == []
+        assert len(library) == 3
+
+        with patch.object(os.DirEntry, "stat", side_effect=PermissionError):
+            report = library.rescan(root)
+        assert report.added == report.changed == report.removed == []
+        assert len(library) == 3
+
+        # Touching a file, adding a file, and removing a whole directory
+        stat = FILES[0].stat()
+        os.utime(FILES[0], ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        shutil.copy(FILES[0], root / "d.mkv")
+        shutil.rmtree(nested)
+
+        report = library.rescan(root)
+        assert paths(report.added) == [root / "d.mkv"]
+        assert paths(report.changed) == [FILES[0]]
+        assert sorted(report.removed) == sorted(FILES[1:])
+        assert paths(report.delta) == sorted([FILES[0], root / "d.mkv"])
+
+    # The index should persist between runs
+    with MediaLibrary(tmp_path / "index.db") as library:
+        assert len(library) == 2
+        assert paths(library.unsearched()) == sorted([FILES[0], root / "d.mkv"])
@@ -0,0 +1,138 @@
+import asyncio
+from unittest.mock import patch
+from xml.parsers.expat import ExpatError
+
+import pytest
+
+from subwinder import Subwinder
+from subwinder._request import Endpoints, _client, build_client, multicall, request
+from subwinder.aio import AsyncSubwinder
+from subwinder.exceptions import SubAuthError, SubServerError
+from subwinder.executor import AdaptiveExecutor
+from subwinder.metrics import MetricsCollector, RequestMetrics, to_prometheus
+from subwinder.transport import AsyncTransport, PooledTransport
+from tests.utils import ThreadedXMLRPCServer
+
+
+@pytest.fixture
+def server():
+    with ThreadedXMLRPCServer() as server:
+        server.register_function(lambda: {"status": "200 OK"}, "ServerInfo")
+        server.register_function(lambda token: {"status": "401 Nope"}, "GetUserInfo")
+        server.register_multicall_functions()
+
+        yield server
+
+
+def test_MetricsCollector():
+    collector = MetricsCollector(buckets=(1, 0.1))
+    assert collector.buckets == (0.1, 1)
+
+    collector.record(RequestMetrics("ServerInfo", "200", 0.05, 0, 100, 1000))
+    collector.record(RequestMetrics("ServerInfo", "429", 0.1, 2, 200, 2000))
+    collector.record(RequestMetrics("ServerInfo", "200", 5, 1, 300, 3000))
+
+    stats = collector.stats()["ServerInfo"]
+    assert stats.count == 3
+    assert stats.statuses == {"200": 2, "429": 1}
+    # Bounds are inclusive with a final bucket for anything slower
+    assert stats.latency_counts == [2, 0, 1]
+    assert stats.latency_sum == pytest.approx(5.15)
+    assert (stats.retries, stats.sent_bytes, stats.received_bytes) == (3, 600, 6000)
+
+    # Stats are a snapshot
+    stats.retries = 100
+    assert collector.stats()["ServerInfo"].retries == 3
+
+    collector.reset()
+    assert collector.stats() == {}
+
+
+def test_to_prometheus():
+    collector = MetricsCollector(buckets=(0.1, 1))
+    collector.record(RequestMetrics("LogIn", "200", 0.5, 1, 10, 20))
+    collector.record(RequestMetrics("LogIn", "401", 0.05, 0, 10, 20))
+
+    assert to_prometheus(collector, prefix="sw") == (
+        "# HELP sw_requests_total Requests by endpoint and status.\n"
+        "# TYPE sw_requests_total counter\n"
+        'sw_requests_total{endpoint="LogIn",status="200"} 1\n'
+        'sw_requests_total{endpoint="LogIn",status="401"} 1\n'
+        "# HELP sw_request_duration_seconds Request latency including retries.\n"
+        "# TYPE sw_request_duration_seconds histogram\n"
+        'sw_request_duration_seconds_bucket{endpoint="LogIn",le="0.1"} 1\n'
+        'sw_request_duration_seconds_bucket{endpoint="LogIn",le="1"} 2\n'
+        'sw_request_duration_seconds_bucket{endpoint="LogIn",le="+Inf"} 2\n'
+        'sw_request_duration_seconds_sum{endpoint="LogIn"} 0.55\n'
+        'sw_request_duration_seconds_count{endpoint="LogIn"} 2\n'
+        "# HELP sw_request_retries_total Retries spent backing off.\n"
+        "# TYPE sw_request_retries_total counter\n"
+        'sw_request_retries_total{endpoint="LogIn"} 1\n'
+        "# HELP sw_request_sent_bytes_total Request bytes on the wire.\n"
+        "# TYPE sw_request_sent_bytes_total counter\n"
+        'sw_request_sent_bytes_total{endpoint="LogIn"} 20\n'
+        "# HELP sw_response_received_bytes_total Response bytes on the wire.\n"
+        "# TYPE sw_response_received_bytes_total counter\n"
+        'sw_response_received_bytes_total{endpoint="LogIn"} 40\n'
+        "# HELP sw_request_cache_hits_total Requests answered by a cache.\n"
+        "# TYPE sw_request_cache_hits_total counter\n"
+        'sw_request_cache_hits_total{endpoint="LogIn"} 0\n'
+    )
+
+    executor = AdaptiveExecutor(initial_concurrency=3)
+    executor.backoffs = 2
+    assert to_prometheus(MetricsCollector(), executor=executor).endswith(
+        "# HELP subwinder_batch_concurrency Batches allowed in flight at once.\n"
+        "# TYPE subwinder_batch_concurrency gauge\n"
+        "subwinder_batch_concurrency 3\n"
+        "# HELP subwinder_batch_backoffs_total Cuts to the batch concurrency.\n"
+        "# TYPE subwinder_batch_backoffs_total counter\n"
+        "subwinder_batch_backoffs_total 2\n"
+    )
+
+
+def test_request_metrics(server):
+    collector = MetricsCollector()
+    client = build_client(PooledTransport(), server.api_base)
+
+    request(Endpoints.SERVER_INFO, None, client=client, metrics=collector)
+    with pytest.raises(SubAuthError):
+        request(Endpoints.GET_USER_INFO, "<token>", client=client, metrics=collector)
+    with patch.object(_client, "ServerInfo", side_effect=ExpatError):
+        with pytest.raises(SubServerError):
+            request(Endpoints.SERVER_INFO, None, metrics=collector)
+
+    stats = collector.stats()
+    assert stats["ServerInfo"].statuses == {"200": 1, "SubServerError": 1}
+    assert stats["GetUserInfo"].statuses == {"401": 1}
+    assert stats["ServerInfo"].sent_bytes > 0
+    assert stats["ServerInfo"].received_bytes > 0
+    assert stats["ServerInfo"].latency_sum > 0
+
+
+def test_multicall_metrics(server):
+    collector = MetricsCollector()
+    client = build_client(PooledTransport(), server.api_base)
+    CALLS = [(Endpoints.SERVER_INFO, ()), (Endpoints.GET_USER_INFO, ())]
+
+    multicall(CALLS, "<token>", client=client, metrics=collector)
+
+    stats = collector.stats()
+    assert stats["system.multicall"].statuses == {"200": 1}
+    assert stats["system.multicall"].received_bytes > 0
+    assert stats["ServerInfo"].statuses == {"200": 1}
+    assert stats["GetUserInfo"].statuses == {"401": 1}
+
+
+def test_Subwinder_metrics(server):
+    collector = MetricsCollector()
+    assert Subwinder(metrics=collector)._request_options == {"metrics": collector}
+
+    async def main():
+        transport = AsyncTransport(server.api_base)
+        async with AsyncSubwinder(transport, metrics=collector) as sw:
+            await sw._request(Endpoints.SERVER_INFO)
+        await transport.close()
+
+    asyncio.run(main())
+    assert collector.stats()["ServerInfo"].received_bytes > 0
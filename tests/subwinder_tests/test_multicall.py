@@ -0,0 +1,170 @@
+import json
+import threading
+from unittest.mock import patch
+from xmlrpc.client import Fault
+
+import pytest
+
+from subwinder import AuthSubwinder, Subwinder
+from subwinder._request import Endpoints, build_client, multicall
+from subwinder.exceptions import SubAuthError, SubLangError
+from subwinder.info import ServerInfo
+from subwinder.transport import PooledTransport
+from tests.constants import (
+    DISTINCT_MEDIA,
+    MEDIA1,
+    SEARCH_RESULT2,
+    SERVER_INFO,
+    SUBWINDER_RESPONSES,
+)
+from tests.utils import ThreadedXMLRPCServer
+
+
+class _FakeApi:
+    def __init__(self):
+        self.statuses = []
+
+    def _dispatch(self, method, params):
+        return getattr(self, method)(*params)
+
+    def LogIn(self, username, password_hash, lang, useragent):
+        return {"status": "200 OK", "token": "<token>"}
+
+    def ServerInfo(self):
+        with (SUBWINDER_RESPONSES / "server_info.json").open() as f:
+            return json.load(f)
+
+    def GetUserInfo(self, token):
+        # Statuses for this can be queued up ahead of time
+        status = self.statuses.pop(0) if self.statuses else "401 Unauthorized"
+        return {"status": status}
+
+    def SearchSubtitles(self, token, queries):
+        with (SUBWINDER_RESPONSES / "search_subtitles.json").open() as f:
+            return json.load(f)
+
+
+@pytest.fixture
+def server():
+    with ThreadedXMLRPCServer() as server:
+        server.api = _FakeApi()
+        server.register_instance(server.api)
+        server.register_multicall_functions()
+
+        yield server
+
+
+def _counted_transport():
+    transport = PooledTransport()
+    return transport, patch.object(transport, "request", wraps=transport.request)
+
+
+def test_multicall(server):
+    client = build_client(PooledTransport(), server.api_base)
+    CALLS = [
+        (Endpoints.SERVER_INFO, ()),
+        (Endpoints.GET_USER_INFO, ()),
+        (Endpoints.CHECK_MOVIE_HASH, ()),
+    ]
+
+    server_info, user_info, missing = multicall(CALLS, "<token>", client=client)
+
+    # Each call gets its own response or error
+    assert "xmlrpc_version" in server_info
+    assert isinstance(user_info, SubAuthError)
+    assert isinstance(missing, Fault)
+
+
+# Note: this test takes a bit of time because of the delayed API request retry
+@pytest.mark.slow
+def test_multicall_retry(server):
+    client = build_client(PooledTransport(), server.api_base)
+    server.api.statuses = ["429 Too many requests", "200 OK"]
+    CALLS = [(Endpoints.SERVER_INFO, ()), (Endpoints.GET_USER_INFO, ())]
+
+    server_info, user_info = multicall(CALLS, "<token>", client=client)
+
+    # The rate limited call was retried till it went through
+    assert "xmlrpc_version" in server_info
+    assert user_info == {"status": "200 OK"}
+    assert server.api.statuses == []
+
+
+def test_Subwinder_batch(server):
+    transport, counted = _counted_transport()
+    sw = Subwinder()
+    sw._request_options = {"client": build_client(transport, server.api_base)}
+
+    with counted as mocked:
+        with sw.batch() as batch:
+            info = batch.server_info()
+            download_info = batch.daily_download_info()
+            languages = batch.get_languages()
+
+            # Nothing gets sent till the batch is
+            assert not info.done()
+
+    assert info.result() == SERVER_INFO
+    assert download_info.result() == SERVER_INFO.daily_download_info
+    assert len(languages.result()) == 3
+    # Both the requests went out together
+    assert mocked.call_count == 1
+
+
+def test_AuthSubwinder_batch(server):
+    transport, counted = _counted_transport()
+    asw = AuthSubwinder.__new__(AuthSubwinder)
+    asw.limited_search_size = True
+    asw._token = "<token>"
+    asw._request_options = {"client": build_client(transport, server.api_base)}
+
+    with counted as mocked:
+        with asw.batch() as batch:
+            # The dev useragent searches one query at a time
+            results = batch.search_subtitles_unranked(
+                [(media, "en") for media in DISTINCT_MEDIA[:3]]
+            )
+            user_info = batch.user_info()
+            bad_search = batch.search_subtitles_unranked([(MEDIA1, "<bad lang>")])
+
+    assert results.result() == [[SEARCH_RESULT2]] * 3
+    # Failures are kept to their own calls
+    with pytest.raises(SubAuthError):
+        user_info.result()
+    with pytest.raises(SubLangError):
+        bad_search.result()
+    # Each search round had to wait on the last
+    assert mocked.call_count == 3
+
+    with pytest.raises(AttributeError):
+        asw.batch()._request
+
+
+def test_batch_no_threads(server):
+    sw = Subwinder()
+    sw._request_options = {"client": build_client(PooledTransport(), server.api_base)}
+    threads = set()
+    original = ServerInfo.from_data
+
+    def from_data(data):
+        threads.add(threading.get_ident())
+        return original(data)
+
+    # Every queued call runs in the thread that sends the batch
+    with patch("subwinder.core.ServerInfo.from_data", side_effect=from_data):
+        with sw.batch() as batch:
+            infos = [batch.server_info() for _ in range(50)]
+
+    assert [info.result() for info in infos] == [SERVER_INFO] * 50
+    assert threads == {threading.get_ident()}
+
+
+def test_batch_cancelled(server):
+    sw = Subwinder()
+
+    with pytest.raises(RuntimeError):
+        with sw.batch() as batch:
+            info = batch.server_info()
+            raise RuntimeError("Something went wrong")
+
+    assert info.cancelled()
@@ -0,0 +1,102 @@
+import asyncio
+import threading
+import time
+from multiprocessing.dummy import Pool
+from unittest.mock import Mock, patch
+
+import pytest
+
+from subwinder import Subwinder
+from subwinder._request import Endpoints, _client, request
+from subwinder.ratelimit import RateLimiter, SharedRateLimiter, _take
+
+
+def test__take():
+    LIMITS = {"*": (2, 10), "search": (1, 10)}
+    buckets = {}
+
+    # Buckets start full
+    assert _take(buckets, ["*", "search"], LIMITS, 0) == 0
+    assert buckets == {"*": (1, 0), "search": (0, 0)}
+
+    # Endpoint bucket is empty so nothing is taken from either
+    assert _take(buckets, ["*", "search"], LIMITS, 5) == pytest.approx(5)
+    assert buckets == {"*": (2, 5), "search": (0.5, 5)}
+
+    # But other endpoints only care about the overall bucket
+    assert _take(buckets, ["*"], LIMITS, 5) == 0
+    assert _take(buckets, ["*"], LIMITS, 5) == 0
+    assert _take(buckets, ["*"], LIMITS, 5) == pytest.approx(5)
+
+
+def test_RateLimiter():
+    limiter = RateLimiter(rate=4, per=0.4)
+
+    start = time.monotonic()
+    for _ in range(6):
+        limiter.acquire(Endpoints.SERVER_INFO)
+    # The first 4 are free, then each one after waits for a token to refill
+    assert time.monotonic() - start > 0.15
+
+    # Endpoint limits apply on top of the overall limit
+    limiter = RateLimiter(endpoint_limits={Endpoints.SEARCH_SUBTITLES: (1, 10)})
+    with patch("time.sleep") as mocked:
+        mocked.side_effect = RuntimeError("Would have waited")
+        limiter.acquire(Endpoints.SEARCH_SUBTITLES)
+        limiter.acquire(Endpoints.SERVER_INFO)
+        with pytest.raises(RuntimeError):
+            limiter.acquire(Endpoints.SEARCH_SUBTITLES)
+
+    with pytest.raises(ValueError):
+        RateLimiter(rate=0)
+    # Fractional rates could never fill a bucket up to a whole token
+    with pytest.raises(ValueError):
+        RateLimiter(rate=0.5)
+    with pytest.raises(ValueError):
+        RateLimiter(endpoint_limits={Endpoints.SEARCH_SUBTITLES: (0.5, 1)})
+
+
+def test_SharedRateLimiter(tmp_path):
+    DB_PATH = tmp_path / "limits.db"
+    limiters = [SharedRateLimiter(DB_PATH, rate=10, per=1000) for _ in range(2)]
+
+    def acquire(limiter):
+        limiter.acquire(Endpoints.SERVER_INFO)
+
+    # Both limiters draw from the same bucket
+    with Pool(4) as pool:
+        pool.map(acquire, limiters * 5)
+    with patch("time.sleep") as mocked:
+        mocked.side_effect = RuntimeError("Would have waited")
+        with pytest.raises(RuntimeError):
+            limiters[1].acquire(Endpoints.SERVER_INFO)
+
+    threads = []
+
+    def try_take(names):
+        threads.append(threading.get_ident())
+        return 0
+
+    async def acquire_async():
+        await limiters[0].acquire_async(Endpoints.SERVER_INFO)
+        return threading.get_ident()
+
+    # The async path doesn't touch the database from the event loop's thread
+    with patch.object(limiters[0], "_try_take", side_effect=try_take):
+        loop_thread = asyncio.run(acquire_async())
+    assert len(threads) == 1
+    assert threads[0] != loop_thread
+
+    for limiter in limiters:
+        limiter.close()
+
+
+def test_request_rate_limiter():
+    RESP = {"status": "200 OK", "data": "The data!", "seconds": "0.15"}
+    limiter = Mock()
+
+    with patch.object(_client, "ServerInfo", return_value=RESP):
+        assert request(Endpoints.SERVER_INFO, None, rate_limiter=limiter) == RESP
+
+    limiter.acquire.assert_called_once_with(Endpoints.SERVER_INFO)
+    assert Subwinder(rate_limiter=limiter)._request_options == {"rate_limiter": limiter}
@@ -0,0 +1,175 @@
+import asyncio
+import gzip
+import json
+import time
+from unittest.mock import patch
+from xmlrpc.client import Fault
+
+import pytest
+
+import subwinder._request
+from subwinder import Subwinder
+from subwinder._request import Endpoints, build_client, request
+from subwinder._unmarshal import stream_data
+from subwinder.aio import AsyncSubwinder
+from subwinder.exceptions import SubLibError
+from subwinder.lang import _converter
+from subwinder.replay import (
+    AsyncRecordingTransport,
+    RecordingTransport,
+    ReplayTransport,
+)
+from subwinder.transport import AsyncTransport, PooledTransport
+from tests.constants import SERVER_INFO, SUBWINDER_RESPONSES
+from tests.utils import ThreadedXMLRPCServer
+
+with (SUBWINDER_RESPONSES / "server_info.json").open() as f:
+    SERVER_INFO_RESP = json.load(f)
+
+
+def _fail(token):
+    raise ValueError("Nope")
+
+
+@pytest.fixture
+def server():
+    with ThreadedXMLRPCServer() as server:
+        counter = iter(range(100))
+
+        server.register_function(lambda: SERVER_INFO_RESP, "ServerInfo")
+        server.register_function(
+            lambda token: {"status": "200 OK", "data": [next(counter)]}, "NoOperation"
+        )
+        server.register_function(_fail, "GetUserInfo")
+        server.register_function(
+            lambda: {
+                "status": "200 OK",
+                "data": [
+                    {"ISO639": "en", "SubLanguageID": "eng", "LanguageName": "English"}
+                ],
+            },
+            "GetSubLanguages",
+        )
+
+        yield server
+
+
+@pytest.fixture
+def recording(server, tmp_path):
+    path = tmp_path / "recording.jsonl.gz"
+    transport = RecordingTransport(path, PooledTransport())
+    client = build_client(transport, server.api_base)
+
+    request(Endpoints.SERVER_INFO, None, client=client)
+    for _ in range(2):
+        request(Endpoints.NO_OPERATION, "<token>", client=client)
+    with pytest.raises(Fault):
+        client.GetUserInfo("<token>")
+
+    transport.close()
+
+    return path
+
+
+def test_RecordingTransport(recording):
+    with gzip.open(recording, "rt") as file:
+        entries = [json.loads(line) for line in file]
+
+    assert [entry["method"] for entry in entries] == [
+        "ServerInfo",
+        "NoOperation",
+        "NoOperation",
+        "GetUserInfo",
+    ]
+    assert all(entry["status"] == 200 for entry in entries)
+    assert "faultString" in entries[-1]["response"]
+
+
+def test_RecordingTransport_streaming(server, tmp_path):
+    path = tmp_path / "recording.jsonl.gz"
+    transport = RecordingTransport(path, PooledTransport())
+    client = build_client(transport, server.api_base)
+
+    streamed = []
+    with stream_data(streamed.append):
+        resp = request(Endpoints.NO_OPERATION, "<token>", client=client)
+    transport.close()
+
+    # Streaming still works while the full response is recorded
+    assert resp["data"] == []
+    assert streamed == [0]
+    with stream_data(streamed.append):
+        resp = request(
+            Endpoints.NO_OPERATION,
+            "<token>",
+            client=build_client(ReplayTransport(path)),
+        )
+    assert streamed == [0, 0]
+
+
+def test_ReplayTransport(recording):
+    transport = ReplayTransport(recording)
+
+    # Full round trip through `Subwinder` without the network
+    assert Subwinder(transport).server_info() == SERVER_INFO
+
+    # Identical requests are replayed in order with the last one repeating
+    client = build_client(transport)
+    for expected in (0, 1, 1):
+        resp = request(Endpoints.NO_OPERATION, "<token>", client=client)
+        assert resp["data"] == [expected]
+
+    with pytest.raises(Fault):
+        client.GetUserInfo("<token>")
+
+    with pytest.raises(SubLibError):
+        request(Endpoints.NO_OPERATION, "<other token>", client=client)
+
+    # Like the other transports, faults don't count towards the stats
+    assert transport.stats.requests == 4
+    assert transport.stats.received_bytes > 0
+
+
+def test_ReplayTransport_languages(server, tmp_path, no_fake_langs):
+    path = tmp_path / "recording.jsonl.gz"
+    transport = RecordingTransport(path, PooledTransport())
+    recorded = Subwinder(api_base=server.api_base, transport=transport).get_languages()
+    transport.close()
+
+    with gzip.open(path, "rt") as file:
+        assert [json.loads(line)["method"] for line in file] == ["GetSubLanguages"]
+
+    # Refreshing the language list is replayed too, so nothing needs the network
+    _converter.default()
+    with patch.object(subwinder._request, "_client") as mocked:
+        assert Subwinder(ReplayTransport(path)).get_languages() == recorded
+    assert mocked.mock_calls == []
+
+
+def test_ReplayTransport_latency(recording):
+    transport = ReplayTransport(recording, latency=0.05)
+
+    start = time.perf_counter()
+    Subwinder(transport).server_info()
+    assert time.perf_counter() - start >= 0.05
+
+
+def test_async_record_replay(server, tmp_path):
+    path = tmp_path / "recording.jsonl.gz"
+
+    async def main():
+        transport = AsyncRecordingTransport(path, AsyncTransport(server.api_base))
+        async with AsyncSubwinder(transport) as asw:
+            recorded = await asw.server_info()
+        await transport.close()
+
+        async with AsyncSubwinder(ReplayTransport(path)) as asw:
+            replayed = await asw.server_info()
+
+        return recorded, replayed
+
+    recorded, replayed = asyncio.run(main())
+    assert recorded == replayed == SERVER_INFO
+
+    # Recordings are interchangeable between the sync and async clients
+    assert Subwinder(ReplayTransport(path)).server_info() == SERVER_INFO
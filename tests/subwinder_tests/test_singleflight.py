@@ -0,0 +1,126 @@
+import asyncio
+import threading
+import time
+from unittest.mock import patch
+
+from subwinder._request import Endpoints, _client, request
+from subwinder.singleflight import SingleFlight
+
+
+def _run_threads(target, num_threads):
+    results = [None] * num_threads
+
+    def run(index):
+        results[index] = target()
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(num_threads)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return results
+
+
+def test_SingleFlight():
+    single_flight = SingleFlight()
+    calls = []
+
+    def fetch():
+        calls.append(None)
+        time.sleep(0.2)
+        return {"data": [1, 2, 3]}
+
+    results = _run_threads(lambda: single_flight.do("key", fetch), 5)
+
+    # Everyone shares the one call, but gets their own copy of the result
+    assert len(calls) == 1
+    assert single_flight.coalesced == 4
+    assert all(result == {"data": [1, 2, 3]} for result in results)
+    assert len({id(result) for result in results}) == 5
+
+    # Finished calls aren't reused
+    single_flight.do("key", fetch)
+    assert len(calls) == 2
+
+
+def test_SingleFlight_errors():
+    single_flight = SingleFlight()
+
+    def fail():
+        time.sleep(0.2)
+        raise ValueError("Nope")
+
+    def call():
+        try:
+            single_flight.do("key", fail)
+        except ValueError as err:
+            return err
+
+    errors = _run_threads(call, 3)
+    assert all(isinstance(err, ValueError) for err in errors)
+    assert single_flight.coalesced == 2
+
+
+def test_SingleFlight_async():
+    single_flight = SingleFlight()
+    calls = []
+
+    async def fetch():
+        calls.append(None)
+        await asyncio.sleep(0.1)
+        return [1, 2]
+
+    async def main():
+        results = await asyncio.gather(
+            *[single_flight.do_async("key", fetch) for _ in range(4)]
+        )
+
+        # A cancelled waiter doesn't cancel the call for the others
+        leader = asyncio.ensure_future(single_flight.do_async("key", fetch))
+        waiter = asyncio.ensure_future(single_flight.do_async("key", fetch))
+        await asyncio.sleep(0)
+        waiter.cancel()
+
+        return results, await leader
+
+    results, result = asyncio.run(main())
+    assert results == [[1, 2]] * 4
+    assert result == [1, 2]
+    assert len(calls) == 2
+
+
+def test_request_single_flight():
+    RESP = {"status": "200 OK", "data": [1, 2, 3]}
+    single_flight = SingleFlight()
+
+    def slow_search(*args):
+        time.sleep(0.2)
+        return RESP
+
+    with patch.object(_client, "SearchSubtitles", side_effect=slow_search) as mocked:
+        results = _run_threads(
+            lambda: request(
+                Endpoints.SEARCH_SUBTITLES,
+                "<token>",
+                [{"imdbid": "1"}],
+                single_flight=single_flight,
+            ),
+            4,
+        )
+
+    mocked.assert_called_once_with("<token>", [{"imdbid": "1"}])
+    assert results == [RESP] * 4
+
+    # Only idempotent endpoints are coalesced
+    with patch.object(_client, "DownloadSubtitles", side_effect=slow_search) as mocked:
+        _run_threads(
+            lambda: request(
+                Endpoints.DOWNLOAD_SUBTITLES,
+                "<token>",
+                ["1"],
+                single_flight=single_flight,
+            ),
+            2,
+        )
+    assert mocked.call_count == 2
@@ -0,0 +1,225 @@
+import os
+import stat
+import time
+from unittest.mock import patch
+
+import pytest
+
+from subwinder import AuthSubwinder
+from subwinder.exceptions import SubAuthError
+from subwinder.tokens import FileTokenStore, TokenStore
+from tests.utils import ThreadedXMLRPCServer
+
+USERAGENT = "<useragent>"
+KEY = f"{USERAGENT}:<username>"
+
+
+class FakeSessions:
+    """
+    Hands out tokens on login and only accepts the most recent one.
+    """
+
+    def __init__(self):
+        self.logins = 0
+        self.logouts = 0
+        self.token = None
+        self.used = None
+        self.pings = 0
+
+    def log_in(self, username, password, lang, useragent):
+        self.logins += 1
+        self.token = f"<token-{self.logins}>"
+        return {"status": "200 OK", "token": self.token}
+
+    def log_out(self, token):
+        self.logouts += 1
+        self.token = None
+        return {"status": "200 OK"}
+
+    def no_operation(self, token):
+        if token != self.token:
+            return {"status": "401 Unauthorized"}
+
+        self.used = token
+        self.pings += 1
+        return {"status": "200 OK"}
+
+    def expire(self):
+        self.token = None
+
+
+@pytest.fixture
+def server():
+    sessions = FakeSessions()
+    with ThreadedXMLRPCServer() as server:
+        server.register_function(sessions.log_in, "LogIn")
+        server.register_function(sessions.log_out, "LogOut")
+        server.register_function(sessions.no_operation, "NoOperation")
+        server.sessions = sessions
+        yield server
+
+
+def _auth_subwinder(server, **kwargs):
+    return AuthSubwinder(
+        "<username>",
+        "<password>",
+        useragent=USERAGENT,
+        api_base=server.api_base,
+        **kwargs,
+    )
+
+
+def test_FileTokenStore(tmp_path):
+    path = tmp_path / "tokens.json"
+    store = FileTokenStore(path, max_age=60)
+
+    assert store.load(KEY) is None
+
+    store.save(KEY, "<token>")
+    assert store.load(KEY) == "<token>"
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+    assert "<password>" not in path.read_text()
+
+    # Other instances (like in other processes) see the same tokens
+    assert FileTokenStore(path).load(KEY) == "<token>"
+
+    store.clear(KEY)
+    assert store.load(KEY) is None
+
+    # Expired tokens aren't reused
+    store.save(KEY, "<token>")
+    store.max_age = 0
+    time.sleep(0.01)
+    assert store.load(KEY) is None
+
+    # Corrupt files are treated as empty
+    path.write_text("{")
+    assert store.load(KEY) is None
+
+
+def test_TokenStore():
+    store = TokenStore()
+
+    with pytest.raises(NotImplementedError):
+        store.load(KEY)
+
+
+def test_lazy_login(server):
+    asw = _auth_subwinder(server, lazy_login=True)
+    assert server.sessions.logins == 0
+
+    asw.ping()
+    assert server.sessions.used == "<token-1>"
+    asw.ping()
+    assert server.sessions.used == "<token-1>"
+    assert server.sessions.logins == 1
+
+
+def test_relogin(server):
+    asw = _auth_subwinder(server)
+    assert server.sessions.logins == 1
+
+    # The session expiring means logging in again and retrying
+    server.sessions.expire()
+    asw.ping()
+    assert server.sessions.used == "<token-2>"
+    assert server.sessions.logins == 2
+
+    # But only once
+    server.sessions.log_in = lambda *args: {"status": "200 OK", "token": "<bad>"}
+    server.register_function(server.sessions.log_in, "LogIn")
+    server.sessions.expire()
+    with pytest.raises(SubAuthError):
+        asw.ping()
+
+
+def test_relogin_batch(server):
+    server.register_multicall_functions()
+    asw = _auth_subwinder(server)
+    last_request = asw._last_request
+
+    # Batched calls get the same retry after logging in again
+    server.sessions.expire()
+    with asw.batch() as batch:
+        pings = [batch.ping() for _ in range(3)]
+
+    assert [ping.result() for ping in pings] == [None] * 3
+    assert server.sessions.used == "<token-2>"
+    assert server.sessions.logins == 2
+    # And they count as activity for `keep_alive`
+    assert asw._last_request > last_request
+
+
+def test_relogin_only_on_401(server):
+    asw = _auth_subwinder(server)
+
+    # Useragent errors aren't something that logging in again can fix
+    server.register_function(
+        lambda token: {"status": "415 Unknown User Agent"}, "NoOperation"
+    )
+    with pytest.raises(SubAuthError) as exc_info:
+        asw.ping()
+    assert exc_info.value.status_code == "415"
+    assert server.sessions.logins == 1
+
+
+def test_token_store(server, tmp_path):
+    store = FileTokenStore(tmp_path / "tokens.json")
+
+    with _auth_subwinder(server, token_store=store) as asw:
+        asw.ping()
+    assert store.load(KEY) == "<token-1>"
+    # The session is kept around for later instead of logging out
+    assert server.sessions.logouts == 0
+
+    # So later instances can just reuse it
+    with _auth_subwinder(server, token_store=store) as asw:
+        asw.ping()
+    assert server.sessions.used == "<token-1>"
+    assert server.sessions.logins == 1
+
+    # A stale token gets replaced in the store
+    server.sessions.expire()
+    asw = _auth_subwinder(server, token_store=store)
+    asw.ping()
+    assert server.sessions.used == "<token-2>"
+    assert store.load(KEY) == "<token-2>"
+
+    # And logging out explicitly removes it
+    asw._logout()
+    assert store.load(KEY) is None
+
+
+def test_keep_alive(server):
+    with _auth_subwinder(server, keep_alive=0.3) as asw:
+        # Pings only happen once the session goes idle
+        for _ in range(4):
+            time.sleep(0.1)
+            asw.ping()
+        pings = server.sessions.pings
+        assert pings == 4
+
+        time.sleep(0.7)
+        assert server.sessions.pings > pings
+        thread = asw._keep_alive_thread
+
+    # Exiting stops the pinging
+    assert not thread.is_alive()
+    pings = server.sessions.pings
+    time.sleep(0.3)
+    assert server.sessions.pings == pings
+
+    # Network errors don't stop the pinging either
+    with _auth_subwinder(server, keep_alive=0.1) as asw:
+        thread = asw._keep_alive_thread
+        with patch.object(asw, "ping", side_effect=ConnectionResetError) as mocked:
+            time.sleep(0.35)
+        assert mocked.call_count >= 2
+        assert thread.is_alive()
+
+    # And so does closing without `with`
+    asw = _auth_subwinder(server, keep_alive=0.1)
+    thread = asw._keep_alive_thread
+    asw.close()
+    assert not thread.is_alive()
+    assert server.sessions.logouts == 3
@@ -0,0 +1,110 @@
+from multiprocessing.dummy import Pool
+from unittest.mock import patch
+
+import pytest
+
+from subwinder import Subwinder
+from subwinder._request import Endpoints, _client, build_client, request
+from subwinder.transport import PooledTransport
+from tests.utils import ThreadedXMLRPCServer
+
+
+@pytest.fixture
+def server():
+    with ThreadedXMLRPCServer() as server:
+        server.register_function(
+            lambda: {"status": "200 OK", "seconds": "0.01"}, "ServerInfo"
+        )
+        server.register_function(
+            lambda token, value: {"status": "200 OK", "data": value}, "GetUserInfo"
+        )
+
+        yield server
+
+
+def test_PooledTransport_reuses_connections(server):
+    client = build_client(PooledTransport(), server.api_base)
+
+    for i in range(5):
+        resp = request(Endpoints.GET_USER_INFO, "<token>", i, client=client)
+        assert resp["data"] == i
+
+    # Everything should have gone over the one connection
+    assert len(server.RequestHandlerClass.connections) == 1
+
+
+def test_PooledTransport_reconnects_stale(server):
+    server.RequestHandlerClass.drop_connections = True
+    client = build_client(PooledTransport(), server.api_base)
+
+    for i in range(3):
+        resp = request(Endpoints.GET_USER_INFO, "<token>", i, client=client)
+        assert resp["data"] == i
+
+    # Each dropped connection needed to be replaced
+    assert len(server.RequestHandlerClass.connections) == 3
+
+
+def test_PooledTransport_no_retry_mid_body(server):
+    transport = PooledTransport()
+    client = build_client(transport, server.api_base)
+    request(Endpoints.GET_USER_INFO, "<token>", 0, client=client)
+
+    # The connection is reused, but results could have already been streamed from the
+    # body so it can't be retried
+    with patch.object(
+        transport, "parse_response", side_effect=ConnectionResetError
+    ) as mocked:
+        with pytest.raises(ConnectionResetError):
+            request(Endpoints.GET_USER_INFO, "<token>", 1, client=client)
+    assert mocked.call_count == 1
+
+    # And the broken connection isn't reused after
+    resp = request(Endpoints.GET_USER_INFO, "<token>", 2, client=client)
+    assert resp["data"] == 2
+    assert len(server.RequestHandlerClass.connections) == 2
+
+
+def test_PooledTransport_threads(server):
+    MAX_CONNECTIONS = 3
+    client = build_client(PooledTransport(MAX_CONNECTIONS), server.api_base)
+
+    def get(value):
+        return request(Endpoints.GET_USER_INFO, "<token>", value, client=client)
+
+    with Pool(8) as pool:
+        resps = pool.map(get, range(40))
+
+    assert [resp["data"] for resp in resps] == list(range(40))
+    assert len(server.RequestHandlerClass.connections) <= MAX_CONNECTIONS
+
+    with pytest.raises(ValueError):
+        PooledTransport(max_connections=0)
+
+
+def test_PooledTransport_gzip(server):
+    DATA = "Very compressible " * 1000
+    transport = PooledTransport(encode_threshold=1000)
+    client = build_client(transport, server.api_base)
+
+    resp = request(Endpoints.GET_USER_INFO, "<token>", DATA, client=client)
+    assert resp["data"] == DATA
+
+    # Both the request and the response were gzipped on the wire
+    stats = transport.stats
+    assert stats.requests == 1
+    assert stats.sent_bytes < len(DATA)
+    assert stats.received_bytes < len(DATA) < stats.decoded_bytes
+
+    # Small bodies are sent as is
+    request(Endpoints.SERVER_INFO, None, client=client)
+    assert transport.stats.requests == 2
+    assert transport.stats.sent_bytes > stats.sent_bytes + 100
+
+
+def test_Subwinder_transport():
+    # Default is to share the module's client
+    assert Subwinder()._request_options == {}
+
+    sw = Subwinder(PooledTransport())
+    assert sw._request_options["client"] is not _client
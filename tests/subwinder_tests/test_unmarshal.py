@@ -0,0 +1,103 @@
+import json
+from unittest.mock import patch
+from xml.parsers.expat import ExpatError
+from xmlrpc.client import dumps
+
+import pytest
+
+from subwinder import AuthSubwinder
+from subwinder._request import Endpoints, _client, build_client, request
+from subwinder._unmarshal import _StreamingUnmarshaller, getparser, stream_data
+from subwinder.exceptions import SubServerError
+from subwinder.transport import PooledTransport
+from tests.constants import MEDIA1, SEARCH_RESULT2, SUBWINDER_RESPONSES
+from tests.utils import ThreadedXMLRPCServer
+
+RESP = {
+    "status": "200 OK",
+    "data": [{"id": i, "nested": {"data": [i, i]}} for i in range(50)],
+    "seconds": "0.01",
+}
+
+
+def _response_xml(resp):
+    return dumps((resp,), methodresponse=True).encode()
+
+
+def test_getparser():
+    # Without a handler the usual parser is used
+    _, unmarshaller = getparser()
+    assert not isinstance(unmarshaller, _StreamingUnmarshaller)
+
+    streamed = []
+    with stream_data(streamed.append):
+        parser, unmarshaller = getparser()
+
+    # Feed a bit at a time to check that items are handed off as they're parsed
+    xml = _response_xml(RESP)
+    half = len(xml) // 2
+    parser.feed(xml[:half])
+    assert 0 < len(streamed) < len(RESP["data"])
+    parser.feed(xml[half:])
+    parser.close()
+
+    assert streamed == RESP["data"]
+    assert unmarshaller.close() == (dict(RESP, data=[]),)
+
+
+def test_getparser_only_top_level_data():
+    RESP = {"status": "200 OK", "other": ["data", [1, 2]], "data": "not an array"}
+
+    streamed = []
+    with stream_data(streamed.append):
+        parser, unmarshaller = getparser()
+
+    parser.feed(_response_xml(RESP))
+    parser.close()
+
+    assert streamed == []
+    assert unmarshaller.close() == (RESP,)
+
+
+def test_getparser_invalid_xml():
+    with stream_data(print):
+        parser, _ = getparser()
+
+    with pytest.raises(ExpatError):
+        parser.feed(b"<?xml version='1.0'?><methodResponse><params></methodResp")
+        parser.close()
+
+    # Which keeps getting reported as a server error
+    with patch.object(_client, "SearchSubtitles", side_effect=ExpatError):
+        with pytest.raises(SubServerError):
+            request(Endpoints.SEARCH_SUBTITLES, "<token>", [])
+
+
+def test_search_subtitles_streamed():
+    with (SUBWINDER_RESPONSES / "search_subtitles.json").open() as f:
+        raw_result = json.load(f)["data"][0]
+
+    def search(token, queries):
+        data = [dict(raw_result, QueryNumber=str(i)) for i in range(len(queries))]
+        return {"status": "200 OK", "data": data}
+
+    with ThreadedXMLRPCServer() as server:
+        server.register_function(search, "SearchSubtitles")
+
+        asw = AuthSubwinder.__new__(AuthSubwinder)
+        asw.limited_search_size = False
+        client = build_client(PooledTransport(), server.api_base)
+        asw._request_options = {"client": client}
+
+        resps = []
+
+        def _request(*args):
+            resps.append(AuthSubwinder._request(asw, *args))
+            return resps[-1]
+
+        with patch.object(asw, "_request", _request):
+            results = asw.search_subtitles_unranked([(MEDIA1, "en")] * 3)
+
+    assert results == [[SEARCH_RESULT2]] * 3
+    # All the results were handed off while parsing instead of left in the response
+    assert resps[0]["data"] == []
@@ -1,11 +1,14 @@
 import os
+import random
 from tempfile import NamedTemporaryFile
+from unittest.mock import patch
 
 import pytest
 
+from subwinder import utils
 from subwinder.exceptions import SubHashError
-from subwinder.utils import extract, special_hash
-from tests.utils import RandomTempFile
+from subwinder.utils import HashBackend, _SumHasher, extract, hash_many, special_hash
+from tests.utils import LocalRangeReader, RandomTempFile
 
 
 def test_extract():
@@ -55,3 +58,112 @@ def test_special_hash():
     for i, hash in zip(range(5), HASHES):
         with RandomTempFile(HASHED_SIZE, seed=i) as rand_file:
             assert hash == special_hash(rand_file)
+
+
+def _reference_special_hash(filepath):
+    # The original byte-slicing implementation that everything should match
+    CHUNK_SIZE = 64 * 1024
+
+    filesize = filepath.stat().st_size
+    hash = filesize
+    with filepath.open("rb") as file:
+        chunks = file.read(CHUNK_SIZE)
+        file.seek(-CHUNK_SIZE, os.SEEK_END)
+        chunks += file.read(CHUNK_SIZE)
+
+    for i in range(0, len(chunks), 8):
+        hash += int.from_bytes(chunks[i : i + 8], byteorder="little")
+
+    return f"{hash & 2 ** 64 - 1:016x}"
+
+
+@pytest.mark.parametrize("backend", list(HashBackend))
+@pytest.mark.parametrize("numpy_support", [False, True])
+def test_special_hash_matches_reference(numpy_support, backend):
+    if numpy_support and not utils.NUMPY_SUPPORT:
+        pytest.skip("numpy is not installed")
+
+    rng = random.Random(0)
+    sizes = [128 * 1024, 128 * 1024 + 1, 192 * 1024 - 3]
+    sizes += [rng.randrange(128 * 1024, 1024 * 1024) for _ in range(5)]
+
+    with patch.object(utils, "NUMPY_SUPPORT", numpy_support):
+        for seed, size in enumerate(sizes):
+            with RandomTempFile(size, seed=seed) as rand_file:
+                assert _reference_special_hash(rand_file) == special_hash(
+                    rand_file, backend=backend
+                )
+
+        # Backends should all fail the same on files that are too small
+        with RandomTempFile(128 * 1024 - 1) as rand_file:
+            with pytest.raises(SubHashError):
+                special_hash(rand_file, backend=backend)
+
+
+def test__SumHasher_trailing_bytes():
+    hasher = _SumHasher(0)
+    hasher.update((2 ** 64 - 1).to_bytes(8, byteorder="little") + b"\x02\x01")
+
+    # The trailing bytes act as a partial little-endian word
+    assert hasher.hexdigest() == f"{0x0102 - 1:016x}"
+
+
+def test_hash_many():
+    SIZES = [128 * 1024, 128 * 1024 - 1, 256 * 1024]
+
+    with RandomTempFile(SIZES[0], seed=0) as file1, RandomTempFile(
+        SIZES[1], seed=1
+    ) as file2, RandomTempFile(SIZES[2], seed=2) as file3:
+        filepaths = [file1, file2, file3]
+
+        # Results should line up with `filepaths` when ordered
+        results = list(hash_many(filepaths, max_workers=2))
+        assert [filepath for filepath, _ in results] == filepaths
+        assert results[0][1] == special_hash(file1)
+        assert isinstance(results[1][1], SubHashError)
+        assert results[2][1] == special_hash(file3)
+
+        # And the same pairs should come back in any order otherwise
+        unordered = list(hash_many(iter(filepaths), max_workers=2, ordered=False))
+        assert len(unordered) == len(results)
+        for filepath, hash in results:
+            (match,) = [h for f, h in unordered if f == filepath]
+            assert type(match) is type(hash)
+            if isinstance(hash, str):
+                assert match == hash
+
+        with pytest.raises(ValueError):
+            list(hash_many(filepaths, max_workers=0))
+
+        # Missing files are reported along with the rest instead of stopping everything
+        missing = file1.parent / "missing.mkv"
+        results = list(hash_many([missing, file1], max_workers=2))
+        assert isinstance(results[0][1], SubHashError)
+        assert isinstance(results[0][1].__cause__, FileNotFoundError)
+        assert results[1] == (file1, special_hash(file1))
+
+
+def test_special_hash_range_reader():
+    CHUNK_SIZE = 64 * 1024
+    SIZE = 3 * CHUNK_SIZE + 5
+
+    with RandomTempFile(SIZE, seed=3) as rand_file:
+        reader = LocalRangeReader(rand_file)
+        assert special_hash(reader) == special_hash(rand_file)
+
+        # Only the first and last chunk should get read
+        IDEAL_READS = [(0, CHUNK_SIZE), (SIZE - CHUNK_SIZE, CHUNK_SIZE)]
+        assert sorted(reader.reads) == IDEAL_READS
+
+    with RandomTempFile(2 * CHUNK_SIZE - 1) as rand_file:
+        reader = LocalRangeReader(rand_file)
+        with pytest.raises(SubHashError):
+            special_hash(reader)
+        assert reader.reads == []
+
+    # Short reads from the source should be caught
+    with RandomTempFile(2 * CHUNK_SIZE) as rand_file:
+        reader = LocalRangeReader(rand_file)
+        reader.size += 1
+        with pytest.raises(SubHashError):
+            special_hash(reader)
@@ -1,6 +1,11 @@
 import random
+import threading
 from pathlib import Path
+from socketserver import ThreadingMixIn
 from tempfile import NamedTemporaryFile
+from xmlrpc.server import SimpleXMLRPCRequestHandler, SimpleXMLRPCServer
+
+from subwinder.utils import BaseRangeReader
 
 
 class RandomTempFile:
@@ -37,3 +42,72 @@ class RandomTempFile:
         # Just like in real life even when stuff isn't going great, just ignore all the
         # problems and keep moving on
         self.file.unlink()
+
+
+class LocalRangeReader(BaseRangeReader):
+    """
+    Stand-in for a remote range-readable source that's backed by a local file.
+    """
+
+    def __init__(self, filepath):
+        self.filepath = Path(filepath)
+        self.size = self.filepath.stat().st_size
+        self.name = str(self.filepath)
+        self.reads = []
+
+    def read_range(self, offset, length):
+        self.reads.append((offset, length))
+        with self.filepath.open("rb") as file:
+            file.seek(offset)
+            return file.read(length)
+
+
+class KeepAliveHandler(SimpleXMLRPCRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Set to simulate the server dropping idle keep-alive connections without notice
+    drop_connections = False
+    connections = []
+
+    def setup(self):
+        super().setup()
+        self.connections.append(self.client_address)
+
+    def handle_one_request(self):
+        super().handle_one_request()
+        if self.drop_connections:
+            self.close_connection = True
+
+
+class ThreadedXMLRPCServer(ThreadingMixIn, SimpleXMLRPCServer):
+    """
+    Local XML-RPC server that supports keep-alive connections and serves from a
+    background thread while used as a context manager.
+    """
+
+    daemon_threads = True
+
+    def __init__(self):
+        # Each server tracks its own connections
+        class Handler(KeepAliveHandler):
+            connections = []
+
+        super().__init__(
+            ("127.0.0.1", 0), requestHandler=Handler, logRequests=False, allow_none=True
+        )
+
+    def __enter__(self):
+        super().__enter__()
+
+        thread = threading.Thread(target=self.serve_forever, args=(0.01,), daemon=True)
+        thread.start()
+
+        return self
+
+    def __exit__(self, *args):
+        self.shutdown()
+        super().__exit__(*args)
+
+    @property
+    def api_base(self):
+        host, port = self.server_address
+        return f"http://{host}:{port}/"